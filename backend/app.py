@@ -10,6 +10,89 @@ import time
 db = SQLAlchemy()
 socketio = SocketIO(cors_allowed_origins="*", async_mode='eventlet')
 
+# Colunas adicionadas depois da criação inicial das tabelas.
+# db.create_all() não altera tabelas existentes, então aplicamos via ALTER TABLE idempotente.
+SCHEMA_PATCHES = [
+    ('gravacoes', 'ingest_mode', 'VARCHAR(20)'),
+    ('radios', 'ring_buffer_enabled', 'BOOLEAN DEFAULT FALSE'),
+    ('radios', 'ring_buffer_hours', 'INTEGER DEFAULT 2'),
+    ('gravacoes', 'segmentado', 'BOOLEAN DEFAULT FALSE'),
+    ('gravacoes', 'analisado_em', 'TIMESTAMP WITH TIME ZONE'),
+    ('gravacoes', 'dead_air_percent', 'DOUBLE PRECISION'),
+    ('gravacoes', 'silencios', 'TEXT'),
+    ('radios', 'dead_air_alerta', 'BOOLEAN DEFAULT FALSE'),
+    ('gravacoes', 'transcrito_em', 'TIMESTAMP WITH TIME ZONE'),
+    ('gravacoes', 'fingerprint_em', 'TIMESTAMP WITH TIME ZONE'),
+    ('gravacoes', 'fala_percent', 'DOUBLE PRECISION'),
+    ('gravacoes', 'segmentos_fala', 'TEXT'),
+    (
+        'transcricao_segmentos', 'busca',
+        "tsvector GENERATED ALWAYS AS (to_tsvector('pt_unaccent'::regconfig, coalesce(texto, ''))) STORED",
+    ),
+]
+
+# Chave da trava (pg_advisory_lock) que serializa o DDL de inicialização entre processos
+SCHEMA_LOCK_KEY = 0x636C6970
+
+# Chaves estrangeiras que passaram a ter ON DELETE CASCADE: (tabela, constraint, coluna, referência)
+SCHEMA_CASCADE_FOREIGN_KEYS = [
+    ('jobs', 'jobs_gravacao_id_fkey', 'gravacao_id', 'gravacoes(id)'),
+]
+
+# Índices criados depois das tabelas (CREATE INDEX IF NOT EXISTS)
+SCHEMA_INDEXES = [
+    ('ix_transcricao_segmentos_busca', 'transcricao_segmentos USING gin (busca)'),
+]
+
+
+def ensure_schema():
+    """DDL de inicialização sob pg_advisory_lock: web e processos do worker sobem juntos e,
+    sem a trava, o CREATE EXTENSION/ALTER TABLE concorrente falha com objeto duplicado."""
+    with db.engine.connect() as lock_conn:
+        lock_conn.execute(db.text('SELECT pg_advisory_lock(:key)'), {'key': SCHEMA_LOCK_KEY})
+        try:
+            ensure_search_config()
+            db.create_all()
+            ensure_schema_columns()
+        finally:
+            lock_conn.execute(db.text('SELECT pg_advisory_unlock(:key)'), {'key': SCHEMA_LOCK_KEY})
+
+
+def ensure_search_config():
+    """Cria a configuração de busca textual (português + unaccent) usada pelas transcrições."""
+    from models.transcricao_segmento import SEARCH_CONFIG
+
+    db.session.execute(db.text('CREATE EXTENSION IF NOT EXISTS unaccent'))
+    db.session.execute(db.text(f"""
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{SEARCH_CONFIG}') THEN
+                CREATE TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} (COPY = portuguese);
+                ALTER TEXT SEARCH CONFIGURATION {SEARCH_CONFIG}
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+            END IF;
+        END $$;
+    """))
+    db.session.commit()
+
+
+def ensure_schema_columns():
+    """Garante que colunas novas existam em bancos criados por versões anteriores."""
+    for table, column, ddl in SCHEMA_PATCHES:
+        db.session.execute(db.text(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {ddl}'))
+    for table, name, column, reference in SCHEMA_CASCADE_FOREIGN_KEYS:
+        ondelete = db.session.execute(
+            db.text('SELECT confdeltype FROM pg_constraint WHERE conname = :name AND conrelid = CAST(:table AS regclass)'),
+            {'name': name, 'table': table},
+        ).scalar()
+        if ondelete != 'c':
+            db.session.execute(db.text(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}'))
+            db.session.execute(db.text(
+                f'ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {reference} ON DELETE CASCADE'
+            ))
+    for name, definition in SCHEMA_INDEXES:
+        db.session.execute(db.text(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}'))
+    db.session.commit()
+
 
 def wait_for_db(max_tries=30, delay=2):
     """Espera o banco responder antes de iniciar o scheduler."""
@@ -54,17 +137,22 @@ def create_app():
         from models.clip import Clip
         from models.gravacao_tag import gravacao_tags
         from models.cliente import Cliente
+        from models.midia_metadados import MidiaMetadados
+        from models.job import Job
+        from models.evento_outbox import EventoOutbox
+        from models.transcricao_segmento import TranscricaoSegmento
+        from models.audio_fingerprint import AudioFingerprint
         
         # Garantir que todas as tabelas existam antes de receber requisições
         try:
-            db.create_all()
+            ensure_schema()
             app.logger.info("Tabelas verificadas/criadas com sucesso.")
         except Exception as e:
             app.logger.exception("Falha ao criar/verificar tabelas do banco.")
             raise
     
     # Registrar blueprints
-    from routes import auth, radios, gravacoes, agendamentos, tags, recording, files, admin
+    from routes import auth, radios, gravacoes, agendamentos, tags, recording, files, admin, clips
     
     app.register_blueprint(auth.bp, url_prefix='/api/auth')
     app.register_blueprint(radios.bp, url_prefix='/api/radios')
@@ -74,6 +162,7 @@ def create_app():
     app.register_blueprint(recording.bp, url_prefix='/api/recording')
     app.register_blueprint(files.bp, url_prefix='/api/files')
     app.register_blueprint(admin.bp, url_prefix='/api/admin')
+    app.register_blueprint(clips.bp, url_prefix='/api/clips')
     
     @app.route('/api/health')
     def health():
@@ -87,15 +176,16 @@ def create_app():
             app.logger.exception("Health check falhou")
             return jsonify({'status': 'error', 'database': 'disconnected', 'error': str(e)}), 500
     
-    # Inicializar scheduler (aguardar banco estar pronto)
-    from services.scheduler_service import init_scheduler
-    with app.app_context():
-        try:
-            wait_for_db(max_tries=60, delay=1)  # Mais tentativas, intervalo menor
-            init_scheduler()
-        except RuntimeError as e:
-            # Log do erro mas não falha a inicialização
-            print(f"Warning: {e}. Scheduler não iniciado.")
+    # Inicializar scheduler (aguardar banco estar pronto); o worker de jobs roda sem ele
+    if Config.SCHEDULER_ENABLED:
+        from services.scheduler_service import init_scheduler
+        with app.app_context():
+            try:
+                wait_for_db(max_tries=60, delay=1)  # Mais tentativas, intervalo menor
+                init_scheduler()
+            except RuntimeError as e:
+                # Log do erro mas não falha a inicialização
+                print(f"Warning: {e}. Scheduler não iniciado.")
     
     @app.errorhandler(404)
     def not_found(e):
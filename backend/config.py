@@ -48,6 +48,89 @@ class Config:
     # Storage
     STORAGE_PATH = os.path.join(os.path.dirname(__file__), 'storage')
     UPLOAD_PATH = os.path.join(os.path.dirname(__file__), 'uploads')
+
+    # Prefixo da location interna do nginx para servir mídia via X-Accel-Redirect (vazio = Flask envia o arquivo)
+    MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '')
+
+    # Gravação
+    # Copiar o áudio da origem sem re-encode quando codec/bitrate/canais já batem com a rádio
+    RECORDING_STREAM_COPY = os.getenv('RECORDING_STREAM_COPY', 'true').lower() not in ('0', 'false', 'no')
+    STREAM_PROBE_TIMEOUT = int(os.getenv('STREAM_PROBE_TIMEOUT', '15'))
+    # Tempo que o hub de uma rádio fica conectado sem gravações antes de encerrar o ffmpeg
+    INGEST_HUB_LINGER_SECONDS = int(os.getenv('INGEST_HUB_LINGER_SECONDS', '10'))
+    # Supervisor: orçamento de CPU (núcleos) e custo estimado de cada hub por formato
+    RECORDING_CPU_BUDGET = float(os.getenv('RECORDING_CPU_BUDGET', '0')) or None
+    RECORDING_CPU_FRACTION = float(os.getenv('RECORDING_CPU_FRACTION', '0.8'))
+    RECORDING_COST_COPY = float(os.getenv('RECORDING_COST_COPY', '0.01'))
+    RECORDING_COST_MP3 = float(os.getenv('RECORDING_COST_MP3', '0.08'))
+    RECORDING_COST_OPUS = float(os.getenv('RECORDING_COST_OPUS', '0.12'))
+    # Buffer circular por rádio (gravações/clipes retroativos)
+    RING_SEGMENT_SECONDS = int(os.getenv('RING_SEGMENT_SECONDS', '30'))
+    RING_BUFFER_DEFAULT_HOURS = int(os.getenv('RING_BUFFER_DEFAULT_HOURS', '2'))
+    RING_BUFFER_MAX_HOURS = int(os.getenv('RING_BUFFER_MAX_HOURS', '24'))
+    # Gravação segmentada (HLS ao vivo): padrão para novas gravações e duração de cada segmento
+    RECORDING_SEGMENTED = os.getenv('RECORDING_SEGMENTED', 'false').lower() in ('1', 'true', 'yes')
+    HLS_SEGMENT_SECONDS = int(os.getenv('HLS_SEGMENT_SECONDS', '6'))
+    # Threads que finalizam gravações (banco/broadcast) fora do laço de processos
+    REAPER_WORKERS = int(os.getenv('REAPER_WORKERS', '4'))
+    # Linhas finais do stderr do ffmpeg guardadas por hub para o log de erro
+    FFMPEG_STDERR_LINES = int(os.getenv('FFMPEG_STDERR_LINES', '40'))
+    # Intervalo mínimo (s) entre eventos gravacao_progress enviados a cada sala
+    RECORDING_PROGRESS_INTERVAL = float(os.getenv('RECORDING_PROGRESS_INTERVAL', '2'))
+    # ffprobe simultâneos ao completar metadados de arquivos fora do cache
+    METADATA_PROBE_WORKERS = int(os.getenv('METADATA_PROBE_WORKERS', '4'))
+    # Impressões digitais: votos mínimos (pares casados) para uma ocorrência, hashes por consulta e
+    # gravações antigas sem impressão enfileiradas por rodada do backfill
+    FINGERPRINT_MIN_MATCHES = int(os.getenv('FINGERPRINT_MIN_MATCHES', '20'))
+    FINGERPRINT_MAX_QUERY_HASHES = int(os.getenv('FINGERPRINT_MAX_QUERY_HASHES', '4000'))
+    FINGERPRINT_BACKFILL_BATCH = int(os.getenv('FINGERPRINT_BACKFILL_BATCH', '4'))
+    # Processos que cortam arquivos de clipes (sem re-encode)
+    CLIP_WORKERS = int(os.getenv('CLIP_WORKERS', '4'))
+    # Transcrição (STT): motor (stub, faster_whisper), modelo, processos e trechos por VAD.
+    # faster_whisper só vem instalado na imagem do worker (requirements-worker.txt)
+    STT_ENGINE = os.getenv('STT_ENGINE', 'stub')
+    STT_MODEL = os.getenv('STT_MODEL', 'small')
+    STT_LANGUAGE = os.getenv('STT_LANGUAGE', 'pt')
+    STT_WORKERS = int(os.getenv('STT_WORKERS', '2'))
+    STT_THREADS_PER_WORKER = int(os.getenv('STT_THREADS_PER_WORKER', '2'))
+    STT_STUB_TEXT = os.getenv('STT_STUB_TEXT', 'teste')
+    STT_CHUNK_MAX_SECONDS = float(os.getenv('STT_CHUNK_MAX_SECONDS', '30'))
+    VAD_THRESHOLD_DB = float(os.getenv('VAD_THRESHOLD_DB', '-40'))
+    # Transcrever só os trechos classificados como fala (música e silêncio ficam de fora)
+    SPEECH_FILTER_ENABLED = os.getenv('SPEECH_FILTER_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+    # Índice de palavras-chave dos agendamentos: intervalo (s) para conferir agendamentos apagados
+    KEYWORD_INDEX_FULL_SYNC_SECONDS = int(os.getenv('KEYWORD_INDEX_FULL_SYNC_SECONDS', '60'))
+    # Alertas ao vivo: processos do worker dedicados, gravações por processo, janela/sobreposição (s),
+    # atraso máximo (s) antes de descartar áudio para voltar ao tempo real e intervalo de leitura (s)
+    LIVE_KEYWORD_WORKERS = int(os.getenv('LIVE_KEYWORD_WORKERS', '1'))
+    LIVE_STREAMS_PER_WORKER = int(os.getenv('LIVE_STREAMS_PER_WORKER', '8'))
+    LIVE_WINDOW_SECONDS = float(os.getenv('LIVE_WINDOW_SECONDS', '15'))
+    LIVE_OVERLAP_SECONDS = float(os.getenv('LIVE_OVERLAP_SECONDS', '3'))
+    LIVE_MAX_LAG_SECONDS = float(os.getenv('LIVE_MAX_LAG_SECONDS', '60'))
+    LIVE_POLL_SECONDS = float(os.getenv('LIVE_POLL_SECONDS', '2'))
+    # Áudio ao vivo (/api/files/audio/<id>/live): bloco lido por vez e intervalo (s) entre leituras no fim do arquivo
+    LIVE_AUDIO_CHUNK_BYTES = int(os.getenv('LIVE_AUDIO_CHUNK_BYTES', '65536'))
+    LIVE_AUDIO_POLL_SECONDS = float(os.getenv('LIVE_AUDIO_POLL_SECONDS', '0.5'))
+    # Margem (s) antes/depois da palavra-chave no clipe gerado
+    KEYWORD_CLIP_PADDING_SECONDS = int(os.getenv('KEYWORD_CLIP_PADDING_SECONDS', '10'))
+    # Ar morto: janelas abaixo de SILENCE_THRESHOLD_DB ou com espectro plano (ruído) acima de DEAD_AIR_FLATNESS
+    SILENCE_THRESHOLD_DB = float(os.getenv('SILENCE_THRESHOLD_DB', '-50'))
+    DEAD_AIR_FLATNESS = float(os.getenv('DEAD_AIR_FLATNESS', '0.5'))
+    SILENCE_MIN_SECONDS = float(os.getenv('SILENCE_MIN_SECONDS', '2'))
+    SILENCE_MAX_INTERVALS = int(os.getenv('SILENCE_MAX_INTERVALS', '500'))
+    DEAD_AIR_ALERT_PERCENT = float(os.getenv('DEAD_AIR_ALERT_PERCENT', '20'))
+    # Jobs assíncronos (worker.py): processos, tentativas, backoff e detecção de worker morto
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+    JOB_RETRY_BASE_SECONDS = int(os.getenv('JOB_RETRY_BASE_SECONDS', '30'))
+    JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '2'))
+    JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '300'))
+    # Intervalo (s) em que o web entrega os eventos gravados pelo worker no outbox
+    OUTBOX_POLL_SECONDS = float(os.getenv('OUTBOX_POLL_SECONDS', '1'))
+    # Job que concilia tamanho/duração/status fora das requisições
+    METADATA_RECONCILE_SECONDS = int(os.getenv('METADATA_RECONCILE_SECONDS', '60'))
+    METADATA_RECONCILE_BATCH = int(os.getenv('METADATA_RECONCILE_BATCH', '200'))
     
     @staticmethod
     def init_app(app):
@@ -55,4 +138,8 @@ class Config:
         os.makedirs(Config.UPLOAD_PATH, exist_ok=True)
         os.makedirs(os.path.join(Config.STORAGE_PATH, 'audio'), exist_ok=True)
         os.makedirs(os.path.join(Config.STORAGE_PATH, 'clips'), exist_ok=True)
+        os.makedirs(os.path.join(Config.STORAGE_PATH, 'ring'), exist_ok=True)
+        os.makedirs(os.path.join(Config.STORAGE_PATH, 'hls'), exist_ok=True)
+        os.makedirs(os.path.join(Config.STORAGE_PATH, 'peaks'), exist_ok=True)
+        os.makedirs(os.path.join(Config.STORAGE_PATH, 'index'), exist_ok=True)
 
@@ -14,5 +14,10 @@ echo "PostgreSQL está pronto!"
 # Executar as migrations (se necessário)
 # flask db upgrade
 
+# Outro comando (ex.: python worker.py) substitui o servidor web
+if [ "$#" -gt 0 ]; then
+  exec "$@"
+fi
+
 # Iniciar a aplicação
 exec gunicorn --worker-class eventlet -w 1 --bind 0.0.0.0:5000 --timeout 300 --access-logfile - --error-logfile - app:app
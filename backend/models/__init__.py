@@ -7,6 +7,11 @@ from models.tag import Tag
 from models.clip import Clip
 from models.gravacao_tag import gravacao_tags
 from models.cliente import Cliente
+from models.midia_metadados import MidiaMetadados
+from models.job import Job
+from models.evento_outbox import EventoOutbox
+from models.transcricao_segmento import TranscricaoSegmento
+from models.audio_fingerprint import AudioFingerprint
 
-__all__ = ['User', 'Radio', 'Gravacao', 'Agendamento', 'Tag', 'Clip', 'Cliente', 'gravacao_tags']
+__all__ = ['User', 'Radio', 'Gravacao', 'Agendamento', 'Tag', 'Clip', 'Cliente', 'MidiaMetadados', 'Job', 'EventoOutbox', 'TranscricaoSegmento', 'AudioFingerprint', 'gravacao_tags']
 
@@ -0,0 +1,19 @@
+from app import db
+
+
+class AudioFingerprint(db.Model):
+    """Índice invertido de impressões digitais: hash de par de picos -> (gravação, quadro).
+
+    A chave primária começa pelo hash, então a busca de uma referência é uma varredura
+    só de índice por hash, sem tocar no áudio. Inserido em massa (COPY) pela análise.
+    """
+    __tablename__ = 'audio_fingerprints'
+
+    hash = db.Column(db.Integer, primary_key=True)
+    gravacao_id = db.Column(db.String(36), db.ForeignKey('gravacoes.id', ondelete='CASCADE'), primary_key=True)
+    quadro = db.Column(db.Integer, primary_key=True)  # quadro do marco (utils.fingerprint.frame_seconds)
+
+    __table_args__ = (
+        # Trecho de uma gravação (referência de um clipe) e remoção em cascata
+        db.Index('ix_audio_fingerprints_gravacao_quadro', 'gravacao_id', 'quadro'),
+    )
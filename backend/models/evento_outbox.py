@@ -0,0 +1,13 @@
+from app import db
+from datetime import datetime
+
+
+class EventoOutbox(db.Model):
+    """Eventos de websocket emitidos fora do servidor web (worker), entregues pelo web."""
+    __tablename__ = 'eventos_outbox'
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    canal = db.Column(db.String(100), nullable=False)
+    tipo = db.Column(db.String(100), nullable=False)
+    dados = db.Column(db.Text)  # JSON
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow)
@@ -1,6 +1,7 @@
 from app import db
 from datetime import datetime
 from zoneinfo import ZoneInfo
+import json
 import uuid
 
 LOCAL_TZ = ZoneInfo("America/Fortaleza")
@@ -11,14 +12,23 @@ class Gravacao(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('usuarios.id'), nullable=False, index=True)
     radio_id = db.Column(db.String(36), db.ForeignKey('radios.id'), nullable=False, index=True)
-    status = db.Column(db.String(50), default='iniciando')  # iniciando, gravando, concluido, erro, processando
-    tipo = db.Column(db.String(50), default='manual')  # manual, agendado, massa
+    status = db.Column(db.String(50), default='iniciando')  # na_fila, iniciando, gravando, concluido, erro, processando, cancelado
+    tipo = db.Column(db.String(50), default='manual')  # manual, agendado, massa, retroativo
     arquivo_url = db.Column(db.String(500))
     arquivo_nome = db.Column(db.String(255))
     duracao_segundos = db.Column(db.Integer, default=0)
     duracao_minutos = db.Column(db.Integer, default=0)
     tamanho_mb = db.Column(db.Float, default=0.0)
     batch_id = db.Column(db.String(36))  # Para gravação em massa
+    ingest_mode = db.Column(db.String(20))  # copy (remux sem re-encode), encode ou ring (montada do buffer)
+    segmentado = db.Column(db.Boolean, default=False)  # segmentos HLS em storage/hls/<id> em vez de arquivo único
+    analisado_em = db.Column(db.DateTime(timezone=True))  # análise pós-gravação (picos etc.) concluída
+    dead_air_percent = db.Column(db.Float)  # % do áudio em silêncio/ruído sem programa
+    silencios = db.Column(db.Text)  # JSON [[inicio, fim], ...] em segundos
+    fala_percent = db.Column(db.Float)  # % do áudio classificado como fala (o resto é música/silêncio)
+    segmentos_fala = db.Column(db.Text)  # JSON [[inicio, fim], ...]; NULL = ainda não classificado
+    transcrito_em = db.Column(db.DateTime(timezone=True))  # segmentos em transcricao_segmentos
+    fingerprint_em = db.Column(db.DateTime(timezone=True))  # hashes em audio_fingerprints
     # Guardar timestamps com timezone para evitar deslocamento de hora
     criado_em = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(tz=LOCAL_TZ), index=True)
     atualizado_em = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(tz=LOCAL_TZ), onupdate=lambda: datetime.now(tz=LOCAL_TZ))
@@ -27,7 +37,41 @@ class Gravacao(db.Model):
     clips = db.relationship('Clip', backref='gravacao', lazy=True, cascade='all, delete-orphan')
     tags = db.relationship('Tag', secondary='gravacoes_tags', lazy='subquery', backref=db.backref('gravacoes', lazy=True))
     
-    def to_dict(self, include_radio=False):
+    def get_silencios_list(self):
+        """Retorna intervalos de silêncio como lista de [inicio, fim]"""
+        if not self.silencios:
+            return []
+        try:
+            return json.loads(self.silencios)
+        except Exception:
+            return []
+
+    def set_silencios_list(self, intervalos):
+        """Define intervalos de silêncio a partir de lista"""
+        self.silencios = json.dumps([list(item) for item in intervalos])
+
+    def get_segmentos_fala_list(self):
+        """Intervalos de fala como lista de [inicio, fim]; None se ainda não classificado"""
+        if self.segmentos_fala is None:
+            return None
+        try:
+            return json.loads(self.segmentos_fala)
+        except Exception:
+            return None
+
+    def set_segmentos_fala_list(self, intervalos):
+        """Define intervalos de fala a partir de lista"""
+        self.segmentos_fala = json.dumps([list(item) for item in intervalos])
+
+    @staticmethod
+    def _intervalos_count(raw):
+        """Quantos intervalos há no JSON [[inicio, fim], ...] sem decodificá-lo (listagens)."""
+        if raw is None:
+            return None
+        return max(0, raw.count('[') - 1)
+
+    def to_dict(self, include_radio=False, include_intervals=False):
+        """Listas de intervalos só com include_intervals (detalhe); listagens levam as contagens."""
         data = {
             'id': self.id,
             'user_id': self.user_id,
@@ -40,10 +84,24 @@ class Gravacao(db.Model):
             'duracao_minutos': self.duracao_minutos,
             'tamanho_mb': self.tamanho_mb,
             'batch_id': self.batch_id,
+            'ingest_mode': self.ingest_mode,
+            'segmentado': bool(self.segmentado),
+            'hls_url': f"/api/files/hls/{self.id}/index.m3u8" if self.segmentado else None,
+            'peaks_url': f"/api/files/peaks/{self.id}" if self.analisado_em else None,
+            'dead_air_percent': self.dead_air_percent,
+            'silencios_total': self._intervalos_count(self.silencios) or 0,
+            'fala_percent': self.fala_percent,
+            'segmentos_fala_total': self._intervalos_count(self.segmentos_fala),
+            'transcrito_em': self.transcrito_em.isoformat() if self.transcrito_em else None,
+            'fingerprint_em': self.fingerprint_em.isoformat() if self.fingerprint_em else None,
             'criado_em': self.criado_em.isoformat() if self.criado_em else None,
             'atualizado_em': self.atualizado_em.isoformat() if self.atualizado_em else None
         }
         
+        if include_intervals:
+            data['silencios'] = self.get_silencios_list()
+            data['segmentos_fala'] = self.get_segmentos_fala_list()
+
         if include_radio and self.radio:
             data['radios'] = {
                 'nome': self.radio.nome,
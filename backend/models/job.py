@@ -0,0 +1,69 @@
+from app import db
+from datetime import datetime
+import json
+import uuid
+
+
+class Job(db.Model):
+    """Tarefa assíncrona executada pelos processos do worker (worker.py)."""
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    tipo = db.Column(db.String(50), nullable=False)  # chave em services.job_service.JOB_HANDLERS
+    user_id = db.Column(db.String(36), db.ForeignKey('usuarios.id'), nullable=False, index=True)
+    gravacao_id = db.Column(db.String(36), db.ForeignKey('gravacoes.id', ondelete='CASCADE'), index=True)
+    payload = db.Column(db.Text)  # JSON
+    status = db.Column(db.String(20), default='pendente', index=True)  # pendente, executando, concluido, erro, cancelado
+    progresso = db.Column(db.Float, default=0.0)  # 0-100
+    mensagem = db.Column(db.String(255))
+    resultado = db.Column(db.Text)  # JSON
+    erro = db.Column(db.Text)
+    tentativas = db.Column(db.Integer, default=0)
+    max_tentativas = db.Column(db.Integer, default=3)
+    cancelar = db.Column(db.Boolean, default=False)  # pedido de cancelamento de job em execução
+    worker = db.Column(db.String(100))
+    disponivel_em = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # backoff entre tentativas
+    heartbeat_em = db.Column(db.DateTime)
+    iniciado_em = db.Column(db.DateTime)
+    finalizado_em = db.Column(db.DateTime)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def get_payload(self):
+        if not self.payload:
+            return {}
+        try:
+            return json.loads(self.payload)
+        except Exception:
+            return {}
+
+    def set_payload(self, data):
+        self.payload = json.dumps(data or {})
+
+    def get_resultado(self):
+        if not self.resultado:
+            return None
+        try:
+            return json.loads(self.resultado)
+        except Exception:
+            return None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'user_id': self.user_id,
+            'gravacao_id': self.gravacao_id,
+            'status': self.status,
+            'progresso': self.progresso or 0.0,
+            'mensagem': self.mensagem,
+            'resultado': self.get_resultado(),
+            'erro': self.erro,
+            'tentativas': self.tentativas or 0,
+            'max_tentativas': self.max_tentativas,
+            'cancelar': bool(self.cancelar),
+            'iniciado_em': self.iniciado_em.isoformat() if self.iniciado_em else None,
+            'finalizado_em': self.finalizado_em.isoformat() if self.finalizado_em else None,
+            'criado_em': self.criado_em.isoformat() if self.criado_em else None,
+            'atualizado_em': self.atualizado_em.isoformat() if self.atualizado_em else None,
+        }
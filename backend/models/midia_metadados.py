@@ -0,0 +1,16 @@
+from app import db
+from datetime import datetime
+
+
+class MidiaMetadados(db.Model):
+    """Cache de metadados de arquivos de mídia, válido enquanto tamanho e mtime não mudarem."""
+    __tablename__ = 'midia_metadados'
+
+    caminho = db.Column(db.String(500), primary_key=True)  # relativo a STORAGE_PATH
+    tamanho_bytes = db.Column(db.BigInteger, nullable=False)
+    mtime_ns = db.Column(db.BigInteger, nullable=False)
+    duracao_segundos = db.Column(db.Integer)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def matches(self, stat_result):
+        return self.tamanho_bytes == stat_result.st_size and self.mtime_ns == stat_result.st_mtime_ns
@@ -15,6 +15,9 @@ class Radio(db.Model):
     bitrate_kbps = db.Column(db.Integer, default=128)
     output_format = db.Column(db.String(10), default='mp3')  # mp3 ou opus
     audio_mode = db.Column(db.String(10), default='stereo')  # stereo ou mono
+    ring_buffer_enabled = db.Column(db.Boolean, default=False)  # captura contínua para gravações retroativas
+    ring_buffer_hours = db.Column(db.Integer, default=2)  # horas mantidas no buffer em disco
+    dead_air_alerta = db.Column(db.Boolean, default=False)  # última gravação analisada passou do limite de ar morto
     criado_em = db.Column(db.DateTime, default=datetime.utcnow)
     atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -34,6 +37,9 @@ class Radio(db.Model):
             'bitrate_kbps': self.bitrate_kbps,
             'output_format': self.output_format,
             'audio_mode': self.audio_mode,
+            'ring_buffer_enabled': bool(self.ring_buffer_enabled),
+            'ring_buffer_hours': self.ring_buffer_hours,
+            'dead_air_alerta': bool(self.dead_air_alerta),
             'criado_em': self.criado_em.isoformat() if self.criado_em else None,
             'atualizado_em': self.atualizado_em.isoformat() if self.atualizado_em else None
         }
@@ -0,0 +1,50 @@
+from app import db
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import TSVECTOR
+import json
+
+# Configuração de busca textual: português com stemming, sem acentos (criada em app.ensure_search_config)
+SEARCH_CONFIG = 'pt_unaccent'
+SEARCH_VECTOR_SQL = f"to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(texto, ''))"
+
+
+class TranscricaoSegmento(db.Model):
+    """Trecho transcrito de uma gravação, com tempos por palavra (segundos no arquivo)."""
+    __tablename__ = 'transcricao_segmentos'
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    gravacao_id = db.Column(db.String(36), db.ForeignKey('gravacoes.id', ondelete='CASCADE'), nullable=False, index=True)
+    inicio = db.Column(db.Float, nullable=False)
+    fim = db.Column(db.Float, nullable=False)
+    texto = db.Column(db.Text)
+    palavras = db.Column(db.Text)  # JSON [[palavra, inicio, fim, prob], ...]
+    engine = db.Column(db.String(50))
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+    # Vetor de busca gerado pelo banco a partir do texto; consultado via índice GIN
+    busca = db.Column(TSVECTOR, db.Computed(SEARCH_VECTOR_SQL, persisted=True))
+
+    __table_args__ = (
+        db.Index('ix_transcricao_segmentos_busca', 'busca', postgresql_using='gin'),
+    )
+
+    def get_palavras_list(self):
+        if not self.palavras:
+            return []
+        try:
+            return json.loads(self.palavras)
+        except Exception:
+            return []
+
+    def set_palavras_list(self, palavras):
+        self.palavras = json.dumps([list(p) for p in palavras])
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'gravacao_id': self.gravacao_id,
+            'inicio': self.inicio,
+            'fim': self.fim,
+            'texto': self.texto,
+            'palavras': self.get_palavras_list(),
+            'engine': self.engine,
+        }
@@ -0,0 +1,43 @@
+from flask import Blueprint, request, jsonify
+from models.clip import Clip
+from models.gravacao import Gravacao
+from utils.jwt_utils import token_required, decode_token
+from flask import request as flask_request
+from services.fingerprint_service import find_airings
+
+bp = Blueprint('clips', __name__)
+
+def get_user_ctx():
+    token = flask_request.headers.get('Authorization', '').replace('Bearer ', '')
+    payload = decode_token(token) or {}
+    return {
+        'user_id': payload.get('user_id'),
+        'is_admin': payload.get('is_admin', False),
+    }
+
+@bp.route('/<clip_id>/ocorrencias', methods=['GET'])
+@token_required
+def get_clip_ocorrencias(clip_id):
+    """Todas as veiculações do áudio do clipe (vinheta, comercial) nas gravações indexadas."""
+    ctx = get_user_ctx()
+    clip = Clip.query.get(clip_id)
+    if not clip:
+        return jsonify({'error': 'Clip not found'}), 404
+    gravacao = Gravacao.query.get(clip.gravacao_id)
+    if not ctx.get('is_admin') and (not gravacao or gravacao.user_id != ctx.get('user_id')):
+        return jsonify({'error': 'Clip not found'}), 404
+
+    try:
+        min_votos = int(request.args.get('min_votos')) if request.args.get('min_votos') else None
+    except ValueError:
+        return jsonify({'error': 'min_votos deve ser inteiro'}), 400
+
+    try:
+        result = find_airings(
+            clip,
+            user_id=None if ctx.get('is_admin') else ctx.get('user_id'),
+            min_votes=min_votos,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify(result), 200
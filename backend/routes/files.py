@@ -1,22 +1,64 @@
-from flask import Blueprint, send_file, jsonify, current_app
+from flask import Blueprint, jsonify, current_app, request
+import math
 import os
 
+from models.gravacao import Gravacao
+from services.analysis_service import peaks_path
+from services.live_audio_service import stream_live_audio
+from services.recording_service import is_recording_file
+from utils.media_response import send_media
+from utils.peaks import read_level, read_peaks_header
+
 bp = Blueprint('files', __name__)
 
+def _audio_mimetype(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.opus':
+        return 'audio/ogg'
+    if ext == '.flac':
+        return 'audio/flac'
+    return 'audio/mpeg'
+
 @bp.route('/audio/<filename>', methods=['GET'])
 def get_audio(filename):
     """Servir arquivo de áudio sem exigir header Authorization (usado em <audio> tag)."""
     audio_path = os.path.join(current_app.config['STORAGE_PATH'], 'audio', filename)
     if not os.path.exists(audio_path):
         return jsonify({'error': 'File not found'}), 404
-    ext = os.path.splitext(filename)[1].lower()
-    if ext == '.opus':
-        mimetype = 'audio/ogg'
-    elif ext == '.flac':
-        mimetype = 'audio/flac'
-    else:
+    return send_media(
+        audio_path,
+        _audio_mimetype(filename),
+        relative_path=f'audio/{filename}',
+        growing=is_recording_file(audio_path),
+    )
+
+@bp.route('/audio/<gravacao_id>/live', methods=['GET'])
+def get_audio_live(gravacao_id):
+    """Áudio da gravação em andamento, seguindo o arquivo até ela terminar (sem Authorization).
+
+    Query: `offset` em bytes (negativo = a partir do fim atual). Resposta chunked sem tamanho.
+    """
+    gravacao = Gravacao.query.get(gravacao_id)
+    if not gravacao:
+        return jsonify({'error': 'File not found'}), 404
+    try:
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'Invalid parameters'}), 400
+    if gravacao.segmentado:
         mimetype = 'audio/mpeg'
-    return send_file(audio_path, mimetype=mimetype)
+    elif gravacao.arquivo_nome:
+        mimetype = _audio_mimetype(gravacao.arquivo_nome)
+    else:
+        return jsonify({'error': 'File not found'}), 404
+
+    response = current_app.response_class(
+        stream_live_audio(gravacao, offset), mimetype=mimetype, direct_passthrough=True
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    # nginx repassa cada bloco assim que chega, sem acumular no proxy
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @bp.route('/clips/<filename>', methods=['GET'])
 def get_clip(filename):
@@ -24,4 +66,79 @@ def get_clip(filename):
     clip_path = os.path.join(current_app.config['STORAGE_PATH'], 'clips', filename)
     if not os.path.exists(clip_path):
         return jsonify({'error': 'File not found'}), 404
-    return send_file(clip_path, mimetype='audio/mpeg')
+    mimetype = 'audio/ogg' if filename.lower().endswith('.opus') else 'audio/mpeg'
+    return send_media(clip_path, mimetype, relative_path=f'clips/{filename}')
+
+@bp.route('/hls/<gravacao_id>/<filename>', methods=['GET'])
+def get_hls(gravacao_id, filename):
+    """Playlist/segmentos HLS de gravação segmentada (toca enquanto ainda grava)."""
+    if '/' in gravacao_id or '..' in gravacao_id or '/' in filename or '..' in filename:
+        return jsonify({'error': 'File not found'}), 404
+    path = os.path.join(current_app.config['STORAGE_PATH'], 'hls', gravacao_id, filename)
+    if not os.path.exists(path):
+        return jsonify({'error': 'File not found'}), 404
+    relative_path = f'hls/{gravacao_id}/{filename}'
+    if filename.endswith('.m3u8'):
+        # Playlist muda a cada segmento novo enquanto a gravação está em andamento
+        return send_media(path, 'application/vnd.apple.mpegurl', relative_path=relative_path, growing=True)
+    # Segmento fechado nunca muda
+    return send_media(path, 'audio/mpeg', relative_path=relative_path)
+
+@bp.route('/peaks/<gravacao_id>', methods=['GET'])
+def get_peaks(gravacao_id):
+    """Picos da forma de onda no nível de detalhe pedido (sem Authorization, como o áudio).
+
+    Query: `level` (0 = 10 ms por bucket) ou `width` (buckets que a tela vai desenhar) e
+    opcionalmente `start`/`end` em segundos. Resposta binária int8 [min, max] intercalados;
+    os cabeçalhos X-Peaks-* descrevem nível, duração do bucket e posição do trecho.
+    """
+    if '/' in gravacao_id or '..' in gravacao_id:
+        return jsonify({'error': 'File not found'}), 404
+    path = peaks_path(gravacao_id)
+    if not os.path.exists(path):
+        return jsonify({'error': 'Peaks not found'}), 404
+
+    try:
+        start = max(0.0, float(request.args.get('start', 0)))
+        end = float(request.args['end']) if request.args.get('end') else None
+        width = int(request.args['width']) if request.args.get('width') else None
+        level = int(request.args['level']) if request.args.get('level') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid parameters'}), 400
+    # float() aceita "nan"/"inf", que quebrariam o cálculo dos buckets; fim tem de vir depois do início
+    if not math.isfinite(start) or (end is not None and (not math.isfinite(end) or end <= start)):
+        return jsonify({'error': 'Invalid parameters'}), 400
+
+    with open(path, 'rb') as fh:
+        try:
+            bucket_ms, factor, counts = read_peaks_header(fh)
+        except Exception:
+            return jsonify({'error': 'Peaks not found'}), 404
+        total_ms = counts[0] * bucket_ms
+        span_ms = ((end * 1000) if end is not None else total_ms) - start * 1000
+        if level is None:
+            # Nível mais grosso que ainda entrega pelo menos `width` buckets no trecho
+            level = len(counts) - 1
+            if width:
+                level = 0
+                for candidate in range(len(counts) - 1, -1, -1):
+                    if span_ms / (bucket_ms * factor ** candidate) >= width:
+                        level = candidate
+                        break
+        level = max(0, min(level, len(counts) - 1))
+        level_ms = bucket_ms * factor ** level
+        start_bucket = int(start * 1000 // level_ms)
+        end_bucket = math.ceil(end * 1000 / level_ms) if end is not None else None
+        data = read_level(fh, counts, level, start_bucket, end_bucket)
+
+    response = current_app.response_class(data, mimetype='application/octet-stream')
+    response.headers['X-Peaks-Level'] = str(level)
+    response.headers['X-Peaks-Levels'] = str(len(counts))
+    response.headers['X-Peaks-Bucket-Ms'] = str(level_ms)
+    response.headers['X-Peaks-Start-Bucket'] = str(min(start_bucket, counts[level]))
+    response.headers['X-Peaks-Total-Buckets'] = str(counts[level])
+    response.headers['Access-Control-Expose-Headers'] = (
+        'X-Peaks-Level, X-Peaks-Levels, X-Peaks-Bucket-Ms, X-Peaks-Start-Bucket, X-Peaks-Total-Buckets'
+    )
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response
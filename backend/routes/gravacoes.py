@@ -1,17 +1,27 @@
-from flask import Blueprint, request, jsonify
+import os
+
+from flask import Blueprint, current_app, request, jsonify
 from app import db
 from models.gravacao import Gravacao
 from models.agendamento import Agendamento
 from models.radio import Radio
 from models.user import User
+from models.transcricao_segmento import SEARCH_CONFIG, TranscricaoSegmento
 from utils.jwt_utils import token_required, decode_token
 from flask import request as flask_request
 from datetime import datetime
 from sqlalchemy import and_, or_, desc
-from services.recording_service import hydrate_gravacao_metadata
+from sqlalchemy.orm import aliased
+from config import Config
+from services.recording_service import create_retroactive_gravacao, concat_gravacao_segments, recording_progress
+from utils.zip_stream import stream_zip
+from zoneinfo import ZoneInfo
+from datetime import timedelta
 
 bp = Blueprint('gravacoes', __name__)
 MAX_PER_PAGE = 100
+MAX_SEARCH_HITS = 20  # trechos por gravação na resposta da busca
+LOCAL_TZ = ZoneInfo("America/Fortaleza")
 
 def _parse_positive_int(value, default):
     try:
@@ -37,10 +47,13 @@ def _parse_iso_datetime(value):
     except Exception:
         return None
 
-def _apply_gravacoes_filters(query, *, user_id, is_admin, radio_id=None, data_filter=None, cidade=None, estado=None, status=None, tipo=None):
+def _apply_gravacoes_filters(query, *, user_id, is_admin, radio_id=None, data_filter=None, cidade=None, estado=None, status=None, tipo=None, data_inicio=None, data_fim=None, batch_id=None):
     if not is_admin:
         query = query.filter(Gravacao.user_id == user_id)
 
+    if batch_id:
+        query = query.filter(Gravacao.batch_id == batch_id)
+
     if radio_id and radio_id != 'all':
         query = query.filter(Gravacao.radio_id == radio_id)
 
@@ -58,6 +71,18 @@ def _apply_gravacoes_filters(query, *, user_id, is_admin, radio_id=None, data_fi
         except Exception:
             pass
 
+    # Intervalo de datas (YYYY-MM-DD, fim inclusivo), ex.: "esta semana"
+    if data_inicio:
+        try:
+            query = query.filter(Gravacao.criado_em >= datetime.strptime(data_inicio, '%Y-%m-%d'))
+        except Exception:
+            pass
+    if data_fim:
+        try:
+            query = query.filter(Gravacao.criado_em < datetime.strptime(data_fim, '%Y-%m-%d') + timedelta(days=1))
+        except Exception:
+            pass
+
     if cidade or estado:
         query = query.join(Radio)
         if cidade:
@@ -99,7 +124,8 @@ def create_gravacao():
         duracao_minutos=data.get('duracao_minutos', 0),
         duracao_segundos=data.get('duracao_segundos', 0),
         tamanho_mb=data.get('tamanho_mb', 0.0),
-        batch_id=data.get('batch_id')
+        batch_id=data.get('batch_id'),
+        segmentado=bool(data.get('segmentado', Config.RECORDING_SEGMENTED)),
     )
 
     db.session.add(gravacao)
@@ -107,6 +133,50 @@ def create_gravacao():
 
     return jsonify(gravacao.to_dict(include_radio=True)), 201
 
+@bp.route('/retroativa', methods=['POST'])
+@token_required
+def create_gravacao_retroativa():
+    """Cria gravação de uma janela passada (inicio/fim ou ultimos `minutos`) a partir do buffer da rádio."""
+    ctx = get_user_ctx()
+    data = request.get_json() or {}
+
+    radio = Radio.query.filter_by(id=data.get('radio_id')).first()
+    if not radio:
+        return jsonify({'error': 'Radio not found'}), 404
+    if not radio.ring_buffer_enabled:
+        return jsonify({'error': 'Ring buffer disabled for this radio'}), 400
+
+    minutos = _parse_positive_int(data.get('minutos'), 0)
+    if minutos:
+        end_dt = datetime.now(tz=LOCAL_TZ)
+        start_dt = end_dt - timedelta(minutes=minutos)
+    else:
+        start_dt = _parse_iso_datetime(data.get('inicio'))
+        end_dt = _parse_iso_datetime(data.get('fim'))
+        if not start_dt or not end_dt:
+            return jsonify({'error': 'inicio and fim (or minutos) are required'}), 400
+        # Sem offset explícito, assume horário local
+        if not start_dt.tzinfo:
+            start_dt = start_dt.replace(tzinfo=LOCAL_TZ)
+        if not end_dt.tzinfo:
+            end_dt = end_dt.replace(tzinfo=LOCAL_TZ)
+
+    try:
+        gravacao, clip = create_retroactive_gravacao(
+            radio,
+            ctx.get('user_id'),
+            start_dt,
+            end_dt,
+            palavra_chave=(data.get('palavra_chave') or '').strip() or None,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 422
+
+    payload = gravacao.to_dict(include_radio=True)
+    if clip:
+        payload['clip'] = clip.to_dict()
+    return jsonify(payload), 201
+
 @bp.route('', methods=['GET'])
 @token_required
 def get_gravacoes():
@@ -175,8 +245,7 @@ def get_gravacoes():
 
     gravacoes = gravacoes_query.offset(offset).limit(limit).all()
 
-    # Enriquecer metadados com dados reais do arquivo (duracao, tamanho, status)
-    gravacoes = [hydrate_gravacao_metadata(g, autocommit=True) for g in gravacoes]
+    # Metadados (duracao, tamanho, status) são conciliados pelo job do scheduler: rota só lê
 
     payload = [g.to_dict(include_radio=True) for g in gravacoes]
 
@@ -221,21 +290,174 @@ def get_gravacoes():
     return jsonify({'items': payload, 'meta': meta}), 200
 
 
+def _zip_component(value):
+    cleaned = ''.join('_' if ch in '/\\:*?"<>|' else ch for ch in (value or '').strip())
+    return cleaned or 'sem_nome'
+
+@bp.route('/export', methods=['GET'])
+@token_required
+def export_gravacoes():
+    """ZIP (sem compressão) com os áudios de um lote (`batch_id`) ou dos mesmos filtros da listagem.
+
+    O arquivo é montado enquanto é enviado: nada vai para o disco e o download começa na hora.
+    Entradas em `<rádio>/<arquivo>`; gravações sem arquivo ficam de fora.
+    """
+    ctx = get_user_ctx()
+    query = _apply_gravacoes_filters(
+        Gravacao.query,
+        user_id=ctx.get('user_id'),
+        is_admin=ctx.get('is_admin', False),
+        radio_id=request.args.get('radio_id'),
+        data_filter=request.args.get('data'),
+        cidade=(request.args.get('cidade') or '').strip() or None,
+        estado=(request.args.get('estado') or '').strip() or None,
+        status=(request.args.get('status') or '').strip() or None,
+        tipo=(request.args.get('tipo') or '').strip() or None,
+        data_inicio=request.args.get('data_inicio'),
+        data_fim=request.args.get('data_fim'),
+        batch_id=(request.args.get('batch_id') or '').strip() or None,
+    )
+    # Nome da rádio por subconsulta com alias: o filtro de cidade/estado já faz JOIN em radios
+    radio = aliased(Radio)
+    radio_nome = db.session.query(radio.nome).filter(radio.id == Gravacao.radio_id).correlate(Gravacao).scalar_subquery()
+    rows = (
+        query.filter(Gravacao.arquivo_nome.isnot(None))
+        .with_entities(Gravacao.arquivo_nome, radio_nome)
+        .order_by(Gravacao.criado_em, Gravacao.id)
+        .all()
+    )
+    if not rows:
+        return jsonify({'error': 'Nenhuma gravacao com arquivo para exportar'}), 404
+
+    audio_dir = os.path.join(Config.STORAGE_PATH, 'audio')
+    entries = [
+        (f"{_zip_component(radio_nome)}/{_zip_component(os.path.basename(arquivo_nome))}",
+         os.path.join(audio_dir, os.path.basename(arquivo_nome)))
+        for arquivo_nome, radio_nome in rows
+    ]
+    label = request.args.get('batch_id') or request.args.get('data') or datetime.now(LOCAL_TZ).strftime('%Y-%m-%d')
+    response = current_app.response_class(stream_zip(entries), mimetype='application/zip', direct_passthrough=True)
+    response.headers['Content-Disposition'] = f'attachment; filename="gravacoes_{_zip_component(label)}.zip"'
+    response.headers['Cache-Control'] = 'no-store'
+    # nginx repassa os blocos conforme saem, sem acumular o ZIP no proxy
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @bp.route('/ongoing', methods=['GET'])
 @token_required
 def get_ongoing():
-    """Retorna gravações em andamento (gravando/iniciando/processando). Admin vê todas."""
+    """Retorna gravações em andamento (na_fila/gravando/iniciando/processando). Admin vê todas."""
     ctx = get_user_ctx()
     user_id = ctx.get('user_id')
     is_admin = ctx.get('is_admin', False)
-    query = Gravacao.query.filter(Gravacao.status.in_(('iniciando', 'gravando', 'processando')))
+    query = Gravacao.query.filter(Gravacao.status.in_(('na_fila', 'iniciando', 'gravando', 'processando')))
     if not is_admin:
         query = query.filter_by(user_id=user_id)
 
 
     gravacoes = query.order_by(Gravacao.criado_em.desc()).all()
-    gravacoes = [hydrate_gravacao_metadata(g, autocommit=True) for g in gravacoes]
-    return jsonify([g.to_dict(include_radio=True) for g in gravacoes]), 200
+    result = []
+    for gravacao in gravacoes:
+        data = gravacao.to_dict(include_radio=True)
+        # Gravações ativas trazem o progresso do ffmpeg
+        progresso = recording_progress(gravacao.id)
+        if progresso is not None:
+            data['progresso'] = progresso
+        result.append(data)
+    return jsonify(result), 200
+
+@bp.route('/search', methods=['GET'])
+@token_required
+def search_gravacoes():
+    """Busca nas transcrições (índice GIN, português sem acentos) com os filtros da listagem.
+
+    Query: `q` (sintaxe de busca web: "frase exata", OR, -excluir), filtros de
+    `GET /api/gravacoes`, `data_inicio`/`data_fim`, `ordem` (relevancia|recente) e
+    `page`/`per_page`. Cada gravação traz até MAX_SEARCH_HITS trechos com offsets e snippet.
+    """
+    ctx = get_user_ctx()
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+    page = _parse_positive_int(request.args.get('page'), 1)
+    per_page = min(_parse_positive_int(request.args.get('per_page'), 10), MAX_PER_PAGE)
+    ordem = (request.args.get('ordem') or 'relevancia').strip()
+
+    tsquery = db.func.websearch_to_tsquery(db.literal_column(f"'{SEARCH_CONFIG}'::regconfig"), q)
+    matches = TranscricaoSegmento.busca.op('@@')(tsquery)
+    rank = db.func.max(db.func.ts_rank_cd(TranscricaoSegmento.busca, tsquery)).label('rank')
+    grouped = _apply_gravacoes_filters(
+        db.session.query(Gravacao.id, Gravacao.criado_em, rank, db.func.count(TranscricaoSegmento.id).label('hits'))
+        .join(TranscricaoSegmento, TranscricaoSegmento.gravacao_id == Gravacao.id)
+        .filter(matches),
+        user_id=ctx.get('user_id'),
+        is_admin=ctx.get('is_admin', False),
+        radio_id=request.args.get('radio_id'),
+        data_filter=request.args.get('data'),
+        cidade=(request.args.get('cidade') or '').strip() or None,
+        estado=(request.args.get('estado') or '').strip() or None,
+        status=(request.args.get('status') or '').strip() or None,
+        tipo=(request.args.get('tipo') or '').strip() or None,
+        data_inicio=(request.args.get('data_inicio') or '').strip() or None,
+        data_fim=(request.args.get('data_fim') or '').strip() or None,
+    ).group_by(Gravacao.id, Gravacao.criado_em)
+
+    total = db.session.query(db.func.count()).select_from(grouped.subquery()).scalar() or 0
+    if ordem == 'recente':
+        grouped = grouped.order_by(Gravacao.criado_em.desc(), Gravacao.id.desc())
+    else:
+        grouped = grouped.order_by(desc('rank'), Gravacao.criado_em.desc(), Gravacao.id.desc())
+    page_rows = grouped.offset((page - 1) * per_page).limit(per_page).all()
+    ids = [row.id for row in page_rows]
+
+    # Trechos só das gravações da página; ts_headline roda apenas nessas linhas
+    hits_by_id = {gid: [] for gid in ids}
+    if ids:
+        numbered = (
+            db.session.query(
+                TranscricaoSegmento.gravacao_id,
+                TranscricaoSegmento.inicio,
+                TranscricaoSegmento.fim,
+                TranscricaoSegmento.texto,
+                db.func.row_number().over(
+                    partition_by=TranscricaoSegmento.gravacao_id,
+                    order_by=TranscricaoSegmento.inicio,
+                ).label('n'),
+            )
+            .filter(TranscricaoSegmento.gravacao_id.in_(ids), matches)
+            .subquery()
+        )
+        snippet = db.func.ts_headline(
+            db.literal_column(f"'{SEARCH_CONFIG}'::regconfig"), numbered.c.texto, tsquery,
+            'StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=10',
+        )
+        rows = (
+            db.session.query(numbered.c.gravacao_id, numbered.c.inicio, numbered.c.fim, snippet)
+            .filter(numbered.c.n <= MAX_SEARCH_HITS)
+            .order_by(numbered.c.gravacao_id, numbered.c.inicio)
+            .all()
+        )
+        for gid, inicio, fim, trecho in rows:
+            hits_by_id[gid].append({'inicio': inicio, 'fim': fim, 'snippet': trecho})
+
+    gravacoes = {g.id: g for g in Gravacao.query.filter(Gravacao.id.in_(ids)).all()} if ids else {}
+    items = [
+        {
+            'gravacao_id': row.id,
+            'gravacao': gravacoes[row.id].to_dict(include_radio=True) if row.id in gravacoes else None,
+            'relevancia': float(row.rank or 0),
+            'total_ocorrencias': int(row.hits or 0),
+            'ocorrencias': hits_by_id.get(row.id, []),
+        }
+        for row in page_rows
+    ]
+    meta = {
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'total_pages': (total + per_page - 1) // per_page if total else 0,
+    }
+    return jsonify({'items': items, 'meta': meta}), 200
 
 @bp.route('/<gravacao_id>', methods=['GET'])
 @token_required
@@ -248,7 +470,24 @@ def get_gravacao(gravacao_id):
         return jsonify({'error': 'Gravacao not found'}), 404
     if not is_admin and not _gravacao_access_allowed(gravacao, ctx):
         return jsonify({'error': 'Gravacao not found'}), 404
-    gravacao = hydrate_gravacao_metadata(gravacao, autocommit=True)
+    return jsonify(gravacao.to_dict(include_radio=True, include_intervals=True)), 200
+
+@bp.route('/<gravacao_id>/concat', methods=['POST'])
+@token_required
+def concat_gravacao(gravacao_id):
+    """Gera o arquivo único (download/arquivo) de uma gravação segmentada encerrada."""
+    ctx = get_user_ctx()
+    is_admin = ctx.get('is_admin', False)
+    gravacao = Gravacao.query.filter_by(id=gravacao_id).first()
+    if not gravacao:
+        return jsonify({'error': 'Gravacao not found'}), 404
+    if not is_admin and not _gravacao_access_allowed(gravacao, ctx):
+        return jsonify({'error': 'Gravacao not found'}), 404
+    data = request.get_json(silent=True) or {}
+    try:
+        concat_gravacao_segments(gravacao, remove_segments=bool(data.get('remover_segmentos')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
     return jsonify(gravacao.to_dict(include_radio=True)), 200
 
 @bp.route('/<gravacao_id>', methods=['DELETE'])
@@ -3,6 +3,7 @@ from app import db
 from models.radio import Radio
 from utils.jwt_utils import token_required, decode_token
 from flask import request as flask_request
+from config import Config
 
 bp = Blueprint('radios', __name__)
 
@@ -37,6 +38,13 @@ def _sanitize_audio_mode(value):
     value = (value or '').lower()
     return value if value in ALLOWED_AUDIO_MODES else 'stereo'
 
+def _sanitize_ring_hours(value):
+    try:
+        ivalue = int(value)
+    except Exception:
+        return Config.RING_BUFFER_DEFAULT_HOURS
+    return max(1, min(ivalue, Config.RING_BUFFER_MAX_HOURS))
+
 @bp.route('', methods=['GET'])
 @token_required
 def get_radios():
@@ -76,6 +84,8 @@ def create_radio():
         bitrate_kbps=bitrate,
         output_format=output_format,
         audio_mode=audio_mode,
+        ring_buffer_enabled=bool(data.get('ring_buffer_enabled', False)),
+        ring_buffer_hours=_sanitize_ring_hours(data.get('ring_buffer_hours', Config.RING_BUFFER_DEFAULT_HOURS)),
     )
     
     db.session.add(radio)
@@ -115,6 +125,10 @@ def update_radio(radio_id):
         radio.output_format = _sanitize_format(data.get('output_format'))
     if 'audio_mode' in data:
         radio.audio_mode = _sanitize_audio_mode(data.get('audio_mode'))
+    if 'ring_buffer_enabled' in data:
+        radio.ring_buffer_enabled = bool(data.get('ring_buffer_enabled'))
+    if 'ring_buffer_hours' in data:
+        radio.ring_buffer_hours = _sanitize_ring_hours(data.get('ring_buffer_hours'))
     
     db.session.commit()
     
@@ -1,9 +1,13 @@
 from flask import Blueprint, request, jsonify
 from app import db
 from models.gravacao import Gravacao
+from models.job import Job
 from utils.jwt_utils import token_required, decode_token
 from flask import request as flask_request
 from services.recording_service import start_recording, stop_recording
+from services.job_service import cancel_job, enqueue_job
+from services.recording_supervisor import supervisor
+from services.websocket_service import broadcast_update
 
 bp = Blueprint('recording', __name__)
 
@@ -31,9 +35,13 @@ def start():
     if not gravacao:
         return jsonify({'error': 'Gravacao not found'}), 404
     
+    if 'segmentado' in data:
+        gravacao.segmentado = bool(data.get('segmentado'))
+
     try:
-        start_recording(gravacao)
-        return jsonify({'message': 'Recording started', 'gravacao': gravacao.to_dict()}), 200
+        started = start_recording(gravacao)
+        message = 'Recording started' if started else 'Recording queued'
+        return jsonify({'message': message, 'gravacao': gravacao.to_dict()}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -54,6 +62,15 @@ def stop(recording_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/supervisor', methods=['GET'])
+@token_required
+def supervisor_status():
+    """Orçamento de CPU, gravações ativas, profundidade da fila e tempos de espera (admin)."""
+    ctx = get_user_ctx()
+    if not ctx.get('is_admin'):
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(supervisor.stats()), 200
+
 @bp.route('/process-ai', methods=['POST'])
 @token_required
 def process_ai():
@@ -72,10 +89,41 @@ def process_ai():
     if not gravacao:
         return jsonify({'error': 'Gravacao not found'}), 404
     
-    # Processar com IA (implementar em recording_service)
-    from services.recording_service import process_audio_with_ai
+    # Processamento roda no worker de jobs; a resposta sai na hora com o id do job
     try:
-        result = process_audio_with_ai(gravacao, palavras_chave)
-        return jsonify({'message': 'Processing started', 'result': result}), 200
+        job = enqueue_job(
+            'process_ai',
+            gravacao.user_id,
+            {'palavras_chave': palavras_chave},
+            gravacao_id=gravacao.id,
+        )
+        db.session.commit()
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
+    broadcast_update(f'user_{job.user_id}', 'job_updated', job.to_dict())
+    return jsonify({'message': 'Processing queued', 'job_id': job.id, 'job': job.to_dict()}), 202
+
+def _get_job(job_id):
+    ctx = get_user_ctx()
+    if ctx.get('is_admin', False):
+        return Job.query.filter_by(id=job_id).first()
+    return Job.query.filter_by(id=job_id, user_id=ctx.get('user_id')).first()
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_job(job_id):
+    job = _get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+@bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+@token_required
+def cancel(job_id):
+    job = _get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if not cancel_job(job):
+        return jsonify({'error': 'Job already finished', 'job': job.to_dict()}), 409
+    return jsonify({'message': 'Cancellation requested', 'job': job.to_dict()}), 200
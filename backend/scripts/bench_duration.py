@@ -0,0 +1,67 @@
+"""Compara o custo por arquivo de ler a duração via audio_info (Python puro) e via ffprobe.
+
+Uso (a partir de backend/):
+    python scripts/bench_duration.py [arquivos...]
+
+Sem argumentos usa os arquivos de storage/audio.
+"""
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.audio_frames import audio_info  # noqa: E402
+
+STORAGE_AUDIO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'storage', 'audio')
+REPEAT = 20
+
+
+def ffprobe_duration(path):
+    out = subprocess.check_output(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', path],
+        stderr=subprocess.DEVNULL,
+    )
+    return float(out.strip())
+
+
+def bench(fn, paths, repeat):
+    start = time.perf_counter()
+    results = {}
+    for _ in range(repeat):
+        for path in paths:
+            results[path] = fn(path)
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(paths)), results
+
+
+def main(argv):
+    paths = list(argv)
+    if not paths and os.path.isdir(STORAGE_AUDIO):
+        paths = [
+            os.path.join(STORAGE_AUDIO, name)
+            for name in sorted(os.listdir(STORAGE_AUDIO))
+            if name.endswith(('.mp3', '.opus'))
+        ]
+    if not paths:
+        print('Nenhum arquivo para medir.')
+        return 1
+
+    per_file, native = bench(lambda p: (audio_info(p) or (None,))[0], paths, REPEAT)
+    print(f"audio_info: {per_file * 1e6:9.1f} us/arquivo ({len(paths)} arquivos x {REPEAT})")
+
+    try:
+        per_file_probe, probed = bench(ffprobe_duration, paths, 1)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"ffprobe indisponível: {e}")
+        return 0
+    print(f"ffprobe:    {per_file_probe * 1e6:9.1f} us/arquivo ({per_file_probe / per_file:.0f}x mais lento)")
+
+    worst = max(abs((native[p] or 0) - probed[p]) for p in paths)
+    print(f"maior diferença de duração: {worst:.3f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
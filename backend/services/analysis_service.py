@@ -0,0 +1,318 @@
+"""Análise das gravações finalizadas numa única passada de decodificação.
+
+O ffmpeg decodifica o arquivo para PCM mono de baixa taxa, lido em blocos de tamanho
+fixo; todos os analisadores recebem os mesmos blocos, então a memória fica constante
+mesmo em gravações de 12h e o arquivo é decodificado uma vez só.
+
+A análise roda como job (ANALYSIS_JOB) nos processos de worker.py: o trabalho em numpy
+não disputa o hub do eventlet com as requisições e os sockets do web.
+"""
+import io
+import os
+import subprocess
+from datetime import datetime
+
+import numpy as np
+
+from app import db
+from config import Config
+from models.audio_fingerprint import AudioFingerprint
+from models.gravacao import Gravacao
+from services.hls_service import hls_dir, list_segments
+from services.websocket_service import broadcast_update
+from utils.fingerprint import Fingerprinter
+from utils.peaks import PeaksBuilder, build_pyramid, write_peaks
+from utils.speech_music import SpeechMusicSegmenter
+
+ANALYSIS_SAMPLE_RATE = 8000
+CHUNK_SECONDS = 10
+PEAKS_BUCKET_MS = 10
+
+
+def peaks_path(gravacao_id):
+    return os.path.join(Config.STORAGE_PATH, 'peaks', f"{gravacao_id}.peaks")
+
+
+def analysis_source(gravacao):
+    """Entrada do ffmpeg para a gravação: arquivo único ou segmentos HLS concatenados."""
+    if gravacao.arquivo_nome:
+        path = os.path.join(Config.STORAGE_PATH, 'audio', gravacao.arquivo_nome)
+        return path if os.path.exists(path) else None
+    if gravacao.segmentado:
+        directory = hls_dir(gravacao.id)
+        segments = [os.path.join(directory, name) for name in list_segments(gravacao.id)]
+        if segments:
+            # Protocolo concat do ffmpeg: segmentos MP3 lidos como um stream contínuo
+            return 'concat:' + '|'.join(segments)
+    return None
+
+
+def decode_pcm_chunks(source, sample_rate=ANALYSIS_SAMPLE_RATE, chunk_seconds=CHUNK_SECONDS):
+    """Gera blocos float32 (-1..1) mono de `chunk_seconds` (o último pode ser menor)."""
+    process = subprocess.Popen(
+        [
+            'ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error',
+            '-i', source,
+            '-vn', '-ac', '1', '-ar', str(sample_rate),
+            '-f', 's16le', 'pipe:1',
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    chunk_bytes = sample_rate * chunk_seconds * 2
+    buffer = bytearray(chunk_bytes)
+    view = memoryview(buffer)
+    try:
+        while True:
+            filled = 0
+            while filled < chunk_bytes:
+                n = process.stdout.readinto(view[filled:])
+                if not n:
+                    break
+                filled += n
+            filled -= filled % 2
+            if not filled:
+                break
+            yield np.frombuffer(buffer, dtype='<i2', count=filled // 2).astype(np.float32) / 32768.0
+            if filled < chunk_bytes:
+                break
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        process.stdout.close()
+
+
+def decode_pcm_bytes(data, sample_rate=ANALYSIS_SAMPLE_RATE, timeout=60):
+    """Decodifica um trecho curto já em memória (MP3/Ogg) para float32 mono."""
+    result = subprocess.run(
+        [
+            'ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error',
+            '-i', 'pipe:0',
+            '-vn', '-ac', '1', '-ar', str(sample_rate),
+            '-f', 's16le', 'pipe:1',
+        ],
+        input=data,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        timeout=timeout,
+    )
+    pcm = result.stdout[:len(result.stdout) - len(result.stdout) % 2]
+    return np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768.0
+
+
+class PeaksAnalyzer:
+    """Picos min/max por 10 ms com pirâmide de níveis para a timeline."""
+
+    def __init__(self, gravacao, sample_rate):
+        self.gravacao = gravacao
+        self._builder = PeaksBuilder(sample_rate, PEAKS_BUCKET_MS)
+
+    def feed(self, samples):
+        self._builder.feed(samples)
+
+    def finish(self):
+        mins, maxs = self._builder.finish()
+        if not mins.size:
+            return
+        os.makedirs(os.path.dirname(peaks_path(self.gravacao.id)), exist_ok=True)
+        write_peaks(peaks_path(self.gravacao.id), build_pyramid(mins, maxs), PEAKS_BUCKET_MS)
+
+
+class SilenceAnalyzer:
+    """Silêncio e ar morto: RMS e planicidade espectral em janelas de 100 ms.
+
+    Uma janela é "morta" se está abaixo de SILENCE_THRESHOLD_DB ou se o espectro é plano
+    como ruído (portadora sem programa). Trechos mortos de pelo menos SILENCE_MIN_SECONDS
+    viram intervalos; a porcentagem vai para a gravação e a rádio é sinalizada acima de
+    DEAD_AIR_ALERT_PERCENT.
+    """
+
+    WINDOW_SECONDS = 0.1
+
+    def __init__(self, gravacao, sample_rate):
+        self.gravacao = gravacao
+        self.window = int(sample_rate * self.WINDOW_SECONDS)
+        self._carry = np.empty(0, dtype=np.float32)
+        self._dead = []  # bool por janela, um array por bloco
+        self._notifications = []
+
+    def feed(self, samples):
+        if self._carry.size:
+            samples = np.concatenate((self._carry, samples))
+        usable = samples.size - samples.size % self.window
+        self._carry = samples[usable:].copy()
+        if not usable:
+            return
+        frames = samples[:usable].reshape(-1, self.window)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        rms_db = 20 * np.log10(np.maximum(rms, 1e-10))
+        power = np.abs(np.fft.rfft(frames * np.hanning(self.window), axis=1)) ** 2 + 1e-12
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        dead = (rms_db < Config.SILENCE_THRESHOLD_DB) | (flatness > Config.DEAD_AIR_FLATNESS)
+        self._dead.append(dead)
+
+    def _intervals(self, dead):
+        """[(inicio, fim)] em segundos dos trechos mortos com duração mínima."""
+        if not dead.size:
+            return []
+        padded = np.concatenate(([False], dead, [False])).astype(np.int8)
+        edges = np.flatnonzero(np.diff(padded))
+        starts, ends = edges[0::2], edges[1::2]
+        keep = (ends - starts) * self.WINDOW_SECONDS >= Config.SILENCE_MIN_SECONDS
+        return [
+            (round(float(start) * self.WINDOW_SECONDS, 1), round(float(end) * self.WINDOW_SECONDS, 1))
+            for start, end in zip(starts[keep], ends[keep])
+        ]
+
+    def finish(self):
+        dead = np.concatenate(self._dead) if self._dead else np.empty(0, dtype=bool)
+        if not dead.size:
+            return
+        intervals = self._intervals(dead)
+        dead_seconds = sum(end - start for start, end in intervals)
+        percent = round(100.0 * dead_seconds / (dead.size * self.WINDOW_SECONDS), 1)
+        self.gravacao.dead_air_percent = percent
+        self.gravacao.set_silencios_list(intervals[:Config.SILENCE_MAX_INTERVALS])
+
+        radio = self.gravacao.radio
+        alerta = percent >= Config.DEAD_AIR_ALERT_PERCENT
+        if radio is not None and bool(radio.dead_air_alerta) != alerta:
+            radio.dead_air_alerta = alerta
+            self._notifications.append((f'user_{radio.user_id}', 'radio_dead_air', {
+                'radio': radio.to_dict(),
+                'gravacao_id': self.gravacao.id,
+                'dead_air_percent': percent,
+            }))
+
+    def notifications(self):
+        return self._notifications
+
+
+def set_speech_segments(gravacao, intervals, duration):
+    """Grava os intervalos de fala e a porcentagem de fala da gravação."""
+    gravacao.set_segmentos_fala_list(intervals)
+    fala = sum(fim - inicio for inicio, fim in intervals)
+    gravacao.fala_percent = round(100.0 * fala / duration, 1) if duration else 0.0
+
+
+class SpeechMusicAnalyzer:
+    """Fala x música por janelas de 1 s (utils.speech_music); a transcrição só recebe a fala."""
+
+    def __init__(self, gravacao, sample_rate):
+        self.gravacao = gravacao
+        self._segmenter = SpeechMusicSegmenter(sample_rate)
+
+    def feed(self, samples):
+        self._segmenter.feed(samples)
+
+    def finish(self):
+        self._segmenter.finish()
+        if not self._segmenter.samples:
+            return
+        duration = self._segmenter.samples / self._segmenter.sample_rate
+        set_speech_segments(self.gravacao, self._segmenter.intervals(), duration)
+
+
+class FingerprintAnalyzer:
+    """Hashes de pares de picos espectrais (utils.fingerprint) no índice invertido.
+
+    Apaga os hashes anteriores da gravação uma vez e grava os novos com COPY em lotes de
+    até COPY_BATCH linhas conforme saem, na mesma transação do restante da análise.
+    """
+
+    COPY_BATCH = 100000
+
+    def __init__(self, gravacao, sample_rate):
+        self.gravacao = gravacao
+        self._printer = Fingerprinter(sample_rate)
+        self._pending = []
+        self._pending_rows = 0
+        self._cleared = False
+
+    def feed(self, samples):
+        self._add(*self._printer.feed(samples))
+
+    def finish(self):
+        self._add(*self._printer.finish())
+        self._copy()
+        self.gravacao.fingerprint_em = datetime.utcnow()
+
+    def _add(self, hashes, quadros):
+        if not hashes.size:
+            return
+        self._pending.append((hashes, quadros))
+        self._pending_rows += hashes.size
+        if self._pending_rows >= self.COPY_BATCH:
+            self._copy()
+
+    def _copy(self):
+        if not self._cleared:
+            AudioFingerprint.query.filter_by(gravacao_id=self.gravacao.id).delete(synchronize_session=False)
+            db.session.flush()
+            self._cleared = True
+        if not self._pending:
+            return
+        hashes = np.concatenate([p[0] for p in self._pending]).astype(np.int64)
+        quadros = np.concatenate([p[1] for p in self._pending]).astype(np.int64)
+        self._pending = []
+        self._pending_rows = 0
+        # Mesmo marco pode gerar o mesmo hash duas vezes: a chave primária não aceita repetição.
+        # Cada marco sai inteiro num único bloco, então basta deduplicar dentro do lote.
+        keys = np.unique((hashes << 32) | quadros)
+        rows = ''.join(
+            f"{h}\t{self.gravacao.id}\t{q}\n"
+            for h, q in zip((keys >> 32).tolist(), (keys & 0xFFFFFFFF).tolist())
+        )
+        cursor = db.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {AudioFingerprint.__tablename__} (hash, gravacao_id, quadro) FROM STDIN",
+                io.StringIO(rows),
+            )
+        finally:
+            cursor.close()
+
+
+ANALYZERS = [PeaksAnalyzer, SilenceAnalyzer, SpeechMusicAnalyzer, FingerprintAnalyzer]
+ANALYZERS_BY_NAME = {cls.__name__: cls for cls in ANALYZERS}
+
+
+def analyze_gravacao(gravacao_id, analyzer_classes=None, progress=None):
+    """Decodifica a gravação uma vez e roda os analisadores (todos por padrão; requer app context).
+
+    `progress(percent)` é chamado a cada bloco decodificado (o job usa para progresso e cancelamento).
+    """
+    gravacao = Gravacao.query.get(gravacao_id)
+    if not gravacao or gravacao.status != 'concluido':
+        return False
+    source = analysis_source(gravacao)
+    if not source:
+        return False
+    analyzers = [cls(gravacao, ANALYSIS_SAMPLE_RATE) for cls in (analyzer_classes or ANALYZERS)]
+    decoded = 0
+    for samples in decode_pcm_chunks(source):
+        for analyzer in analyzers:
+            analyzer.feed(samples)
+        decoded += samples.size
+        if progress and gravacao.duracao_segundos:
+            progress(min(99.0, 100.0 * decoded / ANALYSIS_SAMPLE_RATE / gravacao.duracao_segundos))
+    for analyzer in analyzers:
+        analyzer.finish()
+    gravacao.analisado_em = datetime.utcnow()
+    db.session.commit()
+
+    broadcast_update(f'user_{gravacao.user_id}', 'gravacao_updated', gravacao.to_dict())
+    for analyzer in analyzers:
+        for channel, event_type, data in getattr(analyzer, 'notifications', list)():
+            broadcast_update(channel, event_type, data)
+    return True
+
+
+def enqueue_analysis(gravacao, analyzer_classes=None):
+    """Enfileira a análise para o worker de jobs; o commit fica a cargo de quem chama."""
+    from services.job_service import ANALYSIS_JOB, enqueue_job
+
+    names = [cls.__name__ for cls in analyzer_classes] if analyzer_classes else None
+    return enqueue_job(ANALYSIS_JOB, gravacao.user_id, {'analisadores': names}, gravacao_id=gravacao.id)
@@ -0,0 +1,102 @@
+"""Materialização de clipes: corta [inicio, fim] da gravação de origem para storage/clips.
+
+Sem re-encode: MP3 é cortado em fronteira de quadro e Ogg Opus em fronteira de página,
+usando o índice de utils.audio_cut (montado uma vez por gravação e salvo em
+storage/index). Os cortes rodam num pool de processos, uma tarefa por gravação de
+origem, então centenas de clipes de um dia de gravações levam segundos.
+"""
+import multiprocessing
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from config import Config
+from models.gravacao import Gravacao
+from services.hls_service import hls_dir, list_segments
+from utils.audio_cut import cut_clips
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: processos limpos, sem herdar eventlet/threads do servidor
+            _pool = ProcessPoolExecutor(
+                max_workers=Config.CLIP_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def index_path(gravacao_id):
+    return os.path.join(Config.STORAGE_PATH, 'index', f"{gravacao_id}.npz")
+
+
+def clip_source(gravacao):
+    """(arquivos de origem em ordem, extensão) da gravação; None se não houver áudio."""
+    if gravacao.arquivo_nome:
+        path = os.path.join(Config.STORAGE_PATH, 'audio', gravacao.arquivo_nome)
+        if os.path.exists(path):
+            return [path], os.path.splitext(gravacao.arquivo_nome)[1].lstrip('.') or 'mp3'
+        return None
+    if gravacao.segmentado:
+        directory = hls_dir(gravacao.id)
+        segments = [os.path.join(directory, name) for name in list_segments(gravacao.id)]
+        if segments:
+            return segments, 'mp3'
+    return None
+
+
+def materialize_clips(clips):
+    """Gera os arquivos dos clipes e preenche `arquivo_url` (requer app context).
+
+    Agrupa por gravação de origem e envia um lote por gravação ao pool. Não faz commit:
+    quem chama decide. Retorna quantos clipes ficaram com arquivo.
+    """
+    by_gravacao = defaultdict(list)
+    for clip in clips:
+        by_gravacao[clip.gravacao_id].append(clip)
+    if not by_gravacao:
+        return 0
+    gravacoes = {
+        g.id: g for g in Gravacao.query.filter(Gravacao.id.in_(list(by_gravacao))).all()
+    }
+    clips_dir = os.path.join(Config.STORAGE_PATH, 'clips')
+    os.makedirs(os.path.join(Config.STORAGE_PATH, 'index'), exist_ok=True)
+
+    pool = _get_pool()
+    futures = []
+    by_key = {}
+    for gravacao_id, group in by_gravacao.items():
+        gravacao = gravacoes.get(gravacao_id)
+        source = clip_source(gravacao) if gravacao else None
+        if not source:
+            continue
+        paths, ext = source
+        cuts = []
+        for clip in group:
+            filename = f"{clip.id}.{ext}"
+            by_key[clip.id] = (clip, filename)
+            cuts.append((clip.id, clip.inicio_segundos, clip.fim_segundos, os.path.join(clips_dir, filename)))
+        futures.append(pool.submit(cut_clips, paths, index_path(gravacao_id), cuts))
+
+    created = 0
+    for future in futures:
+        try:
+            results = future.result()
+        except Exception as e:
+            print(f"Corte de clipes falhou: {e}")
+            continue
+        for key, _written, _seconds, error in results:
+            clip, filename = by_key[key]
+            if error:
+                print(f"Clipe {clip.id} nao gerado: {error}")
+                continue
+            clip.arquivo_url = f"/api/files/clips/{filename}"
+            created += 1
+    return created
+
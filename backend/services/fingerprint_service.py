@@ -0,0 +1,195 @@
+"""Busca de todas as veiculações de um clipe (vinheta, comercial) pelas impressões digitais.
+
+Os hashes de cada gravação concluída entram em `audio_fingerprints` durante a análise
+(analysis_service.FingerprintAnalyzer, no worker de jobs). A busca pega os hashes do
+clipe de referência, do próprio índice quando a gravação de origem já foi indexada, e
+junta com o índice por hash no banco. O GROUP BY por (gravação, deslocamento) devolve só os alinhamentos com
+votos, então o custo depende do número de hashes da referência e não de quantas horas
+de áudio existem.
+"""
+import os
+from collections import defaultdict
+
+import numpy as np
+
+from app import db
+from config import Config
+from models.audio_fingerprint import AudioFingerprint
+from models.gravacao import Gravacao
+from models.job import Job
+from models.radio import Radio
+from services.analysis_service import (
+    ANALYSIS_SAMPLE_RATE,
+    FingerprintAnalyzer,
+    decode_pcm_chunks,
+    enqueue_analysis,
+)
+from utils.fingerprint import MAX_DT, fingerprint, frame_seconds
+
+FRAME_SECONDS = frame_seconds(ANALYSIS_SAMPLE_RATE)
+DELTA_TOLERANCE = 1  # quadros: a grade do espectrograma da referência não coincide com a da gravação
+
+_MATCH_SQL = """
+SELECT f.gravacao_id, f.quadro - r.quadro AS delta, count(*) AS votos
+FROM unnest(CAST(:hashes AS integer[]), CAST(:quadros AS integer[])) AS r(hash, quadro)
+JOIN audio_fingerprints f ON f.hash = r.hash
+{scope}
+GROUP BY f.gravacao_id, delta
+HAVING count(*) >= 2
+"""
+
+
+def _clip_file(clip):
+    if not clip.arquivo_url:
+        return None
+    path = os.path.join(Config.STORAGE_PATH, 'clips', os.path.basename(clip.arquivo_url))
+    return path if os.path.exists(path) else None
+
+
+def reference_fingerprint(clip):
+    """(hashes, quadros relativos ao início do clipe) da referência.
+
+    Usa os hashes já indexados da gravação de origem; sem eles, decodifica o arquivo
+    do clipe. ValueError se nenhum dos dois existir.
+    """
+    gravacao = Gravacao.query.get(clip.gravacao_id)
+    if gravacao is not None and gravacao.fingerprint_em:
+        first = int(clip.inicio_segundos / FRAME_SECONDS)
+        # Marcos perto do fim pareiam com picos além do clipe: ficam de fora
+        last = int(clip.fim_segundos / FRAME_SECONDS) - MAX_DT
+        rows = (
+            db.session.query(AudioFingerprint.hash, AudioFingerprint.quadro)
+            .filter(
+                AudioFingerprint.gravacao_id == clip.gravacao_id,
+                AudioFingerprint.quadro.between(first, last),
+            )
+            .all()
+        )
+        if rows:
+            data = np.array(rows, dtype=np.int64)
+            return data[:, 0], data[:, 1] - first
+    path = _clip_file(clip)
+    if path is None:
+        raise ValueError("Clipe sem impressao digital: gravacao ainda nao analisada e arquivo do clipe ausente")
+    hashes, quadros = fingerprint(decode_pcm_chunks(path), ANALYSIS_SAMPLE_RATE)
+    return hashes.astype(np.int64), quadros.astype(np.int64)
+
+
+def _cluster(rows, min_votes, span):
+    """Une deslocamentos vizinhos de cada gravação e suprime os que se sobrepõem a um mais forte."""
+    by_gravacao = defaultdict(list)
+    for gravacao_id, delta, votos in rows:
+        by_gravacao[gravacao_id].append((int(delta), int(votos)))
+
+    found = []
+    for gravacao_id, deltas in by_gravacao.items():
+        deltas.sort()
+        clusters = []
+        for delta, votos in deltas:
+            if clusters and delta - clusters[-1][2] <= DELTA_TOLERANCE:
+                cluster = clusters[-1]
+                cluster[1] += votos
+                cluster[2] = delta
+                if votos > cluster[3]:
+                    cluster[0], cluster[3] = delta, votos
+            else:
+                # [delta do pico, votos somados, último delta, votos do pico]
+                clusters.append([delta, votos, delta, votos])
+        kept = []
+        for delta, votos, _last, _peak in sorted(clusters, key=lambda c: -c[1]):
+            if votos < min_votes:
+                break
+            if any(abs(delta - other) < span for other, _v in kept):
+                continue
+            kept.append((delta, votos))
+        found.extend((gravacao_id, delta, votos) for delta, votos in kept)
+    return found
+
+
+def find_airings(clip, *, user_id=None, min_votes=None):
+    """Todas as ocorrências do áudio do clipe nas gravações indexadas (do usuário, se informado)."""
+    hashes, quadros = reference_fingerprint(clip)
+    if hashes.size > Config.FINGERPRINT_MAX_QUERY_HASHES:
+        # Amostra uniforme ao longo do clipe: os votos caem na mesma proporção em todos os alinhamentos
+        pick = np.linspace(0, hashes.size - 1, Config.FINGERPRINT_MAX_QUERY_HASHES).astype(np.int64)
+        hashes, quadros = hashes[pick], quadros[pick]
+
+    params = {'hashes': hashes.tolist(), 'quadros': quadros.tolist()}
+    scope = ''
+    if user_id is not None:
+        scope = 'JOIN gravacoes g ON g.id = f.gravacao_id AND g.user_id = :user_id'
+        params['user_id'] = user_id
+    rows = db.session.execute(db.text(_MATCH_SQL.format(scope=scope)), params).all() if hashes.size else []
+
+    duration = max(0, (clip.fim_segundos or 0) - (clip.inicio_segundos or 0))
+    span = max(1, int(duration / FRAME_SECONDS))
+    min_votes = min_votes or Config.FINGERPRINT_MIN_MATCHES
+    matches = _cluster(rows, min_votes, span)
+
+    gravacoes = {}
+    if matches:
+        ids = list({m[0] for m in matches})
+        gravacoes = {g.id: g for g in Gravacao.query.filter(Gravacao.id.in_(ids)).all()}
+    radios = {}
+    radio_ids = list({g.radio_id for g in gravacoes.values()})
+    if radio_ids:
+        radios = {r.id: r for r in Radio.query.filter(Radio.id.in_(radio_ids)).all()}
+
+    ocorrencias = []
+    for gravacao_id, delta, votos in matches:
+        gravacao = gravacoes.get(gravacao_id)
+        if gravacao is None:
+            continue
+        radio = radios.get(gravacao.radio_id)
+        inicio = round(delta * FRAME_SECONDS, 2)
+        ocorrencias.append({
+            'gravacao_id': gravacao_id,
+            'radio_id': gravacao.radio_id,
+            'radio_nome': radio.nome if radio else None,
+            'gravacao_criado_em': gravacao.criado_em.isoformat() if gravacao.criado_em else None,
+            'inicio_segundos': inicio,
+            'fim_segundos': round(inicio + duration, 2),
+            'votos': votos,
+            'confianca': round(min(1.0, votos / max(1, hashes.size)), 3),
+            'origem': gravacao_id == clip.gravacao_id and abs(inicio - clip.inicio_segundos) < 1,
+        })
+    ocorrencias.sort(key=lambda o: (o['gravacao_criado_em'] or '', o['inicio_segundos']))
+    return {
+        'clip_id': clip.id,
+        'hashes_referencia': int(hashes.size),
+        'total': len(ocorrencias),
+        'ocorrencias': ocorrencias,
+    }
+
+
+def backfill_fingerprints():
+    """Enfileira na análise gravações concluídas ainda sem impressão digital (requer app context).
+
+    Gravações já analisadas rodam só o FingerprintAnalyzer; as demais, a análise completa.
+    Só completa a fila até FINGERPRINT_BACKFILL_BATCH análises pendentes/em execução, para não
+    atrasar as gravações novas; gravação que já teve job de análise (inclusive com falha ou
+    arquivo ausente) não é reenfileirada.
+    """
+    from services.job_service import ANALYSIS_JOB
+
+    em_fila = (
+        db.session.query(db.func.count(Job.id))
+        .filter(Job.tipo == ANALYSIS_JOB, Job.status.in_(('pendente', 'executando')))
+        .scalar()
+    ) or 0
+    slots = Config.FINGERPRINT_BACKFILL_BATCH - em_fila
+    if slots <= 0:
+        return 0
+    ja_enfileiradas = db.session.query(Job.id).filter(Job.tipo == ANALYSIS_JOB, Job.gravacao_id == Gravacao.id)
+    pendentes = (
+        Gravacao.query
+        .filter(Gravacao.status == 'concluido', Gravacao.fingerprint_em.is_(None), ~ja_enfileiradas.exists())
+        .order_by(Gravacao.criado_em.desc())
+        .limit(slots)
+        .all()
+    )
+    for gravacao in pendentes:
+        enqueue_analysis(gravacao, [FingerprintAnalyzer] if gravacao.analisado_em else None)
+    if pendentes:
+        db.session.commit()
+    return len(pendentes)
@@ -0,0 +1,170 @@
+"""Gravação segmentada com playlist HLS atualizada ao vivo.
+
+Em vez de um arquivo único, a gravação vira segmentos MP3 curtos em storage/hls/<id>/
+e um index.m3u8 reescrito a cada segmento fechado: o navegador começa a tocar (e
+navegar pela parte já gravada) enquanto a gravação continua. O arquivo único para
+arquivo/download só é montado quando pedido (`concat_segments`), concatenando os
+quadros, sem re-encode.
+"""
+import math
+import os
+import shutil
+import threading
+from datetime import datetime
+
+from config import Config
+from services.ingest_hub import MIN_OK_BYTES, attach_subscriber
+
+PLAYLIST_NAME = 'index.m3u8'
+SEGMENT_EXT = 'mp3'
+
+
+def hls_dir(gravacao_id):
+    return os.path.join(Config.STORAGE_PATH, 'hls', gravacao_id)
+
+
+def playlist_url(gravacao_id):
+    return f"/api/files/hls/{gravacao_id}/{PLAYLIST_NAME}"
+
+
+def _segment_duration():
+    return max(1, Config.HLS_SEGMENT_SECONDS)
+
+
+class HlsSubscriber:
+    """Ouvinte do hub que grava quadros MP3 em segmentos HLS até completar a duração pedida."""
+
+    def __init__(self, hub, gravacao_id, duration_seconds, on_close=None):
+        self.hub = hub
+        self.gravacao_id = gravacao_id
+        self.directory = hls_dir(gravacao_id)
+        self.filepath = os.path.join(self.directory, PLAYLIST_NAME)
+        self.duration_seconds = duration_seconds
+        self.bytes_written = 0
+        self.media_seconds = 0.0
+        self.reason = None
+        self.done = threading.Event()
+        self.on_close = on_close
+        self.segments = []  # [(nome, segundos)]
+        self._file = None
+        self._segment_name = None
+        self._segment_media = 0.0
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_playlist(ended=False)
+
+    @property
+    def ok(self):
+        return self.reason in ('completed', 'stopped', 'upstream_ended') and self.bytes_written >= MIN_OK_BYTES
+
+    @property
+    def complete(self):
+        return self.media_seconds >= self.duration_seconds
+
+    def write_mp3(self, header, frame):
+        # Fecha o segmento antes de passar do alvo: nenhum EXTINF excede o TARGETDURATION
+        if self._file is None or self._segment_media + header.duration > _segment_duration():
+            self._rotate()
+        self._file.write(frame)
+        self._segment_media += header.duration
+        self.bytes_written += len(frame)
+        self.media_seconds += header.duration
+
+    def _rotate(self):
+        self._finish_segment()
+        self._segment_name = f"seg_{len(self.segments):05d}.{SEGMENT_EXT}"
+        self._file = open(os.path.join(self.directory, self._segment_name), 'wb')
+        self._segment_media = 0.0
+
+    def _finish_segment(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if self._segment_media > 0:
+            self.segments.append((self._segment_name, self._segment_media))
+            self._write_playlist(ended=False)
+
+    def _write_playlist(self, ended):
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:3',
+            f'#EXT-X-TARGETDURATION:{math.ceil(_segment_duration())}',
+            '#EXT-X-MEDIA-SEQUENCE:0',
+            '#EXT-X-PLAYLIST-TYPE:EVENT',
+        ]
+        for name, seconds in self.segments:
+            lines.append(f'#EXTINF:{seconds:.3f},')
+            lines.append(name)
+        if ended:
+            lines.append('#EXT-X-ENDLIST')
+        # Troca atômica: quem está lendo a playlist nunca vê um arquivo pela metade
+        tmp_path = self.filepath + '.tmp'
+        with open(tmp_path, 'w') as fh:
+            fh.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.filepath)
+
+    def close(self, reason):
+        """Fecha o segmento atual e marca a playlist como encerrada (idempotente)."""
+        if self.done.is_set():
+            return
+        try:
+            self._finish_segment()
+            self._write_playlist(ended=True)
+        except Exception:
+            reason = 'error'
+        self.reason = reason
+        self.done.set()
+        if self.on_close is not None:
+            try:
+                self.on_close(self)
+            except Exception:
+                pass
+
+
+def attach_segmented_recording(
+    stream_url, output_format, bitrate_kbps, channels, *, gravacao_id, duration_seconds, on_close=None
+):
+    """Anexa uma gravação segmentada (somente MP3) ao hub da rádio."""
+    if output_format != 'mp3':
+        raise ValueError("Gravacao segmentada disponivel apenas para MP3")
+    return attach_subscriber(
+        stream_url,
+        output_format,
+        bitrate_kbps,
+        channels,
+        lambda hub: HlsSubscriber(hub, gravacao_id, duration_seconds, on_close),
+    )
+
+
+def list_segments(gravacao_id):
+    """Segmentos na ordem da playlist."""
+    path = os.path.join(hls_dir(gravacao_id), PLAYLIST_NAME)
+    try:
+        with open(path) as fh:
+            return [line.strip() for line in fh if line.strip() and not line.startswith('#')]
+    except FileNotFoundError:
+        return []
+
+
+def concat_segments(gravacao, *, remove_segments=False):
+    """Monta o arquivo único da gravação em storage/audio a partir dos segmentos HLS.
+
+    MP3 concatena quadro a quadro, então basta copiar os segmentos em ordem. Retorna o
+    nome do arquivo criado. Levanta ValueError se não houver segmentos.
+    """
+    segments = list_segments(gravacao.id)
+    if not segments:
+        raise ValueError("Gravacao sem segmentos HLS")
+    directory = hls_dir(gravacao.id)
+    created = gravacao.criado_em or datetime.now()
+    filename = f"{gravacao.id}_{created.strftime('%Y%m%d_%H%M%S')}.{SEGMENT_EXT}"
+    dest = os.path.join(Config.STORAGE_PATH, 'audio', filename)
+    tmp_dest = dest + '.part'
+    with open(tmp_dest, 'wb') as out:
+        for name in segments:
+            with open(os.path.join(directory, name), 'rb') as seg:
+                shutil.copyfileobj(seg, out, 256 * 1024)
+    os.replace(tmp_dest, dest)
+    if remove_segments:
+        shutil.rmtree(directory, ignore_errors=True)
+    return filename
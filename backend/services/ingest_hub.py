@@ -0,0 +1,474 @@
+"""Hub de ingestão: uma conexão com a rádio e um único ffmpeg para N gravações simultâneas.
+
+Cada hub lê o stream de origem uma vez (copiando ou codificando no perfil da rádio) e
+distribui o áudio, quadro a quadro (MP3) ou página a página (Ogg/Opus), para todas as
+gravações anexadas. Gravações entram e saem a qualquer momento; o hub encerra o ffmpeg
+quando fica sem ouvintes.
+"""
+import json
+import os
+import subprocess
+import threading
+import time
+from typing import Dict
+
+from config import Config
+from services.process_reaper import LineTail, reaper
+from utils.audio_frames import (
+    Mp3Framer,
+    OggPageParser,
+    OggStreamRewriter,
+    OGG_NO_GRANULE,
+    OPUS_SAMPLE_RATE,
+)
+
+READ_CHUNK = 64 * 1024
+READS_PER_EVENT = 16
+TERMINATE_GRACE_SECONDS = 10
+MIN_OK_BYTES = 1024  # ~1KB para considerar arquivo válido
+# Codec do stream de origem que pode ser copiado direto para cada formato de saída
+COPY_CODECS = {'mp3': 'mp3', 'opus': 'opus'}
+COPY_BITRATE_TOLERANCE_KBPS = 8
+
+HUBS: Dict[tuple, 'IngestHub'] = {}
+_HUBS_LOCK = threading.Lock()
+
+
+def probe_stream_info(stream_url):
+    """Lê codec, bitrate (kbps) e canais do primeiro stream de áudio da origem; None se falhar."""
+    timeout = Config.STREAM_PROBE_TIMEOUT
+    try:
+        out = subprocess.check_output(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-rw_timeout",
+                str(timeout * 1_000_000),
+                "-select_streams",
+                "a:0",
+                "-show_entries",
+                "stream=codec_name,bit_rate,channels:format=bit_rate",
+                "-of",
+                "json",
+                stream_url,
+            ],
+            stderr=subprocess.DEVNULL,
+            timeout=timeout + 5,
+        )
+        data = json.loads(out or b"{}")
+    except Exception:
+        return None
+
+    streams = data.get("streams") or []
+    if not streams:
+        return None
+    stream = streams[0]
+    # Streams Icecast/Ogg costumam informar bitrate só no container
+    raw_bitrate = stream.get("bit_rate") or (data.get("format") or {}).get("bit_rate")
+    try:
+        bitrate_kbps = int(round(int(raw_bitrate) / 1000))
+    except (TypeError, ValueError):
+        bitrate_kbps = None
+    try:
+        channels = int(stream.get("channels"))
+    except (TypeError, ValueError):
+        channels = None
+    return {
+        "codec": (stream.get("codec_name") or "").lower(),
+        "bitrate_kbps": bitrate_kbps,
+        "channels": channels,
+    }
+
+
+def select_ingest_mode(stream_info, output_format, bitrate_kbps, channels):
+    """Escolhe 'copy' quando a origem já está no formato/bitrate/canais da rádio; senão 'encode'."""
+    if not Config.RECORDING_STREAM_COPY or not stream_info:
+        return 'encode'
+    if stream_info.get('codec') != COPY_CODECS.get(output_format):
+        return 'encode'
+    if stream_info.get('channels') != channels:
+        return 'encode'
+    source_bitrate = stream_info.get('bitrate_kbps')
+    if not source_bitrate or abs(source_bitrate - bitrate_kbps) > COPY_BITRATE_TOLERANCE_KBPS:
+        return 'encode'
+    return 'copy'
+
+
+def build_ingest_command(stream_url, output_format, bitrate_kbps, channels, ingest_mode, progress_fd=None):
+    """Comando ffmpeg do hub: lê a origem sem limite de tempo e escreve o áudio em stdout."""
+    cmd = ['ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'warning']
+    if progress_fd is not None:
+        # Blocos key=value (out_time_us, total_size, speed...) num pipe próprio
+        cmd += ['-nostats', '-progress', f'pipe:{progress_fd}']
+    if stream_url.startswith(('http://', 'https://')):
+        cmd += ['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '10']
+    cmd += ['-i', stream_url, '-vn', '-map', '0:a:0']
+    if ingest_mode == 'copy':
+        cmd += ['-c:a', 'copy']
+    else:
+        cmd += ['-ac', str(channels)]
+        if output_format == 'opus':
+            cmd += ['-c:a', 'libopus', '-b:a', f'{bitrate_kbps}k', '-vbr', 'on']
+        else:
+            cmd += ['-acodec', 'libmp3lame', '-b:a', f'{bitrate_kbps}k']
+    if output_format == 'opus':
+        cmd += ['-f', 'ogg']
+    else:
+        # Sem ID3/Xing: o stream é cortado em quadros e cada gravação vira um MP3 independente
+        cmd += ['-f', 'mp3', '-id3v2_version', '0', '-write_xing', '0']
+    cmd.append('pipe:1')
+    return cmd
+
+
+class FfmpegProgress:
+    """Interpreta a saída de `-progress` do ffmpeg; guarda só o último bloco completo."""
+
+    def __init__(self):
+        self.out_time = None  # segundos de mídia produzidos
+        self.total_size = None  # bytes escritos na saída
+        self.speed = None  # múltiplo do tempo real
+        self.ended = False
+        self.updated_at = None
+        self._partial = b''
+        self._block = {}
+
+    def feed(self, data):
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()[-1024:]
+        for line in lines:
+            key, sep, value = line.decode(errors='ignore').strip().partition('=')
+            if not sep:
+                continue
+            if key == 'progress':
+                self._commit(self._block, value)
+                self._block = {}
+            else:
+                self._block[key] = value
+
+    def flush(self):
+        self._partial = b''
+
+    def _commit(self, block, state):
+        # out_time_ms também vem em microssegundos (bug histórico do ffmpeg)
+        raw = block.get('out_time_us') or block.get('out_time_ms')
+        try:
+            self.out_time = int(raw) / 1_000_000
+        except (TypeError, ValueError):
+            pass
+        try:
+            self.total_size = int(block.get('total_size'))
+        except (TypeError, ValueError):
+            pass
+        try:
+            self.speed = float((block.get('speed') or '').rstrip('x'))
+        except ValueError:
+            pass
+        self.ended = state == 'end'
+        self.updated_at = time.monotonic()
+
+
+class HubSubscriber:
+    """Gravação anexada a um hub: grava o áudio recebido até completar a duração pedida."""
+
+    def __init__(self, hub, gravacao_id, filepath, duration_seconds, on_close=None):
+        self.hub = hub
+        self.gravacao_id = gravacao_id
+        self.filepath = filepath
+        self.duration_seconds = duration_seconds
+        self.bytes_written = 0
+        self.media_seconds = 0.0
+        self.reason = None  # completed, stopped, upstream_ended, timeout, error
+        self.done = threading.Event()
+        self.on_close = on_close  # callable(subscriber) chamado uma vez ao fechar
+        self._rewriter = None
+        self._file = open(filepath, 'wb')
+
+    @property
+    def ok(self):
+        return self.reason in ('completed', 'stopped', 'upstream_ended') and self.bytes_written >= MIN_OK_BYTES
+
+    def write_mp3(self, header, frame):
+        self._file.write(frame)
+        self.bytes_written += len(frame)
+        self.media_seconds += header.duration
+
+    def write_ogg(self, page, previous_granule):
+        if self._rewriter is None:
+            self._rewriter = OggStreamRewriter(self.hub.header_pages)
+        data = self._rewriter.push(page, previous_granule)
+        if data:
+            self._file.write(data)
+            self.bytes_written += len(data)
+        self.media_seconds = self._rewriter.samples / OPUS_SAMPLE_RATE
+
+    @property
+    def complete(self):
+        return self.media_seconds >= self.duration_seconds
+
+    def close(self, reason):
+        """Fecha o arquivo (idempotente); chamado com o lock do hub."""
+        if self.done.is_set():
+            return
+        try:
+            if self._rewriter is not None:
+                tail = self._rewriter.close()
+                if tail:
+                    self._file.write(tail)
+                    self.bytes_written += len(tail)
+            self._file.close()
+        except Exception:
+            reason = 'error'
+        self.reason = reason
+        self.done.set()
+        if self.on_close is not None:
+            try:
+                self.on_close(self)
+            except Exception:
+                pass
+
+
+class IngestHub:
+    """Um ffmpeg lendo a rádio e distribuindo o áudio para as gravações anexadas.
+
+    Não tem thread própria: leitura do stdout, término do processo e tempo ocioso são
+    eventos do laço único de `process_reaper`.
+    """
+
+    def __init__(self, key, stream_url, output_format, bitrate_kbps, channels):
+        self.key = key
+        self.stream_url = stream_url
+        self.output_format = output_format
+        self.bitrate_kbps = bitrate_kbps
+        self.channels = channels
+        self.ingest_mode = None
+        self.process = None
+        self.return_code = None
+        self.stderr_tail = LineTail(Config.FFMPEG_STDERR_LINES)
+        self.progress = FfmpegProgress()
+        self._progress_pipe = None
+        self.header_pages = []
+        self.subscribers = []
+        self.closing = False
+        self._lock = threading.Lock()
+        self._idle_since = None
+        self._parser = OggPageParser() if output_format == 'opus' else Mp3Framer()
+        self._previous_granule = 0
+        self._headers_done = False
+        self._stdout_open = False
+
+    def start(self):
+        """Agenda a sondagem e o início do ffmpeg no pool do reaper e retorna na hora.
+
+        A sondagem abre outra conexão com a rádio e pode levar até STREAM_PROBE_TIMEOUT:
+        fora da admissão, uma rádio fora do ar não segura o despachante nem as gravações
+        que vêm depois. As gravações já ficam anexadas e recebem o áudio quando ele começa.
+        """
+        reaper.submit(self._launch)
+
+    def _launch(self):
+        """Decide copy/encode, inicia o ffmpeg e registra stdout/término no reaper."""
+        try:
+            ingest_mode = select_ingest_mode(
+                probe_stream_info(self.stream_url), self.output_format, self.bitrate_kbps, self.channels
+            )
+            with self._lock:
+                if self.closing:
+                    # Todas as gravações saíram durante a sondagem
+                    return
+                self.ingest_mode = ingest_mode
+            progress_r, progress_w = os.pipe()
+            self._progress_pipe = os.fdopen(progress_r, 'rb', buffering=0)
+            try:
+                self.process = subprocess.Popen(
+                    build_ingest_command(
+                        self.stream_url,
+                        self.output_format,
+                        self.bitrate_kbps,
+                        self.channels,
+                        self.ingest_mode,
+                        progress_fd=progress_w,
+                    ),
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    bufsize=0,
+                    pass_fds=(progress_w,),
+                )
+            finally:
+                os.close(progress_w)
+        except Exception as e:
+            if self._progress_pipe is not None:
+                self._progress_pipe.close()
+            print(f"Hub {self.stream_url}: ffmpeg nao iniciou: {e}")
+            self._shutdown('error')
+            return
+        fd = self.process.stdout.fileno()
+        os.set_blocking(fd, False)
+        self._stdout_open = True
+        reaper.add_reader(fd, self._on_readable)
+        reaper.drain_pipe(self.process.stderr, self.stderr_tail)
+        reaper.drain_pipe(self._progress_pipe, self.progress)
+        reaper.watch_process(self.process, self._on_exit)
+        if self.closing:
+            # Ficou ocioso enquanto o ffmpeg subia: _terminate ainda não tinha processo
+            self._terminate()
+
+    def attach(self, subscriber):
+        with self._lock:
+            self.subscribers.append(subscriber)
+            self._idle_since = None
+        return subscriber
+
+    def detach(self, subscriber, reason):
+        with self._lock:
+            subscriber.close(reason)
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+            if not self.subscribers and not self.closing:
+                self._idle_since = time.monotonic()
+                reaper.call_later(Config.INGEST_HUB_LINGER_SECONDS, self._check_idle)
+
+    # -- eventos do laço -----------------------------------------------------
+
+    def _read_stdout(self, max_chunks=None):
+        """Lê o que estiver disponível no stdout; retorna False no EOF."""
+        fd = self.process.stdout.fileno()
+        count = 0
+        while max_chunks is None or count < max_chunks:
+            try:
+                chunk = os.read(fd, READ_CHUNK)
+            except BlockingIOError:
+                return True
+            except OSError:
+                return False
+            if not chunk:
+                return False
+            self._distribute(chunk)
+            count += 1
+        return True
+
+    def _on_readable(self):
+        # Limite por evento para não monopolizar o laço com um único hub
+        if not self._read_stdout(READS_PER_EVENT):
+            self._close_stdout()
+
+    def _close_stdout(self):
+        if self._stdout_open:
+            self._stdout_open = False
+            reaper.remove_reader(self.process.stdout.fileno())
+
+    def _distribute(self, chunk):
+        with self._lock:
+            subscribers = list(self.subscribers)
+        finished = []
+        for unit in self._parser.feed(chunk):
+            if self.output_format == 'opus':
+                page = unit
+                if not self._headers_done:
+                    # Cabeçalhos OpusHead/OpusTags (granule 0) antes do primeiro áudio
+                    if page.granule == 0:
+                        self.header_pages.append(page)
+                        continue
+                    self._headers_done = True
+                for sub in subscribers:
+                    if not sub.done.is_set() and sub not in finished:
+                        sub.write_ogg(page, self._previous_granule)
+                        if sub.complete:
+                            finished.append(sub)
+                if page.granule != OGG_NO_GRANULE:
+                    self._previous_granule = page.granule
+            else:
+                header, frame = unit
+                for sub in subscribers:
+                    if not sub.done.is_set() and sub not in finished:
+                        sub.write_mp3(header, frame)
+                        if sub.complete:
+                            finished.append(sub)
+        for sub in finished:
+            self.detach(sub, 'completed')
+
+    def _check_idle(self):
+        """Sem gravações há mais que o tempo de espera: retira o hub do registro e encerra o ffmpeg."""
+        with _HUBS_LOCK, self._lock:
+            if self.closing or self.subscribers or self._idle_since is None:
+                return
+            if time.monotonic() - self._idle_since < Config.INGEST_HUB_LINGER_SECONDS:
+                return
+            self.closing = True
+            if HUBS.get(self.key) is self:
+                HUBS.pop(self.key, None)
+        self._terminate()
+
+    def _terminate(self):
+        if self.process is None:
+            return
+        try:
+            self.process.terminate()
+        except Exception:
+            return
+        reaper.call_later(TERMINATE_GRACE_SECONDS, self._kill)
+
+    def _kill(self):
+        if self.process.poll() is None:
+            try:
+                self.process.kill()
+            except Exception:
+                pass
+
+    def _on_exit(self, return_code):
+        """ffmpeg terminou: entrega o que restou no pipe e encerra as gravações anexadas."""
+        self.return_code = return_code
+        if self._stdout_open:
+            self._read_stdout()
+            self._close_stdout()
+        try:
+            self.process.stdout.close()
+        except Exception:
+            pass
+        reaper.close_pipe(self.process.stderr, self.stderr_tail)
+        reaper.close_pipe(self._progress_pipe, self.progress)
+        self._shutdown('upstream_ended' if return_code in (0, -15, 255) else 'error')
+
+    def _shutdown(self, reason):
+        """Encerra todas as gravações ainda anexadas e retira o hub do registro."""
+        with _HUBS_LOCK:
+            self.closing = True
+            if HUBS.get(self.key) is self:
+                HUBS.pop(self.key, None)
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for sub in subscribers:
+            self.detach(sub, reason)
+
+
+def hub_key(stream_url, output_format, bitrate_kbps, channels):
+    return (stream_url, output_format, bitrate_kbps, channels)
+
+
+def attach_subscriber(stream_url, output_format, bitrate_kbps, channels, factory):
+    """Anexa `factory(hub)` ao hub da rádio (criando o hub se for o primeiro ouvinte)."""
+    key = hub_key(stream_url, output_format, bitrate_kbps, channels)
+    with _HUBS_LOCK:
+        hub = HUBS.get(key)
+        created = hub is None or hub.closing
+        if created:
+            hub = IngestHub(key, stream_url, output_format, bitrate_kbps, channels)
+            HUBS[key] = hub
+        subscriber = hub.attach(factory(hub))
+    if created:
+        hub.start()
+    return subscriber
+
+
+def attach_recording(
+    stream_url, output_format, bitrate_kbps, channels, *, gravacao_id, filepath, duration_seconds, on_close=None
+):
+    """Anexa uma gravação ao hub da rádio; `on_close(subscriber)` é chamado quando o arquivo fecha."""
+    return attach_subscriber(
+        stream_url,
+        output_format,
+        bitrate_kbps,
+        channels,
+        lambda hub: HubSubscriber(hub, gravacao_id, filepath, duration_seconds, on_close),
+    )
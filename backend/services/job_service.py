@@ -0,0 +1,231 @@
+"""Fila persistente de jobs (tabela `jobs`) consumida pelos processos de worker.py.
+
+O web só enfileira e consulta; cada processo do worker pega o próximo job pendente com
+SELECT ... FOR UPDATE SKIP LOCKED, então vários processos (ou containers) dividem a fila
+sem pegar o mesmo job. Progresso e mudanças de status saem por broadcast_update (no
+worker, via outbox). Falhas voltam para a fila com backoff até `max_tentativas`.
+"""
+import json
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+
+from app import db
+from config import Config
+from models.gravacao import Gravacao
+from models.job import Job
+from services.analysis_service import ANALYZERS_BY_NAME, analyze_gravacao
+from services.recording_service import process_audio_with_ai
+from services.websocket_service import broadcast_update
+
+TERMINAL_JOB_STATUSES = ('concluido', 'erro', 'cancelado')
+ANALYSIS_JOB = 'analysis'
+LIVE_KEYWORDS_JOB = 'live_keywords'
+# Jobs que acompanham uma gravação enquanto ela dura: executados pelos processos de
+# monitoramento (services.live_keyword_service), não por run_job
+MONITOR_JOB_TYPES = (LIVE_KEYWORDS_JOB,)
+PROGRESS_MIN_INTERVAL = 1.0  # s entre atualizações de progresso gravadas/emitidas
+
+
+class JobCancelled(Exception):
+    """Levantada dentro do handler quando o cancelamento do job foi pedido."""
+
+
+class JobContext:
+    """Passado ao handler: reporta progresso e interrompe o job se ele for cancelado."""
+
+    def __init__(self, job):
+        self.job_id = job.id
+        self.user_id = job.user_id
+        self._last_emit = 0.0
+
+    def progress(self, percent, mensagem=None, *, force=False):
+        """Grava/emite o progresso (com limite de frequência) e checa cancelamento."""
+        now = time.monotonic()
+        if not force and now - self._last_emit < PROGRESS_MIN_INTERVAL:
+            return
+        self._last_emit = now
+        values = {'progresso': max(0.0, min(100.0, float(percent))), 'heartbeat_em': datetime.utcnow()}
+        if mensagem is not None:
+            values['mensagem'] = mensagem[:255]
+        # Conexão própria: não faz commit do trabalho em andamento na sessão do handler
+        with db.engine.begin() as conn:
+            conn.execute(Job.__table__.update().where(Job.__table__.c.id == self.job_id).values(**values))
+            cancelar = conn.execute(
+                db.select(Job.__table__.c.cancelar).where(Job.__table__.c.id == self.job_id)
+            ).scalar()
+        broadcast_update(f'user_{self.user_id}', 'job_progress', {
+            'id': self.job_id,
+            'progresso': values['progresso'],
+            'mensagem': values.get('mensagem'),
+        })
+        if cancelar:
+            raise JobCancelled()
+
+
+def enqueue_job(tipo, user_id, payload, *, gravacao_id=None, max_tentativas=None):
+    """Cria o job pendente e retorna-o; o commit fica a cargo de quem chama."""
+    if tipo not in JOB_HANDLERS and tipo not in MONITOR_JOB_TYPES:
+        raise ValueError(f"Tipo de job desconhecido: {tipo}")
+    job = Job(
+        tipo=tipo,
+        user_id=user_id,
+        gravacao_id=gravacao_id,
+        status='pendente',
+        max_tentativas=max_tentativas or Config.JOB_MAX_ATTEMPTS,
+        disponivel_em=datetime.utcnow(),
+    )
+    job.set_payload(payload)
+    db.session.add(job)
+    return job
+
+
+def cancel_job(job):
+    """Cancela job pendente na hora; em execução, pede ao worker (efetivo no próximo progresso)."""
+    if job.status in TERMINAL_JOB_STATUSES:
+        return False
+    if job.status == 'pendente':
+        job.status = 'cancelado'
+        job.finalizado_em = datetime.utcnow()
+    else:
+        job.cancelar = True
+    db.session.commit()
+    broadcast_update(f'user_{job.user_id}', 'job_updated', job.to_dict())
+    return True
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_next_job(tipos=None, excluir=()):
+    """Pega o próximo job pendente (SKIP LOCKED) e marca como em execução; None se vazio."""
+    now = datetime.utcnow()
+    query = Job.query.filter(Job.status == 'pendente', Job.disponivel_em <= now)
+    if tipos:
+        query = query.filter(Job.tipo.in_(tipos))
+    if excluir:
+        query = query.filter(Job.tipo.notin_(excluir))
+    job = (
+        query
+        .order_by(Job.disponivel_em, Job.criado_em)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if job is None:
+        db.session.rollback()
+        return None
+    job.status = 'executando'
+    job.tentativas = (job.tentativas or 0) + 1
+    job.worker = worker_name()
+    job.iniciado_em = now
+    job.heartbeat_em = now
+    job.erro = None
+    db.session.commit()
+    broadcast_update(f'user_{job.user_id}', 'job_updated', job.to_dict())
+    return job
+
+
+def finish_job(job_id, **values):
+    """Grava o novo estado do job (descartando o que a sessão tinha pendente) e avisa o dono."""
+    db.session.rollback()
+    job = Job.query.get(job_id)
+    if job is None:
+        return None
+    for key, value in values.items():
+        setattr(job, key, value)
+    db.session.commit()
+    broadcast_update(f'user_{job.user_id}', 'job_updated', job.to_dict())
+    return job
+
+
+def run_job(job):
+    """Executa o handler do job e registra o resultado, a nova tentativa ou o erro."""
+    job_id = job.id
+    handler = JOB_HANDLERS.get(job.tipo)
+    try:
+        if handler is None:
+            raise ValueError(f"Tipo de job desconhecido: {job.tipo}")
+        resultado = handler(job, JobContext(job))
+    except JobCancelled:
+        return finish_job(job_id, status='cancelado', finalizado_em=datetime.utcnow())
+    except Exception as e:
+        db.session.rollback()
+        job = Job.query.get(job_id)
+        if job is None:
+            return None
+        tentativas = job.tentativas or 0
+        if tentativas < (job.max_tentativas or 1) and not job.cancelar:
+            delay = Config.JOB_RETRY_BASE_SECONDS * (2 ** (tentativas - 1))
+            return finish_job(
+                job_id,
+                status='pendente',
+                erro=str(e),
+                mensagem=f"Nova tentativa em {delay}s",
+                disponivel_em=datetime.utcnow() + timedelta(seconds=delay),
+            )
+        return finish_job(job_id, status='erro', erro=str(e), finalizado_em=datetime.utcnow())
+    return finish_job(
+        job_id,
+        status='concluido',
+        progresso=100.0,
+        resultado=json.dumps(resultado, default=str) if resultado is not None else None,
+        finalizado_em=datetime.utcnow(),
+    )
+
+
+def touch_heartbeat(job_id):
+    """Marca o job como vivo (chamado periodicamente pelo worker durante a execução)."""
+    with db.engine.begin() as conn:
+        conn.execute(
+            Job.__table__.update()
+            .where(Job.__table__.c.id == job_id, Job.__table__.c.status == 'executando')
+            .values(heartbeat_em=datetime.utcnow())
+        )
+
+
+def requeue_stale_jobs():
+    """Devolve à fila jobs 'executando' sem heartbeat recente (processo do worker morreu)."""
+    limite = datetime.utcnow() - timedelta(seconds=Config.JOB_STALE_SECONDS)
+    stale = (
+        Job.query
+        .filter(Job.status == 'executando', Job.heartbeat_em < limite)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for job in stale:
+        if job.cancelar:
+            job.status = 'cancelado'
+            job.finalizado_em = datetime.utcnow()
+        elif (job.tentativas or 0) >= (job.max_tentativas or 1):
+            job.status = 'erro'
+            job.erro = 'Worker interrompido'
+            job.finalizado_em = datetime.utcnow()
+        else:
+            job.status = 'pendente'
+            job.disponivel_em = datetime.utcnow()
+    db.session.commit()
+    for job in stale:
+        broadcast_update(f'user_{job.user_id}', 'job_updated', job.to_dict())
+    return len(stale)
+
+
+def _run_process_ai(job, ctx):
+    payload = job.get_payload()
+    gravacao = Gravacao.query.get(job.gravacao_id)
+    if gravacao is None:
+        raise ValueError("Gravacao nao encontrada")
+    return process_audio_with_ai(gravacao, payload.get('palavras_chave', []), progress=ctx.progress)
+
+
+def _run_analysis(job, ctx):
+    nomes = job.get_payload().get('analisadores')
+    classes = [ANALYZERS_BY_NAME[nome] for nome in nomes if nome in ANALYZERS_BY_NAME] if nomes else None
+    return {'analisado': analyze_gravacao(job.gravacao_id, classes, progress=ctx.progress)}
+
+
+JOB_HANDLERS = {
+    'process_ai': _run_process_ai,
+    ANALYSIS_JOB: _run_analysis,
+}
@@ -0,0 +1,100 @@
+"""Índice único das palavras-chave de todos os agendamentos ativos.
+
+Cada processo (web ou worker) mantém um KeywordAutomaton com as listas de todos os
+agendamentos e o atualiza incrementalmente: a cada busca lê só os agendamentos alterados
+desde a última marca d'água (`atualizado_em`), e de tempos em tempos confere os ids para
+tirar os apagados. Uma passada sobre a transcrição devolve as ocorrências de todos os
+usuários; quem chama filtra pelo escopo (dono e rádio da gravação).
+"""
+import threading
+import time
+from datetime import timedelta
+
+from app import db
+from config import Config
+from models.agendamento import Agendamento
+from utils.keyword_matcher import KeywordAutomaton
+
+INACTIVE_AGENDAMENTO_STATUSES = ('inativo',)
+
+
+class KeywordIndex:
+    def __init__(self):
+        self.automaton = KeywordAutomaton()
+        self._payloads = {}  # agendamento_id -> [payload]
+        self._scopes = {}  # (user_id, radio_id) -> nº de agendamentos com palavras
+        self._watermark = None
+        self._last_full_check = 0.0
+        self._lock = threading.Lock()
+
+    def _set_agendamento(self, agendamento_id, user_id, radio_id, status, palavras):
+        self._remove_agendamento(agendamento_id)
+        if status in INACTIVE_AGENDAMENTO_STATUSES:
+            return
+        payloads = []
+        for palavra in palavras:
+            # payload: (user_id, radio_id, agendamento_id, palavra original)
+            payload = (user_id, radio_id, agendamento_id, palavra)
+            if self.automaton.add(palavra, payload):
+                payloads.append(payload)
+        if payloads:
+            self._payloads[agendamento_id] = payloads
+            scope = (user_id, radio_id)
+            self._scopes[scope] = self._scopes.get(scope, 0) + 1
+
+    def _remove_agendamento(self, agendamento_id):
+        payloads = self._payloads.pop(agendamento_id, None)
+        if not payloads:
+            return
+        for payload in payloads:
+            self.automaton.remove(payload)
+        scope = payloads[0][:2]
+        remaining = self._scopes.get(scope, 0) - 1
+        if remaining > 0:
+            self._scopes[scope] = remaining
+        else:
+            self._scopes.pop(scope, None)
+
+    def sync(self):
+        """Aplica os agendamentos alterados desde a última sincronização (requer app context)."""
+        with self._lock:
+            query = Agendamento.query
+            if self._watermark is not None:
+                # >= com folga: alterações no mesmo instante da marca não se perdem (reaplicar é idempotente)
+                query = query.filter(Agendamento.atualizado_em >= self._watermark - timedelta(seconds=1))
+            for agendamento in query.all():
+                self._set_agendamento(
+                    agendamento.id,
+                    agendamento.user_id,
+                    agendamento.radio_id,
+                    agendamento.status,
+                    agendamento.get_palavras_chave_list(),
+                )
+                if agendamento.atualizado_em and (self._watermark is None or agendamento.atualizado_em > self._watermark):
+                    self._watermark = agendamento.atualizado_em
+
+            now = time.monotonic()
+            if now - self._last_full_check >= Config.KEYWORD_INDEX_FULL_SYNC_SECONDS:
+                self._last_full_check = now
+                existing = {row[0] for row in db.session.query(Agendamento.id).all()}
+                for agendamento_id in list(self._payloads):
+                    if agendamento_id not in existing:
+                        self._remove_agendamento(agendamento_id)
+
+    def has_lists(self, user_id, radio_id):
+        """Se há agendamento ativo com palavras-chave para o dono/rádio."""
+        self.sync()
+        return (user_id, radio_id) in self._scopes
+
+    def match(self, words, *, user_id=None, radio_id=None):
+        """Ocorrências [(payload, inicio, fim)] nas palavras transcritas, filtradas pelo escopo."""
+        self.sync()
+        with self._lock:
+            hits = self.automaton.match_words(words)
+        return [
+            hit for hit in hits
+            if (user_id is None or hit[0][0] == user_id) and (radio_id is None or hit[0][1] == radio_id)
+        ]
+
+
+keyword_index = KeywordIndex()
@@ -0,0 +1,113 @@
+"""Áudio de uma gravação em andamento, seguindo os bytes acrescentados ao arquivo.
+
+O gerador lê a partir do offset pedido em blocos de LIVE_AUDIO_CHUNK_BYTES e, ao alcançar
+o fim do arquivo, dorme LIVE_AUDIO_POLL_SECONDS com socketio.sleep (cede o hub do
+eventlet) antes de ler de novo. Termina quando a gravação sai do supervisor (o reaper a
+finalizou ou ela foi parada) e o que faltava do arquivo já foi enviado. Cada ouvinte
+guarda só um bloco em memória.
+
+Gravações segmentadas (HLS) são seguidas pela playlist: os segmentos MP3 concatenados
+formam um fluxo contínuo. Em Ogg Opus, começar no meio do arquivo envia antes as páginas
+de cabeçalho e pula até a próxima página inteira.
+"""
+import os
+import struct
+
+from app import socketio
+from config import Config
+from services.live_keyword_service import live_sources
+from services.recording_supervisor import supervisor
+
+OGG_CAPTURE = b'OggS'
+OGG_PAGE_HEADER = struct.Struct('<4sBBqIIIB')
+OGG_HEADER_PROBE_BYTES = 64 * 1024
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _read(path, offset, size):
+    try:
+        with open(path, 'rb') as fh:
+            fh.seek(offset)
+            return fh.read(size)
+    except FileNotFoundError:
+        return b''
+
+
+def _ogg_headers(path):
+    """Páginas iniciais (OpusHead/OpusTags, granule 0) do arquivo Ogg."""
+    data = _read(path, 0, OGG_HEADER_PROBE_BYTES)
+    pos = 0
+    while pos + OGG_PAGE_HEADER.size <= len(data):
+        capture, _version, _type, granule, _serial, _seqno, _crc, count = OGG_PAGE_HEADER.unpack_from(data, pos)
+        if capture != OGG_CAPTURE or granule != 0:
+            break
+        lacing = data[pos + OGG_PAGE_HEADER.size:pos + OGG_PAGE_HEADER.size + count]
+        if len(lacing) < count:
+            break
+        pos += OGG_PAGE_HEADER.size + count + sum(lacing)
+    return data[:min(pos, len(data))]
+
+
+def _locate(paths, offset):
+    """(índice do arquivo, offset dentro dele) para um offset no fluxo concatenado."""
+    for index, path in enumerate(paths):
+        size = _size(path)
+        if offset < size or index == len(paths) - 1:
+            return index, offset
+        offset -= size
+    return 0, 0
+
+
+def stream_live_audio(gravacao, offset=0):
+    """Gerador com os bytes da gravação a partir de `offset`, seguindo o arquivo enquanto grava.
+
+    Offset negativo conta a partir do fim atual (ex.: -65536 = perto do ao vivo).
+    """
+    gravacao_id = gravacao.id
+    kind, paths = live_sources(gravacao)
+    chunk = Config.LIVE_AUDIO_CHUNK_BYTES
+    if offset < 0:
+        offset = max(0, sum(_size(path) for path in paths) + offset)
+
+    head = b''
+    if kind == 'opus' and offset > 0 and paths:
+        head = _ogg_headers(paths[0])
+        offset = max(offset, len(head))
+    align = bool(head) and offset > len(head)
+    index, file_offset = _locate(paths, offset)
+
+    if head:
+        yield head
+    while True:
+        # Antes de ler: se a gravação já acabou, esta é a última passada e lê até o fim
+        recording = supervisor.get(gravacao_id) is not None
+        while index < len(paths):
+            data = _read(paths[index], file_offset, chunk)
+            if not data:
+                if index == len(paths) - 1:
+                    break
+                index += 1
+                file_offset = 0
+                continue
+            if align:
+                start = data.find(OGG_CAPTURE)
+                if start == -1:
+                    # Mantém o suficiente para um "OggS" partido entre blocos
+                    file_offset += max(1, len(data) - 3)
+                    continue
+                data = data[start:]
+                file_offset += start
+                align = False
+            file_offset += len(data)
+            yield data
+        if not recording:
+            return
+        socketio.sleep(Config.LIVE_AUDIO_POLL_SECONDS)
+        if gravacao.segmentado:
+            paths = live_sources(gravacao)[1]
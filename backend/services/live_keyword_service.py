@@ -0,0 +1,256 @@
+"""Alertas de palavras-chave enquanto a gravação ainda está em andamento.
+
+Ao iniciar uma gravação de rádio com listas de palavras-chave, entra na fila um job
+`live_keywords`. Os processos de monitoramento do worker (worker.py, LIVE_KEYWORD_WORKERS)
+pegam esses jobs, até LIVE_STREAMS_PER_WORKER por processo, e acompanham cada gravação
+enquanto o status for 'gravando':
+
+- leem só o que foi acrescentado ao arquivo (ou os segmentos HLS novos), quadro a quadro;
+- montam janelas de LIVE_WINDOW_SECONDS com LIVE_OVERLAP_SECONDS de sobreposição (palavras
+  partidas na borda de uma janela aparecem inteiras na seguinte);
+- transcrevem no pool de STT e emitem `keyword_hit` por broadcast_update a cada ocorrência.
+
+Custo limitado por stream: no máximo uma janela em voo; se o áudio ainda não transcrito
+passar de LIVE_MAX_LAG_SECONDS, o trecho mais antigo é descartado para voltar ao tempo
+real. A análise completa continua no job process_ai quando a gravação termina.
+"""
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from app import db
+from config import Config
+from models.gravacao import Gravacao
+from models.job import Job
+from services.analysis_service import decode_pcm_bytes
+from services.hls_service import hls_dir, list_segments
+from services.job_service import (
+    LIVE_KEYWORDS_JOB,
+    claim_next_job,
+    enqueue_job,
+    finish_job,
+    touch_heartbeat,
+)
+from services.keyword_service import keyword_index
+from services.transcription_service import get_stt_pool
+from services.websocket_service import broadcast_update
+from utils.audio_tail import AudioTail, tail_kind, window_bytes
+from utils.keyword_matcher import normalize_text
+from utils.speech_music import SpeechGate
+from utils.stt import STT_SAMPLE_RATE, transcribe_chunk
+
+HEARTBEAT_SECONDS = 30
+DEDUP_TOLERANCE_SECONDS = 0.1  # folga nos tempos da mesma ocorrência vista em duas janelas
+CONTEXT_SECONDS = 4.0  # palavras antes/depois da ocorrência no trecho do alerta
+
+
+def enqueue_live_keywords(gravacao):
+    """Enfileira o acompanhamento ao vivo se o dono tiver listas para a rádio; commit de quem chama."""
+    if not keyword_index.has_lists(gravacao.user_id, gravacao.radio_id):
+        return None
+    return enqueue_job(LIVE_KEYWORDS_JOB, gravacao.user_id, {}, gravacao_id=gravacao.id)
+
+
+def live_sources(gravacao):
+    """(tipo, arquivos) da gravação em andamento; lista vazia se ainda não há áudio."""
+    if gravacao.segmentado:
+        directory = hls_dir(gravacao.id)
+        return 'mp3', [os.path.join(directory, name) for name in list_segments(gravacao.id)]
+    if gravacao.arquivo_nome:
+        path = os.path.join(Config.STORAGE_PATH, 'audio', gravacao.arquivo_nome)
+        return tail_kind(path), [path]
+    return None, []
+
+
+class LiveStream:
+    """Estado do acompanhamento de uma gravação dentro de um processo de monitoramento."""
+
+    def __init__(self, job):
+        self.job_id = job.id
+        self.gravacao_id = job.gravacao_id
+        self.user_id = job.user_id
+        self.radio_id = None
+        self.tail = None
+        self.pending = deque()  # unidades lidas e ainda não transcritas
+        self.pending_seconds = 0.0
+        self.overlap = []  # fim da última janela, repetido no início da próxima
+        self.future = None
+        self.emitted = {}  # (agendamento_id, palavra normalizada) -> fim da última ocorrência emitida
+        self.ocorrencias = 0
+        self.descartado = 0.0
+
+    def step(self):
+        """Lê o áudio novo, recolhe a janela pronta e submete a próxima; True quando terminou."""
+        gravacao = Gravacao.query.get(self.gravacao_id)
+        if gravacao is None:
+            return True
+        self.radio_id = gravacao.radio_id
+        self._collect()
+        gravando = gravacao.status == 'gravando'
+        if gravando:
+            # Depois de finalizada, a gravação pode virar outro arquivo (segmentos concatenados):
+            # só o que já foi lido é transcrito, o resto fica para a análise completa
+            kind, paths = live_sources(gravacao)
+            if paths:
+                if self.tail is None:
+                    self.tail = AudioTail(kind)
+                units, dropped = self.tail.read(paths, keep_seconds=Config.LIVE_MAX_LAG_SECONDS)
+                self._discard(dropped)
+                for unit in units:
+                    self.pending.append(unit)
+                    self.pending_seconds += unit[1]
+            self._bound_lag()
+        if self.future is None:
+            self._submit(final=not gravando)
+        return not gravando and self.future is None and not self.pending
+
+    def _discard(self, seconds):
+        if seconds:
+            self.descartado += seconds
+            # Descontinuidade: a sobreposição não corresponde mais ao áudio seguinte
+            self.overlap = []
+
+    def _bound_lag(self):
+        if self.pending_seconds <= Config.LIVE_MAX_LAG_SECONDS:
+            return
+        dropped = 0.0
+        while self.pending and self.pending_seconds > Config.LIVE_WINDOW_SECONDS:
+            duration = self.pending.popleft()[1]
+            self.pending_seconds -= duration
+            dropped += duration
+        self._discard(dropped)
+
+    def _submit(self, final):
+        if not self.pending or (self.pending_seconds < Config.LIVE_WINDOW_SECONDS and not final):
+            return
+        units = []
+        taken = 0.0
+        while self.pending and taken < Config.LIVE_WINDOW_SECONDS:
+            unit = self.pending.popleft()
+            self.pending_seconds -= unit[1]
+            taken += unit[1]
+            units.append(unit)
+        window = self.overlap + units
+        overlap = []
+        span = 0.0
+        for unit in reversed(window):
+            if span >= Config.LIVE_OVERLAP_SECONDS:
+                break
+            overlap.append(unit)
+            span += unit[1]
+        self.overlap = overlap[::-1]
+
+        samples = decode_pcm_bytes(
+            window_bytes(self.tail.kind, window, self.tail.headers), sample_rate=STT_SAMPLE_RATE
+        )
+        if Config.SPEECH_FILTER_ENABLED:
+            # Janela só de música/silêncio não vai para o STT
+            gate = SpeechGate(STT_SAMPLE_RATE)
+            samples = np.concatenate((gate.feed(samples), gate.finish()))
+            if not gate.kept:
+                return
+        if not samples.size:
+            return
+        self.future = get_stt_pool(Config.STT_ENGINE).submit(transcribe_chunk, window[0][0], samples)
+
+    def _collect(self):
+        if self.future is None or not self.future.done():
+            return
+        future = self.future
+        self.future = None
+        try:
+            segments = future.result()
+        except Exception as e:
+            print(f"Transcricao ao vivo da gravacao {self.gravacao_id} falhou: {e}")
+            return
+        words = [tuple(p) for segment in segments for p in segment['palavras']]
+        hits = keyword_index.match(words, user_id=self.user_id, radio_id=self.radio_id)
+        for (_user_id, _radio_id, agendamento_id, palavra), inicio, fim in sorted(hits, key=lambda h: h[1]):
+            key = (agendamento_id, normalize_text(palavra))
+            last = self.emitted.get(key)
+            if last is not None and inicio < last - DEDUP_TOLERANCE_SECONDS:
+                continue
+            self.emitted[key] = fim
+            self.ocorrencias += 1
+            trecho = ' '.join(
+                w[0] for w in words
+                if w[2] >= inicio - CONTEXT_SECONDS and w[1] <= fim + CONTEXT_SECONDS
+            )
+            broadcast_update(f'user_{self.user_id}', 'keyword_hit', {
+                'gravacao_id': self.gravacao_id,
+                'radio_id': self.radio_id,
+                'agendamento_id': agendamento_id,
+                'palavra_chave': palavra,
+                'inicio': round(inicio, 2),
+                'fim': round(fim, 2),
+                'trecho': trecho,
+                'detectado_em': datetime.utcnow().isoformat(),
+            })
+
+    def resultado(self):
+        return {'ocorrencias': self.ocorrencias, 'segundos_descartados': round(self.descartado, 1)}
+
+
+def _check_cancelled(streams):
+    """Job ids (entre os acompanhados) com cancelamento pedido ou já apagados junto com a
+    gravação; também renova o heartbeat."""
+    for job_id in streams:
+        touch_heartbeat(job_id)
+    rows = dict(db.session.query(Job.id, Job.cancelar).filter(Job.id.in_(list(streams))).all())
+    db.session.rollback()
+    return {job_id for job_id in streams if rows.get(job_id, True)}
+
+
+def run_live_monitor(app, stopping):
+    """Laço de um processo de monitoramento: acompanha várias gravações em andamento."""
+    streams = {}
+    last_heartbeat = 0.0
+    while not stopping.is_set():
+        try:
+            with app.app_context():
+                while len(streams) < Config.LIVE_STREAMS_PER_WORKER:
+                    job = claim_next_job(tipos=(LIVE_KEYWORDS_JOB,))
+                    if job is None:
+                        break
+                    streams[job.id] = LiveStream(job)
+
+                for job_id, stream in list(streams.items()):
+                    try:
+                        done = stream.step()
+                    except Exception as e:
+                        streams.pop(job_id)
+                        finish_job(job_id, status='erro', erro=str(e), finalizado_em=datetime.utcnow())
+                        continue
+                    if done:
+                        streams.pop(job_id)
+                        finish_job(
+                            job_id,
+                            status='concluido',
+                            progresso=100.0,
+                            resultado=json.dumps(stream.resultado()),
+                            finalizado_em=datetime.utcnow(),
+                        )
+
+                if streams and time.monotonic() - last_heartbeat >= HEARTBEAT_SECONDS:
+                    last_heartbeat = time.monotonic()
+                    for job_id in _check_cancelled(streams):
+                        stream = streams.pop(job_id)
+                        finish_job(
+                            job_id,
+                            status='cancelado',
+                            resultado=json.dumps(stream.resultado()),
+                            finalizado_em=datetime.utcnow(),
+                        )
+                db.session.remove()
+        except Exception as e:
+            print(f"live: erro no laco: {e}")
+        stopping.wait(Config.LIVE_POLL_SECONDS)
+
+    # Encerrando: devolve as gravações ainda em andamento à fila para outro processo
+    with app.app_context():
+        for job_id in streams:
+            finish_job(job_id, status='pendente', disponivel_em=datetime.utcnow())
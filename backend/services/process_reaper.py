@@ -0,0 +1,241 @@
+"""Laço de eventos único para os processos ffmpeg e seus pipes.
+
+Uma thread observa, via selectors, o término de todos os filhos (pidfd quando o kernel
+suporta, senão poll periódico), os pipes de saída e os timers de segurança. Trabalho
+pesado (banco, broadcast) vai para um pool pequeno e fixo, então o número de threads não
+cresce com a quantidade de gravações.
+"""
+import heapq
+import itertools
+import os
+import selectors
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+
+POLL_FALLBACK_SECONDS = 0.5
+PIPE_READ_CHUNK = 16 * 1024
+MAX_LINE_BYTES = 1024
+
+
+class LineTail:
+    """Guarda só as últimas `maxlen` linhas de um pipe lido aos pedaços (memória constante)."""
+
+    def __init__(self, maxlen):
+        self.lines = deque(maxlen=maxlen)
+        self._partial = b''
+
+    def feed(self, data):
+        # ffmpeg usa \r para linhas de status que se sobrescrevem
+        parts = (self._partial + data).replace(b'\r', b'\n').split(b'\n')
+        self._partial = parts.pop()[-MAX_LINE_BYTES:]
+        for line in parts:
+            if line.strip():
+                self.lines.append(line[:MAX_LINE_BYTES])
+
+    def flush(self):
+        if self._partial.strip():
+            self.lines.append(self._partial)
+        self._partial = b''
+
+    def text(self):
+        return '\n'.join(line.decode(errors='ignore') for line in self.lines)
+
+
+class Timer:
+    __slots__ = ('when', 'callback', 'args', 'cancelled')
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class ProcessReaper:
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._timers = []
+        self._seq = itertools.count()
+        self._pending = deque()
+        self._polled = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._executor = None
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, self._drain_wakeup)
+
+    # -- API (segura para chamar de qualquer thread) -------------------------
+
+    def call_soon(self, callback, *args):
+        self._pending.append((callback, args))
+        self._wakeup()
+
+    def call_later(self, delay, callback, *args):
+        timer = Timer(time.monotonic() + delay, callback, args)
+        self.call_soon(self._push_timer, timer)
+        return timer
+
+    def add_reader(self, fd, callback):
+        """Chama `callback()` no laço sempre que `fd` tiver dados (ou EOF)."""
+        self._in_loop(self._register, fd, callback)
+
+    def remove_reader(self, fd):
+        self._in_loop(self._unregister, fd)
+
+    def _in_loop(self, callback, *args):
+        # Dentro do laço aplica na hora (o fd pode ser fechado logo em seguida)
+        if threading.current_thread() is self._thread:
+            callback(*args)
+        else:
+            self.call_soon(callback, *args)
+
+    def watch_process(self, proc, on_exit):
+        """Chama `on_exit(returncode)` no laço quando o processo terminar."""
+        try:
+            pidfd = os.pidfd_open(proc.pid)
+        except (AttributeError, OSError):
+            self.call_soon(self._polled.__setitem__, proc, on_exit)
+            return
+        self.add_reader(pidfd, lambda: self._reap(pidfd, proc, on_exit))
+
+    def drain_pipe(self, pipe, tail):
+        """Lê `pipe` continuamente para `tail.feed` (ex.: LineTail), sem deixar o filho travar com o pipe cheio."""
+        os.set_blocking(pipe.fileno(), False)
+        self.add_reader(pipe.fileno(), lambda: self._read_pipe(pipe, tail))
+
+    def close_pipe(self, pipe, tail):
+        """Consome o que restou no pipe e o fecha; chamar a partir do laço."""
+        if not pipe.closed:
+            self._read_pipe(pipe, tail, limit=None)
+        if not pipe.closed:
+            self._unregister(pipe.fileno())
+            tail.flush()
+            pipe.close()
+
+    def submit(self, fn, *args):
+        """Executa `fn(*args)` fora do laço, no pool fixo de finalização."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=Config.REAPER_WORKERS, thread_name_prefix='reaper'
+                )
+        return self._executor.submit(self._guard, fn, *args)
+
+    # -- laço ----------------------------------------------------------------
+
+    def _wakeup(self):
+        self._ensure_started()
+        try:
+            os.write(self._wake_w, b'\0')
+        except BlockingIOError:
+            pass
+
+    def _drain_wakeup(self):
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='process-reaper', daemon=True)
+                self._thread.start()
+
+    def _push_timer(self, timer):
+        heapq.heappush(self._timers, (timer.when, next(self._seq), timer))
+
+    def _register(self, fd, callback):
+        try:
+            self._selector.register(fd, selectors.EVENT_READ, callback)
+        except KeyError:
+            self._selector.modify(fd, selectors.EVENT_READ, callback)
+
+    def _unregister(self, fd):
+        try:
+            self._selector.unregister(fd)
+        except (KeyError, ValueError):
+            pass
+
+    def _read_pipe(self, pipe, tail, limit=16):
+        fd = pipe.fileno()
+        count = 0
+        while limit is None or count < limit:
+            try:
+                data = os.read(fd, PIPE_READ_CHUNK)
+            except BlockingIOError:
+                return
+            except OSError:
+                data = b''
+            if not data:
+                self._unregister(fd)
+                tail.flush()
+                pipe.close()
+                return
+            tail.feed(data)
+            count += 1
+
+    def _reap(self, pidfd, proc, on_exit):
+        self._unregister(pidfd)
+        os.close(pidfd)
+        on_exit(proc.wait())
+
+    def _poll_processes(self):
+        for proc, on_exit in list(self._polled.items()):
+            returncode = proc.poll()
+            if returncode is not None:
+                self._polled.pop(proc, None)
+                self._guard(on_exit, returncode)
+
+    def _timeout(self):
+        timeout = None
+        if self._timers:
+            timeout = max(0.0, self._timers[0][0] - time.monotonic())
+        if self._polled:
+            timeout = POLL_FALLBACK_SECONDS if timeout is None else min(timeout, POLL_FALLBACK_SECONDS)
+        return timeout
+
+    def _loop(self):
+        while True:
+            try:
+                events = self._selector.select(self._timeout())
+            except Exception:
+                events = []
+            for key, _mask in events:
+                self._guard(key.data)
+            now = time.monotonic()
+            while self._timers and self._timers[0][0] <= now:
+                _when, _seq, timer = heapq.heappop(self._timers)
+                if not timer.cancelled:
+                    self._guard(timer.callback, *timer.args)
+            while self._pending:
+                callback, args = self._pending.popleft()
+                self._guard(callback, *args)
+            if self._polled:
+                self._poll_processes()
+
+    @staticmethod
+    def _guard(fn, *args):
+        try:
+            return fn(*args)
+        except Exception as e:
+            try:
+                print(f"process_reaper: callback {getattr(fn, '__name__', fn)} falhou: {e}")
+            except Exception:
+                pass
+        return None
+
+
+reaper = ProcessReaper()
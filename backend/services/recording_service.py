@@ -1,23 +1,42 @@
 import os
 import subprocess
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-from typing import Dict
 
 from flask import current_app
+from sqlalchemy import and_, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app import db
 from config import Config
+from models.agendamento import Agendamento
 from models.gravacao import Gravacao
+from models.midia_metadados import MidiaMetadados
 from models.radio import Radio
+from services.analysis_service import enqueue_analysis
+from services.clip_service import materialize_clips
+from services.hls_service import attach_segmented_recording, concat_segments, playlist_url
+from services.ingest_hub import attach_recording, hub_key
+from services.keyword_service import keyword_index
+from services.process_reaper import reaper
+from services.recording_supervisor import RecordingRequest, supervisor
+from services.transcription_service import find_keyword_hits, keyword_clip_windows, transcribe_gravacao
 from services.websocket_service import broadcast_update
+from utils.audio_frames import audio_info
 
 LOCAL_TZ = ZoneInfo("America/Fortaleza")
 MIN_RECORD_SECONDS = 10  # evita gravação zero em caso de input faltando
 ALLOWED_BITRATES = {96, 128}
 ALLOWED_FORMATS = {'mp3', 'opus'}
 ALLOWED_AUDIO_MODES = {'mono', 'stereo'}
-ACTIVE_PROCESSES: Dict[str, subprocess.Popen] = {}
+TERMINAL_STATUSES = ('concluido', 'erro', 'cancelado')
+
+RECONCILE_MAX_BATCHES = 10  # lotes por execução do job de conciliação
+
+_probe_pool = None
+_probe_pool_lock = threading.Lock()
+_reconcile_watermark = None  # (atualizado_em, id) da última linha conciliada
 
 
 def _get_audio_filepath(gravacao):
@@ -33,9 +52,12 @@ def _get_audio_filepath(gravacao):
 
 
 def _probe_duration_seconds(filepath):
-    """Obtém duração real via ffprobe; retorna None se falhar."""
+    """Obtém duração real lendo cabeçalhos MP3/Ogg Opus (ffprobe só como fallback); None se falhar."""
     if not filepath or not os.path.exists(filepath):
         return None
+    info = audio_info(filepath)
+    if info and info[0]:
+        return int(round(info[0]))
     try:
         out = subprocess.check_output(
             [
@@ -65,66 +87,218 @@ def _file_size_mb(filepath):
         return None
 
 
-def hydrate_gravacao_metadata(gravacao, *, autocommit=False):
+def _probe_executor():
+    global _probe_pool
+    with _probe_pool_lock:
+        if _probe_pool is None:
+            _probe_pool = ThreadPoolExecutor(
+                max_workers=Config.METADATA_PROBE_WORKERS, thread_name_prefix='ffprobe'
+            )
+        return _probe_pool
+
+
+def _media_durations(filepaths):
+    """Duração dos arquivos usando o cache `midia_metadados` chaveado por (caminho, tamanho, mtime_ns).
+
+    Só arquivos novos ou alterados passam pelo ffprobe, em paralelo no pool limitado; o
+    cache é atualizado com um único upsert (sem commit: fica para quem chamou).
+    Retorna ({caminho: segundos|None}, {caminho: os.stat_result}, houve_upsert).
     """
-    Garante que duração, tamanho e status estejam consistentes com o arquivo físico.
-    - Lê o arquivo em disco (se existir) para preencher duracao_segundos/minutos e tamanho_mb.
+    stats = {}
+    for path in filepaths:
+        try:
+            stats[path] = os.stat(path)
+        except OSError:
+            continue
+    if not stats:
+        return {}, {}, False
+
+    keys = {os.path.relpath(path, Config.STORAGE_PATH): path for path in stats}
+    cached = {
+        row.caminho: row
+        for row in MidiaMetadados.query.filter(MidiaMetadados.caminho.in_(list(keys))).all()
+    }
+    durations = {}
+    misses = []
+    for key, path in keys.items():
+        row = cached.get(key)
+        if row is not None and row.matches(stats[path]):
+            durations[path] = row.duracao_segundos
+        else:
+            misses.append((key, path))
+
+    if misses:
+        probed = _probe_executor().map(_probe_duration_seconds, [path for _key, path in misses])
+        values = []
+        for (key, path), duration in zip(misses, probed):
+            durations[path] = duration
+            values.append({
+                'caminho': key,
+                'tamanho_bytes': stats[path].st_size,
+                'mtime_ns': stats[path].st_mtime_ns,
+                'duracao_segundos': duration,
+                'atualizado_em': datetime.utcnow(),
+            })
+        stmt = pg_insert(MidiaMetadados).values(values)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['caminho'],
+            set_={col: stmt.excluded[col] for col in ('tamanho_bytes', 'mtime_ns', 'duracao_segundos', 'atualizado_em')},
+        ))
+    return durations, stats, bool(misses)
+
+
+def _needs_hydration(gravacao):
+    if supervisor.is_tracked(gravacao.id):
+        # Em andamento neste processo: o progresso vem do ffmpeg
+        return False
+    if gravacao.status in TERMINAL_STATUSES:
+        # Finalizadas não são sondadas de novo; só as antigas que nunca tiveram tamanho preenchido
+        return not gravacao.ingest_mode and not gravacao.tamanho_mb
+    return True
+
+
+def hydrate_gravacoes_metadata(gravacoes, *, autocommit=False):
+    """
+    Garante que duração, tamanho e status estejam consistentes com os arquivos físicos.
+    - Preenche duracao_segundos/minutos e tamanho_mb a partir do cache de metadados (ffprobe só em arquivo novo/alterado).
     - Se o tempo previsto já passou e ainda está marcado como gravando/iniciando, marca como concluído.
-    Retorna o objeto (já ajustado).
+    Faz no máximo um commit para o lote inteiro. Retorna a lista (já ajustada).
     """
-    if not gravacao:
-        return gravacao
+    pending = [g for g in gravacoes if g is not None and _needs_hydration(g)]
+    if not pending:
+        return gravacoes
 
-    changed = False
-    filepath = _get_audio_filepath(gravacao)
+    paths = {g.id: _get_audio_filepath(g) for g in pending}
+    durations, stats, cache_updated = _media_durations([path for path in paths.values() if path])
 
-    # Tamanho real
-    size_mb = _file_size_mb(filepath)
-    if size_mb is not None and (gravacao.tamanho_mb or 0) != size_mb:
-        gravacao.tamanho_mb = size_mb
-        changed = True
+    changed = False
+    for gravacao in pending:
+        filepath = paths[gravacao.id]
+        stat = stats.get(filepath)
+
+        # Tamanho real
+        if stat is not None:
+            size_mb = round(stat.st_size / (1024 * 1024), 2)
+            if (gravacao.tamanho_mb or 0) != size_mb:
+                gravacao.tamanho_mb = size_mb
+                changed = True
 
-    # Duração real
-    real_duration = _probe_duration_seconds(filepath)
-    if real_duration:
-        if (gravacao.duracao_segundos or 0) != real_duration:
-            gravacao.duracao_segundos = real_duration
-            gravacao.duracao_minutos = max(1, round(real_duration / 60))
-            changed = True
-
-    # Atualizar status automaticamente se o tempo previsto já passou
-    expected_duration = gravacao.duracao_segundos or (
-        (gravacao.duracao_minutos or 0) * 60
-    )
-    if expected_duration <= 0:
-        expected_duration = MIN_RECORD_SECONDS
-    if gravacao.criado_em and gravacao.status in ("iniciando", "gravando"):
-        try:
-            expected_end = gravacao.criado_em + timedelta(seconds=expected_duration + 5)
-            now = datetime.now(tz=gravacao.criado_em.tzinfo or LOCAL_TZ)
-            if now >= expected_end:
-                gravacao.status = "concluido"
+        # Duração real
+        real_duration = durations.get(filepath)
+        if real_duration:
+            if (gravacao.duracao_segundos or 0) != real_duration:
+                gravacao.duracao_segundos = real_duration
+                gravacao.duracao_minutos = max(1, round(real_duration / 60))
                 changed = True
-        except Exception:
-            pass
 
-    if autocommit and changed:
+        # Atualizar status automaticamente se o tempo previsto já passou
+        expected_duration = gravacao.duracao_segundos or (
+            (gravacao.duracao_minutos or 0) * 60
+        )
+        if expected_duration <= 0:
+            expected_duration = MIN_RECORD_SECONDS
+        if gravacao.criado_em and gravacao.status in ("iniciando", "gravando"):
+            try:
+                expected_end = gravacao.criado_em + timedelta(seconds=expected_duration + 5)
+                now = datetime.now(tz=gravacao.criado_em.tzinfo or LOCAL_TZ)
+                if now >= expected_end:
+                    gravacao.status = "concluido"
+                    changed = True
+            except Exception:
+                pass
+
+    # O upsert do cache também precisa do commit, mesmo sem mudança nas gravações
+    if autocommit and (changed or cache_updated):
         db.session.commit()
 
+    return gravacoes
+
+
+def hydrate_gravacao_metadata(gravacao, *, autocommit=False):
+    """Versão de um item de `hydrate_gravacoes_metadata`; retorna o objeto (já ajustado)."""
+    if not gravacao:
+        return gravacao
+    hydrate_gravacoes_metadata([gravacao], autocommit=autocommit)
     return gravacao
 
 
-def _finalizar_gravacao(gravacao, status, filepath=None, duration_seconds=None, agendamento=None):
-    """Atualiza status, tamanhos e emite broadcast."""
-    try:
-        file_size = _file_size_mb(filepath)
-        if file_size is not None:
-            gravacao.tamanho_mb = file_size
-    except Exception:
-        pass
+def reconcile_gravacoes_metadata(batch_size=None):
+    """Concilia tamanho, duração e status das gravações em segundo plano (job do scheduler).
+
+    Percorre as linhas em lotes por (atualizado_em, id) a partir da marca d'água da execução
+    anterior e, à parte, revisa as que ainda constam como iniciando/gravando. Avisa o front
+    das gravações que mudaram de status. Retorna quantas linhas foram revistas.
+    """
+    global _reconcile_watermark
+    batch_size = batch_size or Config.METADATA_RECONCILE_BATCH
+    reviewed = 0
+    changed_status = []
+
+    def reconcile(batch):
+        before = {g.id: g.status for g in batch}
+        hydrate_gravacoes_metadata(batch, autocommit=True)
+        changed_status.extend(g for g in batch if g.status != before[g.id])
+
+    for _ in range(RECONCILE_MAX_BATCHES):
+        query = Gravacao.query.filter(Gravacao.atualizado_em.isnot(None))
+        if _reconcile_watermark is not None:
+            mark_ts, mark_id = _reconcile_watermark
+            query = query.filter(
+                or_(
+                    Gravacao.atualizado_em > mark_ts,
+                    and_(Gravacao.atualizado_em == mark_ts, Gravacao.id > mark_id),
+                )
+            )
+        batch = query.order_by(Gravacao.atualizado_em, Gravacao.id).limit(batch_size).all()
+        if not batch:
+            break
+        # Marca lida antes do commit (que atualiza atualizado_em das linhas alteradas)
+        watermark = (batch[-1].atualizado_em, batch[-1].id)
+        reconcile(batch)
+        _reconcile_watermark = watermark
+        reviewed += len(batch)
+        if len(batch) < batch_size:
+            break
+
+    # Status presos não mudam atualizado_em: poucas linhas, revistas a cada execução
+    stale = (
+        Gravacao.query.filter(Gravacao.status.in_(('iniciando', 'gravando')))
+        .order_by(Gravacao.criado_em)
+        .limit(batch_size)
+        .all()
+    )
+    if stale:
+        reconcile(stale)
+        reviewed += len(stale)
+
+    for gravacao in changed_status:
+        broadcast_update(f'user_{gravacao.user_id}', 'gravacao_updated', gravacao.to_dict())
+    return reviewed
+
+
+def _finalizar_gravacao(
+    gravacao, status, filepath=None, duration_seconds=None, agendamento=None, *, subscriber=None
+):
+    """Atualiza status, tamanhos e emite broadcast.
+
+    Com `subscriber` (gravação feita pelo hub) duração e tamanho vêm do que foi de fato
+    escrito no arquivo, sem ffprobe nem stat.
+    """
+    if subscriber is not None:
+        # Hub novo decide copy/encode depois do início da gravação (sondagem fora da admissão)
+        gravacao.ingest_mode = subscriber.hub.ingest_mode or gravacao.ingest_mode
+        gravacao.tamanho_mb = round(subscriber.bytes_written / (1024 * 1024), 2)
+        real_duration = int(round(subscriber.media_seconds)) or duration_seconds
+    else:
+        try:
+            file_size = _file_size_mb(filepath)
+            if file_size is not None:
+                gravacao.tamanho_mb = file_size
+        except Exception:
+            pass
 
-    # Preferir duração real do arquivo, se existir
-    real_duration = _probe_duration_seconds(filepath) or duration_seconds
+        # Preferir duração real do arquivo, se existir
+        real_duration = _probe_duration_seconds(filepath) or duration_seconds
     if real_duration:
         gravacao.duracao_segundos = real_duration
         gravacao.duracao_minutos = max(1, round(real_duration / 60))
@@ -144,19 +318,8 @@ def _finalizar_gravacao(gravacao, status, filepath=None, duration_seconds=None,
         broadcast_update(f'user_{gravacao.user_id}', 'agendamento_updated', agendamento.to_dict())
 
 
-def start_recording(gravacao, *, duration_seconds=None, agendamento=None, block=False):
-    """Inicia gravação de um stream de rádio.
-
-    Params:
-        gravacao: instancia da gravação já persistida
-        duration_seconds: duração em segundos (fallback para gravacao.duracao_minutos)
-        agendamento: instancia de agendamento para atualizar status, se houver
-        block: se True, aguarda término do ffmpeg antes de retornar
-    """
-    radio = Radio.query.get(gravacao.radio_id)
-    if not radio or not radio.stream_url:
-        raise ValueError("Radio not found or stream_url missing")
-
+def recording_profile(radio):
+    """Formato, bitrate e canais de saída configurados na rádio (com valores seguros)."""
     try:
         bitrate_kbps = int(getattr(radio, 'bitrate_kbps', 128))
     except Exception:
@@ -172,8 +335,26 @@ def start_recording(gravacao, *, duration_seconds=None, agendamento=None, block=
     if audio_mode not in ALLOWED_AUDIO_MODES:
         audio_mode = 'stereo'
     channels = 1 if audio_mode == 'mono' else 2
+    return output_format, bitrate_kbps, channels
+
+
+def start_recording(gravacao, *, duration_seconds=None, agendamento=None):
+    """Inicia gravação de um stream de rádio.
+
+    A gravação passa pelo supervisor: começa na hora se houver orçamento de CPU
+    (ou se a rádio já tem hub ativo) e, caso contrário, fica com status 'na_fila'.
+
+    Params:
+        gravacao: instancia da gravação já persistida
+        duration_seconds: duração em segundos (fallback para gravacao.duracao_minutos)
+        agendamento: instancia de agendamento para atualizar status, se houver
+    Retorna True se a gravação começou imediatamente.
+    """
+    radio = Radio.query.get(gravacao.radio_id)
+    if not radio or not radio.stream_url:
+        raise ValueError("Radio not found or stream_url missing")
 
-    os.makedirs(os.path.join(Config.STORAGE_PATH, 'audio'), exist_ok=True)
+    output_format, bitrate_kbps, channels = recording_profile(radio)
 
     # Definir duração com fallback seguro (evita ficar gravando indefinidamente)
     duration_seconds = duration_seconds or gravacao.duracao_segundos or (
@@ -190,160 +371,434 @@ def start_recording(gravacao, *, duration_seconds=None, agendamento=None, block=
     # Guardar duração planejada para cálculo de status e exibição
     gravacao.duracao_segundos = duration_seconds
     gravacao.duracao_minutos = max(1, round(duration_seconds / 60))
+    gravacao.status = 'na_fila'
+    db.session.commit()
 
-    timestamp = datetime.now(tz=LOCAL_TZ).strftime('%Y%m%d_%H%M%S')
-    filename = f"{gravacao.id}_{timestamp}.{output_format}"
-    filepath = os.path.join(Config.STORAGE_PATH, 'audio', filename)
+    try:
+        app_obj = current_app._get_current_object()
+    except Exception:
+        app_obj = None
+
+    request = RecordingRequest(
+        gravacao.id,
+        user_id=gravacao.user_id,
+        agendamento_id=agendamento.id if agendamento else None,
+        duration_seconds=duration_seconds,
+        tipo=gravacao.tipo,
+        hub_key=hub_key(radio.stream_url, output_format, bitrate_kbps, channels),
+        output_format=output_format,
+        app=app_obj,
+    )
+    started = supervisor.submit(request)
+    if not started:
+        broadcast_update(f'user_{gravacao.user_id}', 'gravacao_updated', gravacao.to_dict())
+    return started
 
-    gravacao.status = 'gravando'
-    gravacao.arquivo_nome = filename
-    gravacao.arquivo_url = f"/api/files/audio/{filename}"
-    db.session.commit()
 
-    # Guardar stderr para inspecionar falhas do ffmpeg (evita arquivo 0 bytes silencioso)
-    ffmpeg_process = None
+def _begin_recording(request):
+    """Anexa ao hub da rádio uma gravação admitida pelo supervisor (roda com app context)."""
+    gravacao = Gravacao.query.get(request.gravacao_id)
+    if not gravacao:
+        return
+    agendamento = Agendamento.query.get(request.agendamento_id) if request.agendamento_id else None
+    duration_seconds = request.duration_seconds
+    filepath = None
     try:
-        ffmpeg_cmd = [
-            'ffmpeg',
-            '-nostdin',
-            '-y',
-            '-i',
-            radio.stream_url,
-            '-t',
-            str(duration_seconds),
-        ]
-
-        ffmpeg_cmd += ['-ac', str(channels)]
-        if output_format == 'opus':
-            ffmpeg_cmd += ['-c:a', 'libopus', '-b:a', f'{bitrate_kbps}k', '-vbr', 'on']
+        radio = Radio.query.get(gravacao.radio_id)
+        if not radio or not radio.stream_url:
+            raise ValueError("Radio not found or stream_url missing")
+        output_format, bitrate_kbps, channels = recording_profile(radio)
+
+        def on_close(sub):
+            reaper.submit(_complete_recording, request, sub)
+
+        # Segmentos HLS só para MP3 (Opus em HLS exigiria fMP4); Opus segue em arquivo único
+        segmentado = bool(gravacao.segmentado) and output_format == 'mp3'
+        gravacao.segmentado = segmentado
+        gravacao.status = 'gravando'
+        if segmentado:
+            gravacao.arquivo_nome = None
+            gravacao.arquivo_url = playlist_url(gravacao.id)
         else:
-            ffmpeg_cmd += ['-acodec', 'libmp3lame', '-b:a', f'{bitrate_kbps}k']
-
-        ffmpeg_cmd.append(filepath)
+            os.makedirs(os.path.join(Config.STORAGE_PATH, 'audio'), exist_ok=True)
+            timestamp = datetime.now(tz=LOCAL_TZ).strftime('%Y%m%d_%H%M%S')
+            filename = f"{gravacao.id}_{timestamp}.{output_format}"
+            filepath = os.path.join(Config.STORAGE_PATH, 'audio', filename)
+            gravacao.arquivo_nome = filename
+            gravacao.arquivo_url = f"/api/files/audio/{filename}"
+        db.session.commit()
 
-        ffmpeg_process = subprocess.Popen(
-            ffmpeg_cmd,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.PIPE,
-        )
-        ACTIVE_PROCESSES[gravacao.id] = ffmpeg_process
-    except Exception as exc:
+        # Uma conexão/ffmpeg por rádio: gravações simultâneas da mesma origem compartilham o hub
+        if segmentado:
+            subscriber = attach_segmented_recording(
+                radio.stream_url,
+                output_format,
+                bitrate_kbps,
+                channels,
+                gravacao_id=gravacao.id,
+                duration_seconds=duration_seconds,
+                on_close=on_close,
+            )
+        else:
+            subscriber = attach_recording(
+                radio.stream_url,
+                output_format,
+                bitrate_kbps,
+                channels,
+                gravacao_id=gravacao.id,
+                filepath=filepath,
+                duration_seconds=duration_seconds,
+                on_close=on_close,
+            )
+    except Exception:
+        current_app.logger.exception(f"Falha ao iniciar gravacao {gravacao.id}")
         _finalizar_gravacao(gravacao, 'erro', filepath, duration_seconds, agendamento)
-        raise exc
+        return
+    supervisor.register(request, subscriber)
+    # Timeout de segurança: duração solicitada + 20s, mais a sondagem de um hub recém-criado
+    request.deadline = reaper.call_later(
+        duration_seconds + 20 + Config.STREAM_PROBE_TIMEOUT + 5, _recording_timeout, subscriber
+    )
+    if subscriber.done.is_set():
+        # Hub caiu antes do registro: o on_close já passou sem achar a gravação
+        reaper.submit(_complete_recording, request, subscriber)
+
+    # Remux sem decodificar quando a origem já entrega o formato desejado (custo de CPU ~zero);
+    # num hub recém-criado a sondagem ainda está rodando e o modo é gravado na finalização
+    gravacao.ingest_mode = subscriber.hub.ingest_mode
+    db.session.commit()
+    _enqueue_live_keywords(gravacao)
 
     broadcast_update(f'user_{gravacao.user_id}', 'gravacao_started', gravacao.to_dict())
+    _ensure_progress_ticker()
 
+
+def recording_progress(gravacao_id):
+    """Progresso ao vivo de uma gravação acompanhada pelo supervisor; None se não estiver gravando."""
+    request = supervisor.get(gravacao_id)
+    if request is None or request.subscriber is None:
+        return None
+    return _progress_snapshot(request)
+
+
+def is_recording_file(filepath):
+    """True se algum hub ainda está escrevendo neste arquivo."""
+    target = os.path.abspath(filepath)
+    return any(
+        request.subscriber is not None and os.path.abspath(request.subscriber.filepath) == target
+        for request in supervisor.active_requests()
+    )
+
+
+def _progress_snapshot(request):
+    subscriber = request.subscriber
+    out_time = subscriber.media_seconds
+    duration = request.duration_seconds or 0
+    return {
+        'gravacao_id': request.gravacao_id,
+        'out_time_seconds': round(out_time, 1),
+        'total_size': subscriber.bytes_written,
+        'duracao_segundos': duration,
+        'percent': round(min(100.0, out_time * 100 / duration), 1) if duration else None,
+        # Velocidade do ffmpeg do hub (~1.0x num stream ao vivo; abaixo disso está atrasando)
+        'speed': subscriber.hub.progress.speed,
+    }
+
+
+_progress_lock = threading.Lock()
+_progress_ticking = False
+
+
+def _ensure_progress_ticker():
+    global _progress_ticking
+    with _progress_lock:
+        if _progress_ticking:
+            return
+        _progress_ticking = True
+    reaper.call_later(Config.RECORDING_PROGRESS_INTERVAL, _progress_tick)
+
+
+def _progress_tick():
+    """Junta o progresso das gravações ativas e emite um `gravacao_progress` por sala.
+
+    Roda no laço do reaper a cada RECORDING_PROGRESS_INTERVAL e para sozinho quando não
+    há mais gravações ativas.
+    """
+    global _progress_ticking
+    rooms = {}
+    for request in supervisor.active_requests():
+        if request.subscriber is None or request.subscriber.done.is_set():
+            continue
+        rooms.setdefault(f'user_{request.user_id}', []).append(_progress_snapshot(request))
+    with _progress_lock:
+        # Reconferir sob o lock: uma gravação registrada agora encontraria o ticker ligado
+        if not rooms and not supervisor.active_requests():
+            _progress_ticking = False
+            return
+    for room, items in rooms.items():
+        reaper.submit(broadcast_update, room, 'gravacao_progress', {'gravacoes': items})
+    reaper.call_later(Config.RECORDING_PROGRESS_INTERVAL, _progress_tick)
+
+
+def _recording_timeout(subscriber):
+    if not subscriber.done.is_set():
+        subscriber.hub.detach(subscriber, 'timeout')
+
+
+def _enqueue_keyword_job(gravacao):
+    """Rádio com listas de palavras-chave ativas: transcrição e clipes vão para o worker de jobs.
+
+    As listas dos agendamentos entram pelo índice (keyword_index) durante o processamento.
+    """
+    from services.job_service import enqueue_job
+
+    if not keyword_index.has_lists(gravacao.user_id, gravacao.radio_id):
+        return
+    enqueue_job('process_ai', gravacao.user_id, {'palavras_chave': []}, gravacao_id=gravacao.id)
+    db.session.commit()
+
+
+def _enqueue_analysis(gravacao):
+    """Análise pós-gravação (picos, silêncio, fala, impressões digitais) no worker de jobs."""
     try:
-        app_obj = current_app._get_current_object()
+        enqueue_analysis(gravacao)
+        db.session.commit()
     except Exception:
-        app_obj = None
+        db.session.rollback()
+        current_app.logger.exception(f"Falha ao enfileirar analise da gravacao {gravacao.id}")
 
-    def wait_and_finalize():
-        if app_obj:
-            ctx = app_obj.app_context()
-            ctx.push()
+
+def _enqueue_live_keywords(gravacao):
+    """Alertas de palavras-chave durante a gravação (processos de monitoramento do worker)."""
+    from services.live_keyword_service import enqueue_live_keywords
+
+    try:
+        if enqueue_live_keywords(gravacao) is not None:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception(f"Falha ao enfileirar alertas ao vivo da gravacao {gravacao.id}")
+
+
+def _complete_recording(request, subscriber):
+    """Finaliza a gravação cujo arquivo o hub fechou (roda no pool do reaper)."""
+    if supervisor.unregister(request.gravacao_id) is None:
+        # stop_recording (ou a falha ao iniciar) já finalizou esta gravação
+        return
+    if request.deadline is not None:
+        request.deadline.cancel()
+
+    ctx = request.app.app_context() if request.app else None
+    if ctx:
+        ctx.push()
+    gravacao_id = request.gravacao_id
+    filepath = subscriber.filepath
+    duration_seconds = request.duration_seconds
+    try:
+        gravacao = Gravacao.query.get(gravacao_id)
+        agendamento = Agendamento.query.get(request.agendamento_id) if request.agendamento_id else None
+        if not gravacao:
+            return
+        if subscriber.ok:
+            _finalizar_gravacao(gravacao, 'concluido', filepath, duration_seconds, agendamento, subscriber=subscriber)
+            # Picos da forma de onda (e demais análises) no worker de jobs
+            _enqueue_analysis(gravacao)
+            _enqueue_keyword_job(gravacao)
         else:
-            ctx = None
-        try:
-            # Timeout de segurança: duração solicitada + 20s
+            # Logar erro para depurar streams que não gravam
+            hub = subscriber.hub
+            msg = (
+                f"ffmpeg failed for gravacao {gravacao_id} "
+                f"(reason={subscriber.reason}, return_code={hub.return_code}, "
+                f"size={subscriber.bytes_written})"
+            )
             try:
-                return_code = ffmpeg_process.wait(timeout=duration_seconds + 20)
-                timed_out = False
-            except subprocess.TimeoutExpired:
-                ffmpeg_process.terminate()
-                return_code = -1
-                timed_out = True
-            stderr_output = b''
-            try:
-                if ffmpeg_process.stderr:
-                    stderr_output = ffmpeg_process.stderr.read()
+                stderr_tail = hub.stderr_tail.text()
+                if stderr_tail:
+                    msg += f" stderr={stderr_tail}"
+                current_app.logger.error(msg)
             except Exception:
                 pass
+            _finalizar_gravacao(gravacao, 'erro', filepath, duration_seconds, agendamento, subscriber=subscriber)
+    except Exception:
+        db.session.rollback()
+        gravacao = Gravacao.query.get(gravacao_id)
+        if gravacao:
+            _finalizar_gravacao(gravacao, 'erro', filepath, duration_seconds)
+    finally:
+        if ctx:
+            ctx.pop()
 
-            file_exists = filepath and os.path.exists(filepath)
-            file_size = os.path.getsize(filepath) if file_exists else 0
-            min_ok_bytes = 1024  # ~1KB para considerar arquivo válido
-            file_ok = file_exists and file_size >= min_ok_bytes
-
-            if return_code == 0 and file_ok:
-                _finalizar_gravacao(gravacao, 'concluido', filepath, duration_seconds, agendamento)
-            else:
-                # Logar erro para depurar streams que nÇ¬o gravam
-                msg = (
-                    f"ffmpeg failed for gravacao {gravacao.id} "
-                    f"(return_code={return_code}, exists={file_exists}, size={file_size}, timed_out={timed_out})"
-                )
-                try:
-                    if stderr_output:
-                        msg += f" stderr={stderr_output.decode(errors='ignore')[:2000]}"
-                    current_app.logger.error(msg)
-                except Exception:
-                    pass
-                _finalizar_gravacao(gravacao, 'erro', filepath, duration_seconds, agendamento)
-        except Exception:
-            _finalizar_gravacao(gravacao, 'erro', filepath, duration_seconds, agendamento)
-        finally:
-            ACTIVE_PROCESSES.pop(gravacao.id, None)
-            if ctx:
-                ctx.pop()
-
-    if block:
-        wait_and_finalize()
-    else:
-        threading.Thread(target=wait_and_finalize, daemon=True).start()
 
-    return ffmpeg_process
+supervisor.starter = _begin_recording
 
 
-def stop_recording(gravacao):
-    """Para grava??o em andamento manualmente."""
-    filepath = _get_audio_filepath(gravacao)
+def concat_gravacao_segments(gravacao, *, remove_segments=False):
+    """Gera o arquivo único de uma gravação segmentada já encerrada e aponta a gravação para ele."""
+    if not gravacao.segmentado:
+        raise ValueError("Gravacao nao segmentada")
+    if supervisor.is_tracked(gravacao.id) or gravacao.status in ('na_fila', 'iniciando', 'gravando'):
+        raise ValueError("Gravacao ainda em andamento")
+    filename = concat_segments(gravacao, remove_segments=remove_segments)
+    gravacao.arquivo_nome = filename
+    gravacao.arquivo_url = f"/api/files/audio/{filename}"
+    if remove_segments:
+        gravacao.segmentado = False
+    db.session.commit()
+    broadcast_update(f'user_{gravacao.user_id}', 'gravacao_updated', gravacao.to_dict())
+    return gravacao
 
-    proc = ACTIVE_PROCESSES.pop(gravacao.id, None)
-    if proc:
-        try:
-            proc.terminate()
-        except Exception:
-            pass
 
-    _finalizar_gravacao(gravacao, 'concluido', filepath=filepath)
+def create_retroactive_gravacao(radio, user_id, start_dt, end_dt, *, palavra_chave=None):
+    """Cria gravação (e opcionalmente clipe) de uma janela passada a partir do buffer da rádio.
 
+    Não abre conexão com a rádio nem re-codifica: só concatena segmentos já gravados.
+    Levanta ValueError se a janela não estiver disponível no buffer.
+    """
+    from models.clip import Clip
+    from services.ring_buffer_service import stitch_window
+
+    output_format = recording_profile(radio)[0]
+    start_ts = start_dt.timestamp()
+    end_ts = end_dt.timestamp()
+    if end_ts <= start_ts:
+        raise ValueError("fim deve ser posterior ao inicio")
+
+    gravacao = Gravacao(
+        user_id=user_id,
+        radio_id=radio.id,
+        status='iniciando',
+        tipo='retroativo',
+        ingest_mode='ring',
+        criado_em=start_dt,
+    )
+    db.session.add(gravacao)
+    db.session.flush()
 
+    filename = f"{gravacao.id}_{start_dt.astimezone(LOCAL_TZ).strftime('%Y%m%d_%H%M%S')}.{output_format}"
+    filepath = os.path.join(Config.STORAGE_PATH, 'audio', filename)
+    try:
+        _written, seconds = stitch_window(radio, start_ts, end_ts, filepath)
+    except Exception:
+        db.session.rollback()
+        raise
 
-def process_audio_with_ai(gravacao, palavras_chave):
-    """Processa áudio com IA para gerar clipes"""
-    from models.clip import Clip
-    
-    # Atualizar status
-    gravacao.status = 'processando'
-    db.session.commit()
-    
-    # Aqui você implementaria a lógica de processamento com IA
-    # Por enquanto, retornamos uma resposta mock
-    
-    # Exemplo: criar clipes baseados em palavras-chave
-    clips = []
-    for palavra in palavras_chave:
-        # Mock: criar clipe de exemplo
+    duration = max(1, int(round(seconds)))
+    gravacao.arquivo_nome = filename
+    gravacao.arquivo_url = f"/api/files/audio/{filename}"
+    gravacao.duracao_segundos = duration
+    gravacao.duracao_minutos = max(1, round(duration / 60))
+    gravacao.tamanho_mb = _file_size_mb(filepath) or 0.0
+    gravacao.status = 'concluido'
+
+    clip = None
+    if palavra_chave:
+        clip_filename = f"{gravacao.id}_retro.{output_format}"
+        stitch_window(radio, start_ts, end_ts, os.path.join(Config.STORAGE_PATH, 'clips', clip_filename))
         clip = Clip(
             gravacao_id=gravacao.id,
-            palavra_chave=palavra,
+            palavra_chave=palavra_chave,
             inicio_segundos=0,
-            fim_segundos=30,
-            arquivo_url=None  # Será gerado pelo processamento
+            fim_segundos=duration,
+            arquivo_url=f"/api/files/clips/{clip_filename}",
         )
         db.session.add(clip)
-        clips.append(clip)
-    
+
     db.session.commit()
-    
-    gravacao.status = 'concluido'
+    broadcast_update(f'user_{gravacao.user_id}', 'gravacao_updated', gravacao.to_dict())
+    _enqueue_analysis(gravacao)
+    return gravacao, clip
+
+
+def stop_recording(gravacao):
+    """Para gravação em andamento (ou ainda na fila) manualmente."""
+    if supervisor.cancel(gravacao.id):
+        gravacao.status = 'cancelado'
+        db.session.commit()
+        broadcast_update(f'user_{gravacao.user_id}', 'gravacao_updated', gravacao.to_dict())
+        return
+
+    filepath = _get_audio_filepath(gravacao)
+
+    request = supervisor.unregister(gravacao.id)
+    if request and request.deadline is not None:
+        request.deadline.cancel()
+    if request and request.subscriber:
+        # Só desanexa esta gravação; o hub segue atendendo as demais da mesma rádio
+        request.subscriber.hub.detach(request.subscriber, 'stopped')
+
+    subscriber = request.subscriber if request else None
+    _finalizar_gravacao(gravacao, 'concluido', filepath=filepath, subscriber=subscriber)
+
+
+
+def process_audio_with_ai(gravacao, palavras_chave, progress=None):
+    """Transcreve a gravação e gera um clipe para cada ocorrência das palavras-chave.
+
+    Roda no worker de jobs; `progress(percent, mensagem)` reporta o andamento e pode
+    levantar JobCancelled. Em qualquer falha o status anterior da gravação é restaurado.
+    """
+    from models.clip import Clip
+
+    report = progress or (lambda *_args, **_kwargs: None)
+    status_anterior = gravacao.status
+
+    # Atualizar status
+    gravacao.status = 'processando'
     db.session.commit()
-    
+    broadcast_update(f'user_{gravacao.user_id}', 'gravacao_updated', gravacao.to_dict())
+
+    try:
+        report(5, 'Transcrevendo audio', force=True)
+        words = transcribe_gravacao(
+            gravacao, progress=lambda fraction: report(5 + 80 * fraction, 'Transcrevendo audio')
+        )
+        report(85, 'Buscando palavras-chave', force=True)
+        hits = find_keyword_hits(words, palavras_chave)
+        # Listas dos agendamentos do dono para esta rádio: uma passada no índice de todas as listas
+        monitorados = keyword_index.match(words, user_id=gravacao.user_id, radio_id=gravacao.radio_id)
+        hits.extend((payload[3], inicio, fim) for payload, inicio, fim in monitorados)
+
+        # Um clipe por ocorrência (ocorrências próximas da mesma palavra viram um só)
+        clips = []
+        for palavra, inicio, fim in keyword_clip_windows(hits, gravacao.duracao_segundos):
+            clip = Clip(
+                gravacao_id=gravacao.id,
+                palavra_chave=palavra,
+                inicio_segundos=inicio,
+                fim_segundos=fim,
+                arquivo_url=None  # Preenchido por materialize_clips
+            )
+            db.session.add(clip)
+            clips.append(clip)
+        db.session.flush()
+
+        report(90, 'Gerando arquivos dos clipes', force=True)
+        # Corta os arquivos dos clipes da gravação de origem (sem re-encode)
+        materialize_clips(clips)
+        gravacao.status = status_anterior if status_anterior != 'processando' else 'concluido'
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        gravacao.status = status_anterior if status_anterior != 'processando' else 'concluido'
+        db.session.commit()
+        broadcast_update(f'user_{gravacao.user_id}', 'gravacao_updated', gravacao.to_dict())
+        raise
+
+    if monitorados:
+        broadcast_update(f'user_{gravacao.user_id}', 'keyword_hits', {
+            'gravacao_id': gravacao.id,
+            'radio_id': gravacao.radio_id,
+            'ocorrencias': [
+                {'palavra_chave': payload[3], 'agendamento_id': payload[2], 'inicio': inicio, 'fim': fim}
+                for payload, inicio, fim in monitorados
+            ],
+        })
+
     # Broadcast update
     broadcast_update(f'user_{gravacao.user_id}', 'gravacao_processed', {
         'gravacao': gravacao.to_dict(),
         'clips': [c.to_dict() for c in clips]
     })
-    
-    return {'clips_created': len(clips)}
+
+    return {'clips_created': len(clips), 'clip_ids': [c.id for c in clips], 'ocorrencias': len(hits)}
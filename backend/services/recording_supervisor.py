@@ -0,0 +1,240 @@
+"""Supervisor de gravações: admissão por orçamento de CPU e fila com prioridade.
+
+Todo ffmpeg de captura nasce de um hub de ingestão; o supervisor decide quando uma
+gravação pode abrir um hub novo. Anexar a um hub que já existe custa quase nada e é
+sempre admitido. O que não cabe no orçamento espera na fila (agendado > manual > massa)
+em vez de sobrecarregar a máquina, e o tempo de espera fica medido.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+from config import Config
+from services import ingest_hub
+
+PRIORITIES = {'agendado': 0, 'manual': 1, 'massa': 2}
+DEFAULT_PRIORITY = 1
+ATTACH_COST = 0.005  # escrita em disco de uma gravação anexada a hub existente
+WAIT_SAMPLES = 500
+DISPATCH_INTERVAL_SECONDS = 1.0
+
+
+def encode_cost(output_format, ingest_mode=None):
+    """Custo estimado (fração de um núcleo) de um hub por formato/modo de ingestão."""
+    if ingest_mode == 'copy':
+        return Config.RECORDING_COST_COPY
+    if output_format == 'opus':
+        return Config.RECORDING_COST_OPUS
+    return Config.RECORDING_COST_MP3
+
+
+def cpu_budget():
+    """Orçamento total em núcleos (RECORDING_CPU_BUDGET ou fração dos núcleos da máquina)."""
+    if Config.RECORDING_CPU_BUDGET:
+        return Config.RECORDING_CPU_BUDGET
+    return (os.cpu_count() or 1) * Config.RECORDING_CPU_FRACTION
+
+
+class RecordingRequest:
+    """Gravação aguardando (ou já com) vaga no supervisor."""
+
+    __slots__ = (
+        'gravacao_id', 'user_id', 'agendamento_id', 'duration_seconds', 'priority',
+        'hub_key', 'output_format', 'enqueued_at', 'app', 'subscriber', 'deadline',
+    )
+
+    def __init__(self, gravacao_id, *, user_id, agendamento_id, duration_seconds, tipo, hub_key, output_format, app):
+        self.gravacao_id = gravacao_id
+        self.user_id = user_id
+        self.agendamento_id = agendamento_id
+        self.duration_seconds = duration_seconds
+        self.priority = PRIORITIES.get(tipo, DEFAULT_PRIORITY)
+        self.hub_key = hub_key
+        self.output_format = output_format
+        self.enqueued_at = time.monotonic()
+        self.app = app
+        self.subscriber = None
+        self.deadline = None  # Timer do reaper que encerra a gravação se o hub travar
+
+
+class RecordingSupervisor:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._active = {}
+        self._reserved = 0.0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._thread = None
+        self.starter = None  # callable(request) definido pelo recording_service
+
+    # -- custo -------------------------------------------------------------
+
+    def _in_use(self):
+        hubs = list(ingest_hub.HUBS.values())
+        cost = sum(encode_cost(hub.output_format, hub.ingest_mode) for hub in hubs)
+        return cost + ATTACH_COST * len(self._active) + self._reserved
+
+    def _estimated_cost(self, request):
+        hub = ingest_hub.HUBS.get(request.hub_key)
+        if hub is not None and not hub.closing:
+            return ATTACH_COST
+        return encode_cost(request.output_format)
+
+    def _fits(self, cost):
+        return self._in_use() + cost <= cpu_budget()
+
+    def has_capacity(self, cost):
+        """Há folga para um hub extra (ex.: buffer contínuo) sem atrasar gravações na fila."""
+        with self._cond:
+            return not self._queue and self._fits(cost)
+
+    # -- fila --------------------------------------------------------------
+
+    def submit(self, request):
+        """Admite a gravação agora (executando `starter` nesta thread) ou coloca na fila.
+
+        Retorna True se começou imediatamente.
+        """
+        with self._cond:
+            cost = self._estimated_cost(request)
+            admitted = cost <= ATTACH_COST or (not self._queue and self._fits(cost))
+            if admitted:
+                self._reserved += cost
+            else:
+                heapq.heappush(self._queue, (request.priority, next(self._seq), request))
+                self._ensure_dispatcher()
+                self._cond.notify()
+        if admitted:
+            self._run(request, cost)
+        return admitted
+
+    def cancel(self, gravacao_id):
+        """Remove da fila uma gravação que ainda não começou; True se estava na fila."""
+        with self._cond:
+            kept = [item for item in self._queue if item[2].gravacao_id != gravacao_id]
+            removed = len(kept) != len(self._queue)
+            if removed:
+                self._queue = kept
+                heapq.heapify(self._queue)
+            return removed
+
+    def _pop_admissible(self):
+        """Retira da fila o que cabe no orçamento, respeitando a prioridade.
+
+        Gravações que só se anexam a um hub existente passam mesmo atrás de um item
+        bloqueado, já que não consomem orçamento relevante.
+        """
+        admitted = []
+        kept = []
+        blocked = False
+        for item in sorted(self._queue):
+            request = item[2]
+            cost = self._estimated_cost(request)
+            if cost <= ATTACH_COST or (not blocked and self._fits(cost)):
+                self._reserved += cost
+                admitted.append((request, cost))
+            else:
+                blocked = True
+                kept.append(item)
+        self._queue = kept
+        heapq.heapify(self._queue)
+        return admitted
+
+    def _ensure_dispatcher(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+            self._thread.start()
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait(timeout=DISPATCH_INTERVAL_SECONDS)
+                admitted = self._pop_admissible() if self._queue else []
+            for request, cost in admitted:
+                if request.app is not None:
+                    with request.app.app_context():
+                        self._run(request, cost)
+                else:
+                    self._run(request, cost)
+
+    def _run(self, request, cost):
+        waited = time.monotonic() - request.enqueued_at
+        try:
+            self.starter(request)
+        finally:
+            with self._cond:
+                self._reserved = max(0.0, self._reserved - cost)
+                self._waits.append(waited)
+
+    # -- gravações ativas --------------------------------------------------
+
+    def register(self, request, subscriber):
+        request.subscriber = subscriber
+        with self._cond:
+            self._active[request.gravacao_id] = request
+
+    def unregister(self, gravacao_id):
+        """Tira a gravação dos ativos e acorda a fila (pode ter liberado um hub)."""
+        with self._cond:
+            request = self._active.pop(gravacao_id, None)
+            self._cond.notify()
+        return request
+
+    def get(self, gravacao_id):
+        with self._cond:
+            return self._active.get(gravacao_id)
+
+    def active_requests(self):
+        with self._cond:
+            return list(self._active.values())
+
+    def is_tracked(self, gravacao_id):
+        """Gravação ativa ou aguardando vaga neste processo."""
+        with self._cond:
+            return gravacao_id in self._active or any(item[2].gravacao_id == gravacao_id for item in self._queue)
+
+    def tracked_agendamentos(self):
+        with self._cond:
+            ids = {req.agendamento_id for req in self._active.values()}
+            ids.update(item[2].agendamento_id for item in self._queue)
+        ids.discard(None)
+        return ids
+
+    # -- métricas ----------------------------------------------------------
+
+    def stats(self):
+        now = time.monotonic()
+        with self._cond:
+            queue = [item[2] for item in sorted(self._queue)]
+            waits = sorted(self._waits)
+            in_use = self._in_use()
+            active = len(self._active)
+        p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+        return {
+            'cpu_budget': round(cpu_budget(), 3),
+            'cpu_in_use': round(in_use, 3),
+            'hubs': len(ingest_hub.HUBS),
+            'active_recordings': active,
+            'queue_depth': len(queue),
+            'queue': [
+                {
+                    'gravacao_id': req.gravacao_id,
+                    'priority': req.priority,
+                    'waiting_seconds': round(now - req.enqueued_at, 1),
+                }
+                for req in queue
+            ],
+            'wait_seconds': {
+                'samples': len(waits),
+                'avg': round(sum(waits) / len(waits), 3) if waits else 0.0,
+                'p95': round(p95, 3),
+                'max': round(waits[-1], 3) if waits else 0.0,
+            },
+        }
+
+
+supervisor = RecordingSupervisor()
@@ -0,0 +1,300 @@
+"""Buffer circular em disco por rádio para gravações e clipes retroativos.
+
+Rádios com `ring_buffer_enabled` ficam permanentemente anexadas ao hub de ingestão e
+gravam segmentos curtos em storage/ring/<radio_id>/, descartando os mais antigos que
+`ring_buffer_hours`. Uma janela passada é montada concatenando os quadros/páginas dos
+segmentos existentes: sem nova conexão com a rádio e sem re-encode.
+"""
+import os
+import shutil
+import threading
+import time
+from typing import Dict
+
+from config import Config
+from services.ingest_hub import attach_subscriber
+from utils.audio_frames import (
+    iter_mp3_frames,
+    iter_ogg_pages,
+    OggStreamRewriter,
+    OGG_NO_GRANULE,
+    OPUS_SAMPLE_RATE,
+)
+
+PRUNE_INTERVAL_SECONDS = 60
+
+# Escritores de buffer ativos por rádio
+RING_WRITERS: Dict[str, 'RingSegmentWriter'] = {}
+_RING_LOCK = threading.Lock()
+
+
+def ring_dir(radio_id):
+    return os.path.join(Config.STORAGE_PATH, 'ring', radio_id)
+
+
+def _segment_name(start_ms, base_granule, ext):
+    return f"{start_ms}_{base_granule}.{ext}"
+
+
+def list_segments(radio_id):
+    """Segmentos do buffer em ordem: [(inicio_epoch, granule_base, caminho)]."""
+    directory = ring_dir(radio_id)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    segments = []
+    for name in names:
+        stem, _, _ext = name.partition('.')
+        start_ms, _, base = stem.partition('_')
+        try:
+            segments.append((int(start_ms) / 1000, int(base or 0), os.path.join(directory, name)))
+        except ValueError:
+            continue
+    segments.sort()
+    return segments
+
+
+def prune_segments(radio_id, retention_seconds):
+    """Remove segmentos que já saíram da janela de retenção."""
+    cutoff = time.time() - retention_seconds
+    segments = list_segments(radio_id)
+    # O segmento seguinte marca o fim do anterior: só apaga quando o próximo também é antigo
+    for (start, _base, path), nxt in zip(segments, segments[1:]):
+        if nxt[0] > cutoff:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class RingSegmentWriter:
+    """Ouvinte permanente do hub que grava o stream em segmentos rotativos."""
+
+    def __init__(self, hub, radio_id, retention_seconds):
+        self.hub = hub
+        self.gravacao_id = None
+        self.radio_id = radio_id
+        self.retention_seconds = retention_seconds
+        self.segment_seconds = Config.RING_SEGMENT_SECONDS
+        self.ext = 'opus' if hub.output_format == 'opus' else 'mp3'
+        self.reason = None
+        self.done = threading.Event()
+        self.complete = False
+        self._file = None
+        self._segment_media = 0.0
+        self._segment_base = 0
+        self._last_prune = 0.0
+        os.makedirs(ring_dir(radio_id), exist_ok=True)
+
+    def _rotate(self, base_granule=0):
+        if self._file is not None:
+            self._file.close()
+        start_ms = int(time.time() * 1000)
+        path = os.path.join(ring_dir(self.radio_id), _segment_name(start_ms, base_granule, self.ext))
+        self._file = open(path, 'wb')
+        self._segment_media = 0.0
+        self._segment_base = base_granule
+        if self.ext == 'opus':
+            for page in self.hub.header_pages:
+                self._file.write(page.serialize())
+        now = time.monotonic()
+        if now - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+            self._last_prune = now
+            prune_segments(self.radio_id, self.retention_seconds)
+
+    def write_mp3(self, header, frame):
+        if self._file is None or self._segment_media >= self.segment_seconds:
+            self._rotate()
+        self._file.write(frame)
+        self._segment_media += header.duration
+
+    def write_ogg(self, page, previous_granule):
+        # Segmentos Ogg guardam os granules originais do hub e só começam em início de pacote
+        if (self._file is None or self._segment_media >= self.segment_seconds) and not page.continued:
+            self._rotate(previous_granule)
+        if self._file is None:
+            return
+        self._file.write(page.serialize())
+        if page.granule != OGG_NO_GRANULE:
+            self._segment_media = (page.granule - self._segment_base) / OPUS_SAMPLE_RATE
+
+    def close(self, reason):
+        if self.done.is_set():
+            return
+        try:
+            if self._file is not None:
+                self._file.close()
+        except Exception:
+            pass
+        self.reason = reason
+        self.done.set()
+
+
+def _radio_profile(radio):
+    from services.recording_service import recording_profile
+
+    return recording_profile(radio)
+
+
+def _retention_seconds(radio):
+    hours = radio.ring_buffer_hours or Config.RING_BUFFER_DEFAULT_HOURS
+    return max(1, min(int(hours), Config.RING_BUFFER_MAX_HOURS)) * 3600
+
+
+def sync_ring_buffers(radios, can_start=None):
+    """Mantém um escritor vivo para cada rádio habilitada e desliga os demais.
+
+    Chamado periodicamente pelo scheduler; também religa buffers cujo hub caiu.
+    `can_start(output_format)` permite ao supervisor adiar hubs novos quando falta CPU.
+    """
+    wanted = {}
+    for radio in radios:
+        if radio.ring_buffer_enabled and radio.stream_url:
+            wanted[radio.id] = radio
+
+    with _RING_LOCK:
+        for radio_id, writer in list(RING_WRITERS.items()):
+            if writer.done.is_set() or radio_id not in wanted:
+                RING_WRITERS.pop(radio_id, None)
+                if not writer.done.is_set():
+                    writer.hub.detach(writer, 'stopped')
+            else:
+                writer.retention_seconds = _retention_seconds(wanted[radio_id])
+        missing = [radio for radio_id, radio in wanted.items() if radio_id not in RING_WRITERS]
+
+    for radio in missing:
+        output_format, bitrate_kbps, channels = _radio_profile(radio)
+        if can_start and not can_start(output_format):
+            continue
+        retention = _retention_seconds(radio)
+        radio_id = radio.id
+        try:
+            writer = attach_subscriber(
+                radio.stream_url,
+                output_format,
+                bitrate_kbps,
+                channels,
+                lambda hub: RingSegmentWriter(hub, radio_id, retention),
+            )
+        except Exception as e:
+            print(f"Falha ao iniciar buffer da radio {radio_id}: {e}")
+            continue
+        with _RING_LOCK:
+            RING_WRITERS[radio_id] = writer
+
+    # Buffer desligado: descartar os segmentos que sobraram
+    for radio in radios:
+        if radio.id not in wanted:
+            shutil.rmtree(ring_dir(radio.id), ignore_errors=True)
+
+
+def available_window(radio_id):
+    """(inicio, fim) em epoch cobertos pelo buffer da rádio; None se vazio."""
+    segments = list_segments(radio_id)
+    if not segments:
+        return None
+    last_path = segments[-1][2]
+    try:
+        end = os.path.getmtime(last_path)
+    except OSError:
+        end = segments[-1][0]
+    return segments[0][0], end
+
+
+def _window_segments(radio_id, start_ts, end_ts):
+    segments = list_segments(radio_id)
+    selected = []
+    for idx, (seg_start, base, path) in enumerate(segments):
+        seg_end = segments[idx + 1][0] if idx + 1 < len(segments) else float('inf')
+        if seg_end <= start_ts or seg_start >= end_ts:
+            continue
+        selected.append((seg_start, seg_end, base, path))
+    return selected
+
+
+def _stitch_mp3(segments, start_ts, end_ts, out):
+    written = 0
+    media = 0.0
+    for seg_start, seg_end, _base, path in segments:
+        with open(path, 'rb') as fh:
+            if seg_start >= start_ts and seg_end <= end_ts:
+                # Segmento inteiro dentro da janela: cópia direta
+                while True:
+                    chunk = fh.read(256 * 1024)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    written += len(chunk)
+                for _offset, header in iter_mp3_frames(fh):
+                    media += header.duration
+                continue
+            fd = fh.fileno()
+            t = seg_start
+            for offset, header in iter_mp3_frames(fh):
+                if t >= end_ts:
+                    break
+                if t >= start_ts:
+                    frame = os.pread(fd, header.frame_length, offset)
+                    out.write(frame)
+                    written += len(frame)
+                    media += header.duration
+                t += header.duration
+    return written, media
+
+
+def _stitch_ogg(segments, start_ts, end_ts, out):
+    rewriter = None
+    written = 0
+    for seg_start, _seg_end, base, path in segments:
+        with open(path, 'rb') as fh:
+            headers = []
+            previous_granule = base
+            for _offset, page in iter_ogg_pages(fh):
+                if page.granule == 0:
+                    # Cabeçalhos OpusHead/OpusTags repetidos no início de cada segmento
+                    headers.append(page)
+                    continue
+                t = seg_start + (previous_granule - base) / OPUS_SAMPLE_RATE
+                if t >= end_ts:
+                    break
+                if t >= start_ts:
+                    if rewriter is None:
+                        rewriter = OggStreamRewriter(headers)
+                    data = rewriter.push(page, previous_granule)
+                    out.write(data)
+                    written += len(data)
+                if page.granule != OGG_NO_GRANULE:
+                    previous_granule = page.granule
+    if rewriter is None:
+        return 0, 0.0
+    tail = rewriter.close()
+    out.write(tail)
+    written += len(tail)
+    return written, rewriter.samples / OPUS_SAMPLE_RATE
+
+
+def stitch_window(radio, start_ts, end_ts, dest_path):
+    """Monta em `dest_path` o áudio da rádio entre dois instantes (epoch) a partir do buffer.
+
+    Retorna (bytes, segundos). Levanta ValueError se o buffer não cobre a janela.
+    """
+    window = available_window(radio.id)
+    if not window or start_ts < window[0] or start_ts >= window[1]:
+        raise ValueError("Janela fora do buffer disponivel da radio")
+    end_ts = min(end_ts, window[1])
+    segments = _window_segments(radio.id, start_ts, end_ts)
+    output_format = _radio_profile(radio)[0]
+    with open(dest_path, 'wb') as out:
+        if output_format == 'opus':
+            written, seconds = _stitch_ogg(segments, start_ts, end_ts, out)
+        else:
+            written, seconds = _stitch_mp3(segments, start_ts, end_ts, out)
+    if not written:
+        try:
+            os.remove(dest_path)
+        except OSError:
+            pass
+        raise ValueError("Nenhum audio no buffer para a janela solicitada")
+    return written, seconds
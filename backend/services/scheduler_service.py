@@ -10,8 +10,13 @@ from flask import current_app
 from app import db
 from models.agendamento import Agendamento
 from models.gravacao import Gravacao
-from services.recording_service import start_recording
-from services.websocket_service import broadcast_update
+from models.radio import Radio
+from config import Config
+from services.fingerprint_service import backfill_fingerprints
+from services.recording_service import start_recording, reconcile_gravacoes_metadata
+from services.recording_supervisor import supervisor, encode_cost
+from services.ring_buffer_service import sync_ring_buffers
+from services.websocket_service import broadcast_update, drain_outbox
 
 LOCAL_TZ = ZoneInfo("America/Fortaleza")
 scheduler = BackgroundScheduler(
@@ -56,6 +61,35 @@ def init_scheduler(app=None):
                 id="ag_cleanup",
                 replace_existing=True,
             )
+            # Duração/tamanho/status das gravações conciliados fora das rotas GET
+            scheduler.add_job(
+                reconcile_metadata_job,
+                IntervalTrigger(seconds=Config.METADATA_RECONCILE_SECONDS),
+                id="metadata_reconcile",
+                replace_existing=True,
+            )
+            # Eventos (progresso de jobs etc.) gravados pelo worker, entregues aos clientes
+            scheduler.add_job(
+                drain_outbox_job,
+                IntervalTrigger(seconds=Config.OUTBOX_POLL_SECONDS),
+                id="outbox_drain",
+                replace_existing=True,
+            )
+            # Impressões digitais das gravações concluídas antes do índice existir
+            scheduler.add_job(
+                fingerprint_backfill_job,
+                IntervalTrigger(minutes=5),
+                id="fingerprint_backfill",
+                replace_existing=True,
+            )
+            # Mantém os buffers contínuos das rádios habilitadas (religa se o hub cair)
+            scheduler.add_job(
+                sync_ring_buffers_job,
+                IntervalTrigger(minutes=1),
+                id="ring_sync",
+                replace_existing=True,
+                next_run_time=datetime.now(tz=LOCAL_TZ),
+            )
     except Exception as e:
         print(f"Erro ao carregar agendamentos: {e}")
 
@@ -144,8 +178,12 @@ def cleanup_agendamentos_stuck():
         with app_obj.app_context():
             now = datetime.now(tz=LOCAL_TZ).replace(tzinfo=None)
             stuck = Agendamento.query.filter_by(status="em_execucao").all()
+            # Agendamentos com gravação ainda na fila ou em andamento não estão travados
+            em_andamento = supervisor.tracked_agendamentos()
             atualizados = []
             for ag in stuck:
+                if ag.id in em_andamento:
+                    continue
                 duracao = ag.duracao_minutos or 0
                 fim_previsto = (ag.data_inicio or now) + timedelta(minutes=duracao, seconds=60)
                 if fim_previsto <= now:
@@ -163,6 +201,70 @@ def cleanup_agendamentos_stuck():
             pass
 
 
+def reconcile_metadata_job():
+    """Concilia metadados/status das gravações em lotes (marca d'água em atualizado_em)."""
+    app_obj = _capture_scheduler_app()
+    if not app_obj:
+        return
+
+    try:
+        with app_obj.app_context():
+            reconcile_gravacoes_metadata()
+    except Exception as e:
+        try:
+            print(f"reconcile_metadata_job falhou: {e}")
+        except Exception:
+            pass
+
+
+def drain_outbox_job():
+    """Entrega aos clientes os eventos que o worker deixou no outbox."""
+    app_obj = _capture_scheduler_app()
+    if not app_obj:
+        return
+
+    try:
+        with app_obj.app_context():
+            drain_outbox()
+    except Exception as e:
+        try:
+            print(f"drain_outbox_job falhou: {e}")
+        except Exception:
+            pass
+
+
+def fingerprint_backfill_job():
+    """Enfileira impressões digitais de gravações antigas em lotes pequenos."""
+    app_obj = _capture_scheduler_app()
+    if not app_obj:
+        return
+
+    try:
+        with app_obj.app_context():
+            backfill_fingerprints()
+    except Exception as e:
+        try:
+            print(f"fingerprint_backfill_job falhou: {e}")
+        except Exception:
+            pass
+
+
+def sync_ring_buffers_job():
+    """Sincroniza os buffers circulares com a configuração atual das rádios."""
+    app_obj = _capture_scheduler_app()
+    if not app_obj:
+        return
+
+    try:
+        with app_obj.app_context():
+            sync_ring_buffers(Radio.query.all(), can_start=lambda fmt: supervisor.has_capacity(encode_cost(fmt)))
+    except Exception as e:
+        try:
+            print(f"sync_ring_buffers_job falhou: {e}")
+        except Exception:
+            pass
+
+
 def unschedule_agendamento(agendamento_id):
     """Remove job existente, se houver."""
     try:
@@ -233,6 +335,7 @@ def execute_agendamento(agendamento_id):
             status='iniciando',
             tipo='agendado',
             duracao_minutos=agendamento.duracao_minutos,
+            segmentado=Config.RECORDING_SEGMENTED,
         )
         db.session.add(gravacao)
         db.session.commit()
@@ -241,14 +344,13 @@ def execute_agendamento(agendamento_id):
         db.session.commit()
         broadcast_update(f"user_{agendamento.user_id}", "agendamento_updated", agendamento.to_dict())
 
-        next_status = _next_status_after_run(agendamento)
         try:
-            # Bloqueia até terminar; recording_service finaliza status e atualiza gravação/arquivo
+            # Não bloqueia o worker do scheduler: o supervisor admite ou enfileira a gravação
+            # e recording_service finaliza status de gravação/agendamento ao terminar
             start_recording(
                 gravacao,
                 duration_seconds=agendamento.duracao_minutos * 60,
                 agendamento=agendamento,
-                block=True,
             )
         except Exception:
             agendamento.status = 'erro'
@@ -256,11 +358,6 @@ def execute_agendamento(agendamento_id):
             db.session.commit()
             broadcast_update(f"user_{agendamento.user_id}", "agendamento_updated", agendamento.to_dict())
             broadcast_update(f"user_{agendamento.user_id}", "gravacao_updated", gravacao.to_dict())
-        # Fallback para nao ficar travado em "em_execucao"/"Gravando"
-        if agendamento.status == 'em_execucao':
-            agendamento.status = next_status
-            db.session.commit()
-            broadcast_update(f"user_{agendamento.user_id}", "agendamento_updated", agendamento.to_dict())
 
         if agendamento.tipo_recorrencia == 'none':
             unschedule_agendamento(agendamento.id)
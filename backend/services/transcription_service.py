@@ -0,0 +1,173 @@
+"""Transcrição das gravações e busca de palavras-chave com tempos reais.
+
+A gravação é decodificada uma vez em blocos (PCM 16 kHz mono); o áudio classificado como
+música é zerado (utils.speech_music, com os intervalos da análise ou classificando na
+mesma passada), o VAD separa os trechos de fala e cada trecho vai para um pool de
+processos com o motor STT carregado (utils.stt). Os segmentos com tempos por palavra
+ficam em `transcricao_segmentos` e são reaproveitados nas próximas buscas, então trocar
+as palavras-chave não retranscreve.
+"""
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from app import db
+from config import Config
+from models.transcricao_segmento import TranscricaoSegmento
+from services.analysis_service import analysis_source, decode_pcm_chunks, set_speech_segments
+from utils.keyword_matcher import KeywordAutomaton, normalize_text
+from utils.speech_music import SpeechGate
+from utils.stt import STT_SAMPLE_RATE, init_worker, transcribe_chunk
+from utils.vad import VadChunker
+
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+
+
+def _engine_options():
+    return {
+        'model': Config.STT_MODEL,
+        'language': Config.STT_LANGUAGE,
+        'cpu_threads': Config.STT_THREADS_PER_WORKER,
+        'stub_text': Config.STT_STUB_TEXT,
+    }
+
+
+def get_stt_pool(engine):
+    """Pool de processos com o motor já carregado (recriado se o motor mudar)."""
+    global _pool, _pool_key
+    options = _engine_options()
+    key = (engine, tuple(sorted(options.items())))
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=Config.STT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+                initargs=(engine, options),
+            )
+            _pool_key = key
+        return _pool
+
+
+def _stored_words(gravacao_id):
+    words = []
+    segmentos = (
+        TranscricaoSegmento.query
+        .filter_by(gravacao_id=gravacao_id)
+        .order_by(TranscricaoSegmento.inicio)
+        .all()
+    )
+    for segmento in segmentos:
+        words.extend(tuple(p) for p in segmento.get_palavras_list())
+    return words
+
+
+def transcribe_gravacao(gravacao, progress=None, *, force=False):
+    """Transcreve a gravação (ou reaproveita a transcrição salva) e retorna as palavras.
+
+    Retorna [(palavra, inicio, fim, prob)] em ordem. `progress(fração)` recebe 0..1
+    conforme o áudio é decodificado. Faz flush, não commit.
+    """
+    if gravacao.transcrito_em and not force:
+        return _stored_words(gravacao.id)
+    source = analysis_source(gravacao)
+    if not source:
+        raise ValueError("Arquivo de audio da gravacao nao encontrado")
+
+    engine = Config.STT_ENGINE
+    pool = get_stt_pool(engine)
+    chunker = VadChunker(
+        STT_SAMPLE_RATE,
+        threshold_db=Config.VAD_THRESHOLD_DB,
+        max_seconds=Config.STT_CHUNK_MAX_SECONDS,
+    )
+    # Música fica de fora do STT; sem classificação prévia, classifica nesta mesma passada
+    gate = None
+    if Config.SPEECH_FILTER_ENABLED:
+        gate = SpeechGate(STT_SAMPLE_RATE, gravacao.get_segmentos_fala_list())
+    TranscricaoSegmento.query.filter_by(gravacao_id=gravacao.id).delete(synchronize_session=False)
+
+    words = []
+    max_inflight = Config.STT_WORKERS * 2
+    inflight = deque()
+    total = float(gravacao.duracao_segundos or 0)
+    decoded = 0.0
+
+    def collect(future):
+        for segment in future.result():
+            # Trechos vizinhos se sobrepõem pela margem do VAD: não repetir palavras
+            palavras = [p for p in segment['palavras'] if not words or p[1] >= words[-1][2] - 0.05]
+            if not palavras and not segment['texto']:
+                continue
+            words.extend(palavras)
+            segmento = TranscricaoSegmento(
+                gravacao_id=gravacao.id,
+                inicio=segment['inicio'],
+                fim=segment['fim'],
+                texto=segment['texto'],
+                engine=engine,
+            )
+            segmento.set_palavras_list(palavras)
+            db.session.add(segmento)
+
+    def submit(chunks):
+        for offset, samples in chunks:
+            inflight.append(pool.submit(transcribe_chunk, offset, samples))
+            # Limita trechos em voo: memória constante mesmo em arquivos de 12h
+            while len(inflight) >= max_inflight:
+                collect(inflight.popleft())
+
+    for samples in decode_pcm_chunks(source, sample_rate=STT_SAMPLE_RATE):
+        decoded += samples.size / STT_SAMPLE_RATE
+        submit(chunker.feed(gate.feed(samples) if gate else samples))
+        if progress and total:
+            progress(min(1.0, decoded / total))
+    if gate:
+        submit(chunker.feed(gate.finish()))
+        if gate.segmenter is not None:
+            set_speech_segments(gravacao, gate.segmenter.intervals(), decoded)
+    submit(chunker.finish())
+    while inflight:
+        collect(inflight.popleft())
+
+    gravacao.transcrito_em = datetime.utcnow()
+    db.session.flush()
+    return words
+
+
+def find_keyword_hits(words, palavras_chave):
+    """[(palavra_chave, inicio, fim)] de cada ocorrência (aceita expressões com várias palavras)."""
+    automaton = KeywordAutomaton()
+    for palavra in palavras_chave:
+        automaton.add(palavra, palavra)
+    return automaton.match_words(words)
+
+
+def keyword_clip_windows(hits, duration=None, padding=None):
+    """Janelas [inicio, fim] (s inteiros) por palavra-chave, unindo ocorrências próximas.
+
+    Variações de caixa/acento da mesma palavra-chave contam como a mesma.
+    """
+    padding = Config.KEYWORD_CLIP_PADDING_SECONDS if padding is None else padding
+    windows = []
+    by_keyword = {}
+    for palavra, inicio, fim in sorted(hits, key=lambda h: (normalize_text(h[0]), h[1])):
+        start = max(0, int(inicio) - padding)
+        end = int(fim + 0.999) + padding
+        if duration:
+            end = min(end, int(duration))
+        key = normalize_text(palavra)
+        current = by_keyword.get(key)
+        if current is not None and start <= current[2]:
+            current[2] = max(current[2], end)
+            continue
+        current = [palavra, start, end]
+        by_keyword[key] = current
+        windows.append(current)
+    return [tuple(w) for w in windows if w[2] > w[1]]
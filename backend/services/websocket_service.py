@@ -1,5 +1,19 @@
+import json
+
 from flask_socketio import emit, join_room, leave_room
-from app import socketio
+from app import db, socketio
+
+OUTBOX_BATCH = 500
+
+# Processos sem clientes conectados (worker) gravam os eventos no outbox; o web entrega
+_use_outbox = False
+
+
+def route_to_outbox():
+    """Faz broadcast_update gravar no outbox em vez de emitir (chamar no worker)."""
+    global _use_outbox
+    _use_outbox = True
+
 
 @socketio.on('subscribe')
 def handle_subscribe(data):
@@ -19,8 +33,36 @@ def handle_unsubscribe(data):
 
 def broadcast_update(channel, event_type, data):
     """Broadcast update to all clients in channel"""
+    if _use_outbox:
+        _enqueue_outbox(channel, event_type, data)
+        return
     socketio.emit('update', {
         'type': event_type,
         'data': data
     }, room=channel)
 
+
+def _enqueue_outbox(channel, event_type, data):
+    from models.evento_outbox import EventoOutbox
+
+    # Conexão própria: o evento não depende do commit (nem do rollback) da sessão de quem chama
+    with db.engine.begin() as conn:
+        conn.execute(EventoOutbox.__table__.insert().values(
+            canal=channel, tipo=event_type, dados=json.dumps(data, default=str),
+        ))
+
+
+def drain_outbox():
+    """Emite e apaga os eventos pendentes do outbox em ordem (requer app context)."""
+    rows = db.session.execute(db.text(
+        'DELETE FROM eventos_outbox WHERE id IN ('
+        ' SELECT id FROM eventos_outbox ORDER BY id LIMIT :limit FOR UPDATE SKIP LOCKED'
+        ') RETURNING id, canal, tipo, dados'
+    ), {'limit': OUTBOX_BATCH}).fetchall()
+    db.session.commit()
+    for _id, canal, tipo, dados in sorted(rows, key=lambda row: row[0]):
+        socketio.emit('update', {
+            'type': tipo,
+            'data': json.loads(dados) if dados else None,
+        }, room=canal)
+    return len(rows)
@@ -0,0 +1,26 @@
+"""Fixtures dos testes de integração: usam o Postgres configurado em DB_* (como o app).
+
+Os testes de utils/ não usam estas fixtures e rodam sem banco.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app():
+    pytest.importorskip('flask_sqlalchemy')
+    os.environ.setdefault('SCHEDULER_ENABLED', 'false')
+    try:
+        from app import app as flask_app
+    except Exception as e:
+        pytest.skip(f'banco indisponivel: {e}')
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,102 @@
+"""Cortes sem re-encode pelo índice de quadros/páginas (sem banco nem ffmpeg)."""
+import struct
+
+import pytest
+
+from utils.audio_cut import cut_clips, load_index
+from utils.audio_frames import (
+    OGG_BOS,
+    OGG_EOS,
+    OPUS_SAMPLE_RATE,
+    OggPage,
+    OggPageParser,
+    iter_mp3_frames,
+)
+
+# MPEG-1 Layer III, 128 kbps, 44,1 kHz: 417 bytes e 1152 amostras por quadro
+FRAME_SECONDS = 1152 / 44100
+PAGE_SAMPLES = 960  # 20 ms de Opus por página
+PRE_SKIP = 312
+
+
+def _mp3_frame(number):
+    # Conteúdo distinto por quadro para conferir exatamente quais foram copiados
+    return b'\xff\xfb\x90\xc0' + number.to_bytes(4, 'big') + bytes(409)
+
+
+def _write_mp3(path, first, count):
+    path.write_bytes(b''.join(_mp3_frame(n) for n in range(first, first + count)))
+    return str(path)
+
+
+def _write_opus(path, pages):
+    head = OggPage(OGG_BOS, 0, 1, 0, bytes([19]), b'OpusHead\x01\x01' + struct.pack('<H', PRE_SKIP) + bytes(7))
+    tags = OggPage(0, 0, 1, 1, bytes([16]), b'OpusTags' + bytes(8))
+    data = head.serialize() + tags.serialize()
+    for i in range(pages):
+        body = i.to_bytes(4, 'big') + bytes(36)
+        data += OggPage(0, PAGE_SAMPLES * (i + 1), 1, i + 2, bytes([len(body)]), body).serialize()
+    path.write_bytes(data)
+    return str(path)
+
+
+def _frame_numbers(path):
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    with open(path, 'rb') as fh:
+        return [int.from_bytes(data[offset + 4:offset + 8], 'big') for offset, _h in iter_mp3_frames(fh)]
+
+
+def test_corte_mp3_no_quadro(tmp_path):
+    source = _write_mp3(tmp_path / 'gravacao.mp3', 0, 200)
+    dest = str(tmp_path / 'clipe.mp3')
+    [(key, written, seconds, error)] = cut_clips([source], str(tmp_path / 'idx.npz'), [('a', 1.0, 2.0, dest)])
+    assert (key, error) == ('a', None)
+    numbers = _frame_numbers(dest)
+    # Do quadro que contém o início até o último que começa antes do fim
+    assert numbers[0] == int(1.0 // FRAME_SECONDS)
+    assert numbers[-1] == int(2.0 // FRAME_SECONDS)
+    assert numbers == list(range(numbers[0], numbers[-1] + 1))
+    assert written == len(numbers) * 417
+    assert seconds == pytest.approx(len(numbers) * FRAME_SECONDS)
+
+
+def test_corte_mp3_entre_segmentos(tmp_path):
+    paths = [_write_mp3(tmp_path / f'seg{i}.mp3', 50 * i, 50) for i in range(3)]
+    dest = str(tmp_path / 'clipe.mp3')
+    [(_key, _written, seconds, error)] = cut_clips(paths, None, [('a', 45.5 * FRAME_SECONDS, 104.5 * FRAME_SECONDS, dest)])
+    assert error is None
+    assert _frame_numbers(dest) == list(range(45, 105))
+    assert seconds == pytest.approx(60 * FRAME_SECONDS)
+
+
+def test_corte_fora_da_gravacao(tmp_path):
+    source = _write_mp3(tmp_path / 'gravacao.mp3', 0, 10)
+    [(_key, written, _seconds, error)] = cut_clips([source], None, [('a', 30.0, 40.0, str(tmp_path / 'c.mp3'))])
+    assert written == 0 and error
+
+
+def test_indice_reaproveitado_e_invalidado(tmp_path):
+    source = _write_mp3(tmp_path / 'gravacao.mp3', 0, 10)
+    index_path = str(tmp_path / 'idx.npz')
+    assert load_index([source], index_path)['times'].size == 10
+    _write_mp3(tmp_path / 'gravacao.mp3', 0, 20)
+    assert load_index([source], index_path)['times'].size == 20
+
+
+def test_corte_opus_duracao_bate_com_indice(tmp_path):
+    source = _write_opus(tmp_path / 'gravacao.opus', 500)
+    dest = str(tmp_path / 'clipe.opus')
+    [(_key, _written, seconds, error)] = cut_clips([source], None, [('a', 2.0, 4.5, dest)])
+    assert error is None
+    with open(dest, 'rb') as fh:
+        pages = OggPageParser().feed(fh.read())
+    assert pages[0].body.startswith(b'OpusHead') and pages[1].body.startswith(b'OpusTags')
+    audio = pages[2:]
+    assert [p.seqno for p in pages] == list(range(len(pages)))
+    assert pages[-1].header_type & OGG_EOS
+    # Granule rebaseado: o fim do clipe em amostras é a duração informada pelo corte
+    assert audio[-1].granule / OPUS_SAMPLE_RATE == pytest.approx(seconds)
+    assert seconds >= 2.5
+    first = int.from_bytes(audio[0].body[:4], 'big')
+    assert (PAGE_SAMPLES * first - PRE_SKIP) / OPUS_SAMPLE_RATE <= 2.0
@@ -0,0 +1,128 @@
+"""Quadros MP3, CRC do Ogg e reescrita de páginas (sem banco nem ffmpeg)."""
+import io
+import struct
+
+from utils.audio_frames import (
+    OGG_BOS,
+    OGG_CONTINUED,
+    OGG_EOS,
+    Mp3Framer,
+    OggPage,
+    OggPageParser,
+    OggStreamRewriter,
+    iter_mp3_frames,
+    iter_ogg_pages,
+    mp3_info,
+    ogg_crc,
+    parse_mp3_header,
+)
+
+# MPEG-1 Layer III, 128 kbps, 44,1 kHz, mono: 417 bytes por quadro
+MP3_HEADER = b'\xff\xfb\x90\xc0'
+MP3_FRAME = MP3_HEADER + bytes(413)
+
+
+def _crc_reference(data):
+    crc = 0
+    for byte in data:
+        crc ^= byte << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else crc << 1
+            crc &= 0xFFFFFFFF
+    return crc
+
+
+def _page(granule, seqno, body=b'x' * 10, header_type=0, serial=7):
+    return OggPage(header_type, granule, serial, seqno, bytes([len(body)]), body)
+
+
+def test_parse_mp3_header():
+    header = parse_mp3_header(MP3_HEADER)
+    assert header.frame_length == 417
+    assert header.samples == 1152
+    assert header.sample_rate == 44100
+    assert header.bitrate_kbps == 128
+    assert header.channels == 1
+    assert parse_mp3_header(b'\xff\xfb\xf0\xc0') is None  # bitrate 15 é inválido
+    assert parse_mp3_header(b'ID3\x04') is None
+
+
+def test_mp3_framer_ressincroniza_e_junta_blocos():
+    stream = b'lixo' + MP3_FRAME * 3 + b'\x00\xff'
+    framer = Mp3Framer()
+    frames = []
+    for i in range(0, len(stream), 100):
+        frames.extend(framer.feed(stream[i:i + 100]))
+    assert [data for _header, data in frames] == [MP3_FRAME] * 3
+
+
+def test_iter_mp3_frames_pula_id3():
+    tag = b'ID3\x04\x00\x00\x00\x00\x00\x0a' + bytes(10)
+    data = tag + MP3_FRAME * 5
+    offsets = [offset for offset, _header in iter_mp3_frames(io.BytesIO(data), chunk_size=1000)]
+    assert offsets == [len(tag) + i * 417 for i in range(5)]
+
+
+def test_mp3_info_cbr():
+    data = MP3_FRAME * 100
+    duration, bitrate = mp3_info(io.BytesIO(data), len(data))
+    assert bitrate == 128
+    assert abs(duration - len(data) * 8 / 128000) < 1e-9
+
+
+def test_ogg_crc_igual_a_referencia():
+    for data in (b'', b'OggS', bytes(range(256)) * 3):
+        assert ogg_crc(data) == _crc_reference(data)
+
+
+def test_serialize_grava_crc_valido():
+    page = _page(960, 3).serialize()
+    zeroed = bytearray(page)
+    zeroed[22:26] = bytes(4)
+    assert struct.unpack_from('<I', page, 22)[0] == ogg_crc(zeroed)
+
+
+def test_parser_recupera_paginas_partidas():
+    pages = [_page(960 * i, i, body=bytes([i]) * (i + 1)) for i in range(1, 6)]
+    stream = b'lixo' + b''.join(p.serialize() for p in pages)
+    parser = OggPageParser()
+    parsed = []
+    for i in range(0, len(stream), 7):
+        parsed.extend(parser.feed(stream[i:i + 7]))
+    assert [(p.granule, p.seqno, p.body) for p in parsed] == [(p.granule, p.seqno, p.body) for p in pages]
+    offsets = [offset for offset, _p in iter_ogg_pages(io.BytesIO(stream), chunk_size=16)]
+    assert offsets[0] == 4 and len(offsets) == 5
+
+
+def test_rewriter_renumera_rebaseia_e_marca_eos():
+    head = _page(0, 0, body=b'OpusHead' + bytes(11), header_type=OGG_BOS)
+    tags = _page(0, 1, body=b'OpusTags' + bytes(8))
+    rewriter = OggStreamRewriter([head, tags])
+    out = rewriter.push(_page(50000, 40, header_type=OGG_CONTINUED), 49000)
+    assert out == b''  # continuação de pacote: espera o início do próximo
+    out = b''
+    previous = 50000
+    for i, granule in enumerate((50960, 51920, 52880)):
+        out += rewriter.push(_page(granule, 41 + i), previous)
+        previous = granule
+    out += rewriter.close()
+
+    pages = OggPageParser().feed(out)
+    assert [p.seqno for p in pages] == list(range(5))
+    assert pages[0].body.startswith(b'OpusHead') and pages[1].body.startswith(b'OpusTags')
+    assert [p.granule for p in pages] == [0, 0, 960, 1920, 2880]
+    assert [bool(p.header_type & OGG_EOS) for p in pages] == [False] * 4 + [True]
+    assert rewriter.samples == 2880
+    for raw in _split_pages(out):
+        zeroed = bytearray(raw)
+        zeroed[22:26] = bytes(4)
+        assert struct.unpack_from('<I', raw, 22)[0] == ogg_crc(zeroed)
+
+
+def _split_pages(data):
+    pos = 0
+    while pos < len(data):
+        count = data[pos + 26]
+        end = pos + 27 + count + sum(data[pos + 27:pos + 27 + count])
+        yield data[pos:end]
+        pos = end
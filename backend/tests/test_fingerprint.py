@@ -0,0 +1,63 @@
+"""Impressões digitais: hashes estáveis e deslocamento de uma ocorrência (sem banco)."""
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from utils.fingerprint import DT_BITS, HOP, MAX_DT, fingerprint, frame_seconds
+
+SR = 8000
+
+
+def _jingle(seconds, seed):
+    """Sequência de notas aleatórias (marcos espectrais bem definidos)."""
+    rng = np.random.default_rng(seed)
+    notes = []
+    for _ in range(int(seconds / 0.25)):
+        t = np.arange(int(SR * 0.25)) / SR
+        freqs = rng.uniform(200, 3500, size=3)
+        notes.append(sum(np.sin(2 * np.pi * f * t) for f in freqs) / 3)
+    return (0.5 * np.concatenate(notes)).astype(np.float32)
+
+
+def _noise(seconds, seed):
+    return (0.01 * np.random.default_rng(seed).normal(size=int(SR * seconds))).astype(np.float32)
+
+
+def _blocks(samples, size):
+    return [samples[i:i + size] for i in range(0, samples.size, size)]
+
+
+def test_independe_do_tamanho_do_bloco():
+    audio = np.concatenate((_noise(2, 1), _jingle(8, 2), _noise(1, 3)))
+    whole = fingerprint([audio], SR)
+    for size in (1000, 4096, 12345):
+        hashes, quadros = fingerprint(_blocks(audio, size), SR)
+        assert sorted(zip(hashes.tolist(), quadros.tolist())) == sorted(zip(whole[0].tolist(), whole[1].tolist()))
+
+
+def test_silencio_nao_gera_hashes():
+    hashes, quadros = fingerprint([np.zeros(SR * 5, dtype=np.float32)], SR)
+    assert hashes.size == 0 and quadros.size == 0
+
+
+def test_hash_guarda_intervalo_entre_marcos():
+    hashes, _quadros = fingerprint([_jingle(5, 4)], SR)
+    dt = hashes & ((1 << DT_BITS) - 1)
+    assert hashes.size and dt.min() >= 1 and dt.max() <= MAX_DT
+
+
+def test_encontra_ocorrencia_pelo_deslocamento():
+    clip = _jingle(6, 5)
+    offset_frames = 250
+    recording = np.concatenate((_jingle(offset_frames * HOP / SR, 6), clip, _noise(4, 7)))
+    clip_hashes, clip_quadros = fingerprint(_blocks(clip, 4000), SR)
+    rec_hashes, rec_quadros = fingerprint(_blocks(recording, 8000), SR)
+
+    index = defaultdict(list)
+    for h, q in zip(rec_hashes.tolist(), rec_quadros.tolist()):
+        index[h].append(q)
+    votes = Counter(q - ref for h, ref in zip(clip_hashes.tolist(), clip_quadros.tolist()) for q in index[h])
+    delta, count = votes.most_common(1)[0]
+    assert delta == offset_frames
+    assert count >= 20
+    assert delta * frame_seconds(SR) == offset_frames * HOP / SR
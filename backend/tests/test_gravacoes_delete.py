@@ -0,0 +1,71 @@
+"""Apagar gravações que têm jobs (os jobs vão junto, por ON DELETE CASCADE)."""
+import uuid
+
+
+def _gravacao_com_job(app):
+    from app import db
+    from models.gravacao import Gravacao
+    from models.radio import Radio
+    from models.user import User
+    from services.job_service import LIVE_KEYWORDS_JOB, enqueue_job
+    from utils.jwt_utils import create_token
+
+    with app.app_context():
+        user = User(email=f'teste-{uuid.uuid4()}@clipradio.local', nome='Teste')
+        user.set_password('teste')
+        db.session.add(user)
+        db.session.flush()
+        radio = Radio(user_id=user.id, nome='Radio Teste', stream_url='http://localhost/stream')
+        db.session.add(radio)
+        db.session.flush()
+        gravacao = Gravacao(user_id=user.id, radio_id=radio.id, status='concluido')
+        db.session.add(gravacao)
+        db.session.flush()
+        job = enqueue_job(LIVE_KEYWORDS_JOB, user.id, {}, gravacao_id=gravacao.id)
+        db.session.commit()
+        return user.id, gravacao.id, job.id, create_token(user.id)
+
+
+def _cleanup(app, user_id):
+    from app import db
+    from models.user import User
+
+    with app.app_context():
+        user = User.query.get(user_id)
+        if user is not None:
+            db.session.delete(user)
+            db.session.commit()
+
+
+def test_delete_gravacao_com_job(app, client):
+    from models.gravacao import Gravacao
+    from models.job import Job
+
+    user_id, gravacao_id, job_id, token = _gravacao_com_job(app)
+    try:
+        response = client.delete(f'/api/gravacoes/{gravacao_id}', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200
+        with app.app_context():
+            assert Gravacao.query.get(gravacao_id) is None
+            assert Job.query.get(job_id) is None
+    finally:
+        _cleanup(app, user_id)
+
+
+def test_batch_delete_com_job(app, client):
+    from models.gravacao import Gravacao
+    from models.job import Job
+
+    user_id, gravacao_id, job_id, token = _gravacao_com_job(app)
+    try:
+        response = client.post(
+            '/api/gravacoes/batch-delete',
+            json={'gravacao_ids': [gravacao_id]},
+            headers={'Authorization': f'Bearer {token}'},
+        )
+        assert response.status_code == 200
+        with app.app_context():
+            assert Gravacao.query.get(gravacao_id) is None
+            assert Job.query.get(job_id) is None
+    finally:
+        _cleanup(app, user_id)
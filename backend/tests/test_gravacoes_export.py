@@ -0,0 +1,54 @@
+"""Exportação em ZIP com filtro de cidade (o filtro já faz JOIN em radios)."""
+import io
+import os
+import uuid
+import zipfile
+
+
+def _gravacao_com_arquivo(app):
+    from app import db
+    from config import Config
+    from models.gravacao import Gravacao
+    from models.radio import Radio
+    from models.user import User
+    from utils.jwt_utils import create_token
+
+    with app.app_context():
+        user = User(email=f'teste-{uuid.uuid4()}@clipradio.local', nome='Teste')
+        user.set_password('teste')
+        db.session.add(user)
+        db.session.flush()
+        radio = Radio(user_id=user.id, nome='Radio Teste', stream_url='http://localhost/stream', cidade='Sobral', estado='CE')
+        db.session.add(radio)
+        db.session.flush()
+        filename = f'{uuid.uuid4()}.mp3'
+        path = os.path.join(Config.STORAGE_PATH, 'audio', filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as fh:
+            fh.write(b'\xff\xfb' + os.urandom(4094))
+        gravacao = Gravacao(user_id=user.id, radio_id=radio.id, status='concluido', arquivo_nome=filename)
+        db.session.add(gravacao)
+        db.session.commit()
+        return user.id, path, create_token(user.id)
+
+
+def test_export_com_filtro_de_cidade(app, client):
+    from app import db
+    from models.user import User
+
+    user_id, path, token = _gravacao_com_arquivo(app)
+    try:
+        response = client.get(
+            '/api/gravacoes/export?cidade=sobral&estado=ce',
+            headers={'Authorization': f'Bearer {token}'},
+        )
+        assert response.status_code == 200
+        archive = zipfile.ZipFile(io.BytesIO(response.get_data()))
+        assert archive.namelist() == [f'Radio Teste/{os.path.basename(path)}']
+        with open(path, 'rb') as fh:
+            assert archive.read(archive.namelist()[0]) == fh.read()
+    finally:
+        os.remove(path)
+        with app.app_context():
+            db.session.delete(User.query.get(user_id))
+            db.session.commit()
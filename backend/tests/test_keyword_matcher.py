@@ -0,0 +1,64 @@
+"""Aho-Corasick por palavra comparado com a busca ingênua (sem banco)."""
+import random
+
+from utils.keyword_matcher import KeywordAutomaton, normalize_text, tokenize
+
+VOCAB = ['a', 'b', 'c', 'd', 'prefeito', 'sao', 'paulo']
+
+
+def _brute_force(patterns, tokens):
+    hits = set()
+    for payload, pattern in patterns.items():
+        for i in range(len(tokens) - len(pattern) + 1):
+            if tokens[i:i + len(pattern)] == pattern:
+                hits.add((i, i + len(pattern) - 1, payload))
+    return hits
+
+
+def test_normalizacao():
+    assert normalize_text('São Paulo!') == 'sao paulo'
+    assert tokenize('Covid-19, PREFEITURA.') == ['covid', '19', 'prefeitura']
+
+
+def test_igual_a_busca_ingenua_com_adicoes_e_remocoes():
+    rng = random.Random(7)
+    automaton = KeywordAutomaton()
+    patterns = {}
+    for round_ in range(200):
+        payload = rng.randrange(60)
+        if payload in patterns and rng.random() < 0.4:
+            automaton.remove(payload)
+            del patterns[payload]
+        else:
+            words = [rng.choice(VOCAB) for _ in range(rng.randint(1, 4))]
+            assert automaton.add(' '.join(words), payload)
+            patterns[payload] = words
+        tokens = [rng.choice(VOCAB) for _ in range(rng.randint(0, 40))]
+        assert set(automaton.iter_matches(tokens)) == _brute_force(patterns, tokens), round_
+    assert len(automaton) == len(patterns)
+
+
+def test_compactacao_preserva_padroes():
+    automaton = KeywordAutomaton()
+    for i in range(3000):
+        automaton.add(f'palavra{i} extra{i}', i)
+    for i in range(3000):
+        if i % 3 != 1:
+            automaton.remove(i)
+    assert len(automaton._goto) < 2 * 3000  # ramos podados descartados na reconstrução
+    tokens = tokenize('palavra1 extra1 palavra3 extra3 palavra2998 extra2998')
+    assert {payload for _s, _e, payload in automaton.iter_matches(tokens)} == {1, 2998}
+
+
+def test_palavra_vazia_nao_entra():
+    automaton = KeywordAutomaton()
+    assert automaton.add('  !!  ', 'x') is False
+    assert len(automaton) == 0
+
+
+def test_match_words_usa_tempos_das_palavras():
+    automaton = KeywordAutomaton()
+    automaton.add('São Paulo', 'sp')
+    automaton.add('covid 19', 'covid')
+    words = [('Em', 0.0, 0.2), ('são', 0.2, 0.5), ('Paulo,', 0.5, 0.9), ('covid-19', 1.0, 1.6)]
+    assert sorted(automaton.match_words(words)) == [('covid', 1.0, 1.6), ('sp', 0.2, 0.9)]
@@ -0,0 +1,62 @@
+"""Pirâmide de picos e leitura de trechos do arquivo (sem banco)."""
+import numpy as np
+import pytest
+
+from utils.peaks import PeaksBuilder, build_pyramid, read_level, read_peaks_header, write_peaks
+
+
+@pytest.fixture
+def peaks_file(tmp_path):
+    samples = np.sin(np.linspace(0, 200 * np.pi, 8000 * 5)).astype(np.float32) * 0.5
+    builder = PeaksBuilder(8000, 10)
+    for i in range(0, samples.size, 1234):
+        builder.feed(samples[i:i + 1234])
+    mins, maxs = builder.finish()
+    levels = build_pyramid(mins, maxs, factor=4, min_buckets=16)
+    path = str(tmp_path / 'teste.peaks')
+    write_peaks(path, levels, 10, factor=4)
+    return path, levels
+
+
+def _expected(levels, level, start, end):
+    mins, maxs = levels[level]
+    interleaved = np.empty(mins.size * 2, dtype=np.int8)
+    interleaved[0::2] = mins
+    interleaved[1::2] = maxs
+    return interleaved[2 * start:2 * end].tobytes()
+
+
+def test_builder_e_piramide(peaks_file):
+    _path, levels = peaks_file
+    mins, maxs = levels[0]
+    assert mins.size == 500  # 5 s em buckets de 10 ms
+    assert mins.min() == -64 and maxs.max() == 64
+    assert [m.size for m, _ in levels] == [500, 125, 32, 8]
+    # Cada bucket agrega `fator` buckets do nível anterior
+    assert levels[1][0][0] == mins[:4].min() and levels[1][1][0] == maxs[:4].max()
+
+
+def test_read_level_trecho(peaks_file):
+    path, levels = peaks_file
+    with open(path, 'rb') as fh:
+        bucket_ms, factor, counts = read_peaks_header(fh)
+        assert (bucket_ms, factor, counts) == (10, 4, [500, 125, 32, 8])
+        assert read_level(fh, counts, 0) == _expected(levels, 0, 0, 500)
+        assert read_level(fh, counts, 1, 10, 20) == _expected(levels, 1, 10, 20)
+        assert read_level(fh, counts, 2, 30, 100) == _expected(levels, 2, 30, 32)
+
+
+def test_read_level_fim_antes_do_inicio_e_negativo(peaks_file):
+    path, _levels = peaks_file
+    with open(path, 'rb') as fh:
+        _bucket_ms, _factor, counts = read_peaks_header(fh)
+        assert read_level(fh, counts, 1, 20, 10) == b''
+        assert read_level(fh, counts, 1, 0, -5) == b''
+        assert read_level(fh, counts, 0, 600, None) == b''
+
+
+def test_read_peaks_header_invalido(tmp_path):
+    path = tmp_path / 'ruim.peaks'
+    path.write_bytes(b'XXXX' + bytes(20))
+    with open(path, 'rb') as fh, pytest.raises(ValueError):
+        read_peaks_header(fh)
@@ -0,0 +1,75 @@
+"""Classificação fala/música e o filtro que zera o áudio fora da fala (sem banco)."""
+import numpy as np
+import pytest
+
+from utils.speech_music import SpeechGate, SpeechMusicSegmenter, classify_windows
+
+SR = 16000
+
+
+def _syllables(seconds, seed=1):
+    """Ruído modulado a 4 Hz: rajadas e pausas como sílabas."""
+    n = int(SR * seconds)
+    envelope = (np.sin(np.arange(n) / SR * 2 * np.pi * 4) > 0).astype(np.float32)
+    return (np.random.default_rng(seed).normal(0, 0.2, n) * envelope).astype(np.float32)
+
+
+def _tone(seconds):
+    t = np.arange(int(SR * seconds)) / SR
+    return (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+def _run(gate, audio, block):
+    out = [gate.feed(audio[i:i + block]) for i in range(0, audio.size, block)]
+    out.append(gate.finish())
+    return np.concatenate(out)
+
+
+def test_classifica_silabas_como_fala_e_tom_como_musica():
+    windows = np.stack((_syllables(1), _tone(1), np.zeros(SR, dtype=np.float32)))
+    assert classify_windows(windows, SR).tolist() == [True, False, False]
+
+
+def test_intervalos_do_segmentador():
+    audio = np.concatenate((_tone(10), _syllables(8), _tone(10)))
+    segmenter = SpeechMusicSegmenter(SR)
+    for i in range(0, audio.size, 7000):
+        segmenter.feed(audio[i:i + 7000])
+    segmenter.finish()
+    [(inicio, fim)] = segmenter.intervals()
+    # Dilatado em uma janela para não cortar as bordas
+    assert 8.0 <= inicio <= 10.0 and 18.0 <= fim <= 20.0
+    assert segmenter.decided_samples == audio.size
+
+
+def test_gate_com_intervalos_prontos():
+    audio = np.random.default_rng(2).uniform(-0.5, 0.5, SR * 10).astype(np.float32)
+    gate = SpeechGate(SR, [(6.0, 7.5), (1.0, 2.0), (1.5, 3.0)])
+    out = _run(gate, audio, 3333)
+    times = np.arange(audio.size) / SR
+    keep = ((times >= 1.0) & (times < 3.0)) | ((times >= 6.0) & (times < 7.5))
+    assert np.array_equal(out, np.where(keep, audio, 0))
+    assert gate.kept == int(keep.sum())
+
+
+def test_gate_classificando_mantem_tempos_e_independe_do_bloco():
+    audio = np.concatenate((_tone(6), _syllables(5), _tone(6), _syllables(3, seed=3)))
+    reference = None
+    for block in (SR // 2, 5000, 40000):
+        gate = SpeechGate(SR)
+        out = _run(gate, audio, block)
+        assert out.size == audio.size
+        mask = gate.segmenter.mask
+        windows = np.minimum(np.arange(audio.size) // SR, mask.size - 1)
+        assert np.array_equal(out, np.where(mask[windows], audio, 0))
+        if reference is None:
+            reference = out
+        assert np.array_equal(out, reference)
+    assert 0 < gate.kept < audio.size
+
+
+@pytest.mark.parametrize('ranges', [[], None])
+def test_gate_em_silencio_nao_mantem_nada(ranges):
+    gate = SpeechGate(SR, ranges)
+    out = _run(gate, np.zeros(SR * 3, dtype=np.float32), 4000)
+    assert out.size == SR * 3 and gate.kept == 0
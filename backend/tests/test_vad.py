@@ -0,0 +1,60 @@
+"""Divisão em trechos de fala por energia (sem banco)."""
+import numpy as np
+import pytest
+
+from utils.vad import VadChunker
+
+SR = 16000
+
+
+def _tone(seconds, amplitude=0.3):
+    t = np.arange(int(SR * seconds)) / SR
+    return (amplitude * np.sin(2 * np.pi * 300 * t)).astype(np.float32)
+
+
+def _silence(seconds):
+    return np.zeros(int(SR * seconds), dtype=np.float32)
+
+
+def _run(audio, block, **kwargs):
+    chunker = VadChunker(SR, **kwargs)
+    out = []
+    for i in range(0, audio.size, block):
+        out.extend(chunker.feed(audio[i:i + block]))
+    out.extend(chunker.finish())
+    return out
+
+
+def test_trechos_com_offset_e_amostras_do_arquivo():
+    audio = np.concatenate((_silence(2), _tone(3), _silence(2), _tone(1.5), _silence(1)))
+    chunks = _run(audio, 4000)
+    assert len(chunks) == 2
+    for (offset, samples), speech_start in zip(chunks, (2.0, 7.0)):
+        # Começa `pad_seconds` antes da fala e traz exatamente as amostras do arquivo
+        assert offset == pytest.approx(speech_start - 0.21, abs=0.031)
+        start = int(round(offset * SR))
+        assert np.array_equal(samples, audio[start:start + samples.size])
+    assert chunks[0][1].size / SR == pytest.approx(3.0 + 2 * 0.2, abs=0.07)
+
+
+def test_resultado_independe_do_tamanho_do_bloco():
+    audio = np.concatenate((_silence(1), _tone(2), _silence(1), _tone(0.8), _silence(0.7), _tone(1)))
+    reference = _run(audio, audio.size)
+    for block in (333, 4800, 16001):
+        chunks = _run(audio, block)
+        assert [offset for offset, _s in chunks] == [offset for offset, _s in reference]
+        assert all(np.array_equal(a, b) for (_o, a), (_p, b) in zip(chunks, reference))
+
+
+def test_ignora_ruido_curto_e_silencio():
+    audio = np.concatenate((_silence(1), _tone(0.1), _silence(2)))
+    assert _run(audio, 4000) == []
+
+
+def test_fala_longa_cortada_no_quadro_mais_silencioso():
+    # Fala contínua com uma queda de energia perto do limite de 10 s
+    audio = np.concatenate((_tone(8.5), _tone(0.2, amplitude=0.02), _tone(6)))
+    chunks = _run(audio, 8000, max_seconds=10.0, split_search_seconds=3.0)
+    assert len(chunks) == 2
+    assert all(samples.size / SR <= 10.0 + 0.4 for _offset, samples in chunks)
+    assert 8.4 <= chunks[1][0] + 0.2 <= 8.8
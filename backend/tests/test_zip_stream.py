@@ -0,0 +1,38 @@
+"""ZIP gerado em blocos e lido de volta pelo zipfile (sem banco)."""
+import io
+import os
+import zipfile
+
+from utils.zip_stream import stream_zip
+
+
+def test_ida_e_volta_pelo_zipfile(tmp_path):
+    contents = {
+        'a.mp3': os.urandom(300_000),
+        'pasta/b.opus': os.urandom(10),
+        'vazio.mp3': b'',
+    }
+    entries = []
+    for name, data in contents.items():
+        path = tmp_path / name.replace('/', '_')
+        path.write_bytes(data)
+        entries.append((name, str(path)))
+    entries.append(('sumiu.mp3', str(tmp_path / 'nao-existe.mp3')))
+
+    chunks = list(stream_zip(entries, chunk_size=64 * 1024))
+    assert len(chunks) > 1  # sai em blocos, não num buffer único
+    assert all(chunks)
+
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == list(contents)
+        for name, data in contents.items():
+            info = archive.getinfo(name)
+            assert info.compress_type == zipfile.ZIP_STORED
+            assert archive.read(name) == data
+
+
+def test_sem_entradas_gera_zip_vazio():
+    data = b''.join(stream_zip([]))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == []
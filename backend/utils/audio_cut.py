@@ -0,0 +1,235 @@
+"""Cortes de MP3 e Ogg Opus sem re-encode a partir de um índice de quadros/páginas.
+
+O índice guarda, para cada quadro MP3 (ou página Ogg), o instante de início e o offset
+em bytes; com ele um corte vira busca binária + cópia de um intervalo de bytes (MP3) ou
+reescrita das páginas do trecho (Opus). O índice é salvo em .npz ao lado do storage e
+reaproveitado enquanto os arquivos de origem não mudarem.
+
+Este módulo não importa o app: roda nos processos do pool de clipes.
+"""
+import os
+import struct
+
+import numpy as np
+
+from utils.audio_frames import (
+    iter_mp3_frames,
+    iter_ogg_pages,
+    OggStreamRewriter,
+    OGG_CAPTURE,
+    OGG_NO_GRANULE,
+    OPUS_SAMPLE_RATE,
+)
+
+COPY_CHUNK = 1024 * 1024
+
+
+def _signature(paths):
+    """(tamanho, mtime_ns) de cada arquivo de origem: invalida o índice salvo."""
+    rows = []
+    for path in paths:
+        st = os.stat(path)
+        rows.append((st.st_size, st.st_mtime_ns))
+    return np.array(rows, dtype=np.int64).reshape(-1, 2)
+
+
+def _build_mp3_index(paths):
+    times, offsets, files, ends = [], [], [], []
+    t = 0.0
+    for file_idx, path in enumerate(paths):
+        end = 0
+        with open(path, 'rb') as fh:
+            for offset, header in iter_mp3_frames(fh):
+                times.append(t)
+                offsets.append(offset)
+                files.append(file_idx)
+                t += header.duration
+                end = offset + header.frame_length
+        ends.append(end)
+    return {
+        'kind': np.array('mp3'),
+        'times': np.array(times, dtype=np.float64),
+        'offsets': np.array(offsets, dtype=np.int64),
+        'files': np.array(files, dtype=np.int32),
+        'ends': np.array(ends, dtype=np.int64),
+        'granules': np.empty(0, dtype=np.int64),
+        'duration': np.array(t),
+        'pre_skip': np.array(0),
+    }
+
+
+def _build_opus_index(path):
+    times, offsets, granules = [], [], []
+    pre_skip = 0
+    previous = 0
+    end = 0
+    with open(path, 'rb') as fh:
+        for offset, page in iter_ogg_pages(fh):
+            end = offset + page.size
+            if page.body[:8] == b'OpusHead' and len(page.body) >= 12:
+                pre_skip = struct.unpack_from('<H', page.body, 10)[0]
+                continue
+            if page.granule == 0:
+                # OpusTags e demais páginas de cabeçalho
+                continue
+            # A página começa onde a anterior terminou (granule = fim do último pacote)
+            times.append(max(0, previous - pre_skip) / OPUS_SAMPLE_RATE)
+            offsets.append(offset)
+            granules.append(previous)
+            if page.granule != OGG_NO_GRANULE:
+                previous = page.granule
+    return {
+        'kind': np.array('opus'),
+        'times': np.array(times, dtype=np.float64),
+        'offsets': np.array(offsets, dtype=np.int64),
+        'files': np.zeros(len(offsets), dtype=np.int32),
+        'ends': np.array([end], dtype=np.int64),
+        'granules': np.array(granules, dtype=np.int64),
+        'duration': np.array(max(0, previous - pre_skip) / OPUS_SAMPLE_RATE),
+        'pre_skip': np.array(pre_skip),
+    }
+
+
+def load_index(paths, index_path=None):
+    """Índice de quadros/páginas das origens (um arquivo, ou segmentos MP3 em sequência).
+
+    Reusa `index_path` se a assinatura dos arquivos bater; senão reconstrói e salva.
+    """
+    signature = _signature(paths)
+    if index_path and os.path.exists(index_path):
+        try:
+            with np.load(index_path) as saved:
+                if np.array_equal(saved['signature'], signature):
+                    return {key: saved[key] for key in saved.files}
+        except (OSError, ValueError, KeyError):
+            pass
+
+    with open(paths[0], 'rb') as fh:
+        is_ogg = fh.read(4) == OGG_CAPTURE
+    if is_ogg:
+        if len(paths) != 1:
+            raise ValueError("Ogg Opus suportado apenas como arquivo unico")
+        index = _build_opus_index(paths[0])
+    else:
+        index = _build_mp3_index(paths)
+    index['signature'] = signature
+
+    if index_path:
+        tmp_path = index_path + '.tmp.npz'
+        np.savez(tmp_path, **index)
+        os.replace(tmp_path, index_path)
+    return index
+
+
+def _copy_range(src_fd, dst_fd, offset, length):
+    """Copia bytes entre arquivos no kernel quando possível (copy_file_range)."""
+    while length > 0:
+        try:
+            n = os.copy_file_range(src_fd, dst_fd, min(length, COPY_CHUNK), offset)
+        except (AttributeError, OSError):
+            n = 0
+        if not n:
+            data = os.pread(src_fd, min(length, COPY_CHUNK), offset)
+            if not data:
+                return
+            n = os.write(dst_fd, data)
+        offset += n
+        length -= n
+
+
+def _frame_span(index, start, end):
+    """(primeiro, fim exclusivo) das unidades do índice que cobrem [start, end)."""
+    times = index['times']
+    first = max(0, int(np.searchsorted(times, start, side='right')) - 1)
+    stop = int(np.searchsorted(times, end, side='left'))
+    return first, stop
+
+
+def _cut_mp3(paths, index, first, stop, out_fd):
+    offsets, files, ends = index['offsets'], index['files'], index['ends']
+    first_file = int(files[first])
+    last_file = int(files[stop - 1])
+    written = 0
+    for file_idx in range(first_file, last_file + 1):
+        if file_idx == first_file:
+            begin = int(offsets[first])
+        else:
+            begin = int(offsets[np.searchsorted(files, file_idx, side='left')])
+        if file_idx == last_file and stop < len(offsets):
+            finish = int(offsets[stop]) if int(files[stop]) == file_idx else int(ends[file_idx])
+        else:
+            finish = int(ends[file_idx])
+        fd = os.open(paths[file_idx], os.O_RDONLY)
+        try:
+            _copy_range(fd, out_fd, begin, finish - begin)
+        finally:
+            os.close(fd)
+        written += finish - begin
+    return written
+
+
+def _cut_opus(path, index, first, stop, out_fd):
+    offsets = index['offsets']
+    with open(path, 'rb') as fh:
+        headers = []
+        for offset, page in iter_ogg_pages(fh):
+            if offset >= offsets[0]:
+                break
+            headers.append(page)
+        rewriter = OggStreamRewriter(headers)
+        previous = int(index['granules'][first])
+        stop_offset = int(offsets[stop]) if stop < len(offsets) else None
+        written = 0
+        for offset, page in iter_ogg_pages(fh, int(offsets[first])):
+            if stop_offset is not None and offset >= stop_offset:
+                break
+            data = rewriter.push(page, previous)
+            written += os.write(out_fd, data) if data else 0
+            if page.granule != OGG_NO_GRANULE:
+                previous = page.granule
+        tail = rewriter.close()
+        written += os.write(out_fd, tail) if tail else 0
+    return written
+
+
+def cut_clips(paths, index_path, cuts):
+    """Corta vários trechos de uma mesma origem sem re-encode.
+
+    `cuts` = [(chave, inicio, fim, destino)] em segundos. O índice é montado (ou lido)
+    uma vez para todos. Retorna [(chave, bytes, segundos, erro)]; `erro` é None em caso
+    de sucesso. Função de topo (picklable) para rodar em ProcessPoolExecutor.
+    """
+    try:
+        index = load_index(paths, index_path)
+    except (OSError, ValueError) as e:
+        return [(key, 0, 0.0, str(e)) for key, _start, _end, _dest in cuts]
+
+    times = index['times']
+    duration = float(index['duration'])
+    results = []
+    for key, start, end, dest in cuts:
+        first, stop = _frame_span(index, start, end)
+        if not times.size or start >= duration or stop <= first:
+            results.append((key, 0, 0.0, "Trecho fora da gravacao"))
+            continue
+        seconds = (float(times[stop]) if stop < len(times) else duration) - float(times[first])
+        tmp_dest = dest + '.part'
+        try:
+            out_fd = os.open(tmp_dest, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                if str(index['kind']) == 'opus':
+                    written = _cut_opus(paths[0], index, first, stop, out_fd)
+                else:
+                    written = _cut_mp3(paths, index, first, stop, out_fd)
+            finally:
+                os.close(out_fd)
+            os.replace(tmp_dest, dest)
+        except OSError as e:
+            try:
+                os.remove(tmp_dest)
+            except OSError:
+                pass
+            results.append((key, 0, 0.0, str(e)))
+            continue
+        results.append((key, written, seconds, None))
+    return results
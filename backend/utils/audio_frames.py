@@ -0,0 +1,460 @@
+"""Leitura de quadros MP3 e páginas Ogg sem decodificar o áudio.
+
+Usado para distribuir um mesmo stream entre várias gravações cortando sempre em
+fronteiras válidas (quadro MP3 / página Ogg), sem subprocessos.
+"""
+import os
+import struct
+import zlib
+
+# Tabelas de bitrate (kbps) indexadas por [versao_mpeg1][layer]
+_BITRATES = {
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Índice do campo "version" do cabeçalho -> taxas de amostragem
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),  # MPEG-2.5
+}
+_LAYERS = {1: 3, 2: 2}  # bits do cabeçalho -> layer (Layer I não é suportado)
+
+
+class Mp3FrameHeader:
+    __slots__ = ('frame_length', 'samples', 'sample_rate', 'bitrate_kbps', 'channels', 'mpeg1')
+
+    def __init__(self, frame_length, samples, sample_rate, bitrate_kbps, channels, mpeg1):
+        self.frame_length = frame_length
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.bitrate_kbps = bitrate_kbps
+        self.channels = channels
+        self.mpeg1 = mpeg1
+
+    @property
+    def duration(self):
+        return self.samples / self.sample_rate
+
+
+def parse_mp3_header(data, offset=0):
+    """Interpreta os 4 bytes de cabeçalho de um quadro MPEG áudio; None se inválido."""
+    if len(data) < offset + 4:
+        return None
+    b0, b1, b2, b3 = data[offset], data[offset + 1], data[offset + 2], data[offset + 3]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x03
+    layer = _LAYERS.get((b1 >> 1) & 0x03)
+    if version == 1 or layer is None:
+        return None
+    bitrate_index = (b2 >> 4) & 0x0F
+    sample_rate_index = (b2 >> 2) & 0x03
+    if bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate_kbps = _BITRATES[(mpeg1, layer)][bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 0x01
+    samples = 1152 if (layer == 2 or mpeg1) else 576
+    frame_length = (samples // 8) * bitrate_kbps * 1000 // sample_rate + padding
+    channels = 1 if ((b3 >> 6) & 0x03) == 3 else 2
+    return Mp3FrameHeader(frame_length, samples, sample_rate, bitrate_kbps, channels, mpeg1)
+
+
+class Mp3Framer:
+    """Recebe bytes arbitrários e devolve quadros MP3 completos (ressincroniza se preciso)."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        buf = self._buffer
+        buf += data
+        frames = []
+        pos = 0
+        size = len(buf)
+        while size - pos >= 4:
+            header = parse_mp3_header(buf, pos)
+            if header is None:
+                nxt = buf.find(b'\xff', pos + 1)
+                pos = nxt if nxt != -1 else size
+                continue
+            end = pos + header.frame_length
+            if end > size:
+                break
+            frames.append((header, bytes(buf[pos:end])))
+            pos = end
+        del buf[:pos]
+        return frames
+
+
+def iter_mp3_frames(fileobj, offset=0, chunk_size=256 * 1024):
+    """Itera (offset, cabeçalho) de cada quadro de um arquivo MP3 sem carregar tudo na memória."""
+    fileobj.seek(offset)
+    head = fileobj.read(10)
+    # Pular tag ID3v2 no início do arquivo
+    if offset == 0 and len(head) == 10 and head[:3] == b'ID3':
+        tag_size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        offset = 10 + tag_size + (10 if head[5] & 0x10 else 0)
+    fileobj.seek(offset)
+    buf = b''
+    base = offset
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        buf += chunk
+        pos = 0
+        size = len(buf)
+        while size - pos >= 4:
+            header = parse_mp3_header(buf, pos)
+            if header is None:
+                nxt = buf.find(b'\xff', pos + 1)
+                pos = nxt if nxt != -1 else size
+                continue
+            if pos + header.frame_length > size:
+                break
+            yield base + pos, header
+            pos += header.frame_length
+        buf = buf[pos:]
+        base += pos
+
+
+# ---------------------------------------------------------------------------
+# Ogg
+# ---------------------------------------------------------------------------
+
+OGG_CAPTURE = b'OggS'
+OGG_HEADER = struct.Struct('<4sBBqIIIB')
+OGG_CONTINUED = 0x01
+OGG_BOS = 0x02
+OGG_EOS = 0x04
+OGG_NO_GRANULE = -1
+OPUS_SAMPLE_RATE = 48000
+
+_BIT_REVERSE = bytes(int(f'{i:08b}'[::-1], 2) for i in range(256))
+
+
+def ogg_crc(data):
+    """CRC-32 do Ogg (polinômio 0x04c11db7 sem reflexão) calculado via zlib em C.
+
+    O CRC refletido do zlib sobre os bytes com bits invertidos é o espelho do CRC
+    não refletido, então basta inverter os bits do resultado.
+    """
+    raw = zlib.crc32(bytes(data).translate(_BIT_REVERSE), 0xFFFFFFFF) ^ 0xFFFFFFFF
+    return int(f'{raw:032b}'[::-1], 2)
+
+
+class OggPage:
+    __slots__ = ('header_type', 'granule', 'serial', 'seqno', 'segments', 'body')
+
+    def __init__(self, header_type, granule, serial, seqno, segments, body):
+        self.header_type = header_type
+        self.granule = granule
+        self.serial = serial
+        self.seqno = seqno
+        self.segments = segments
+        self.body = body
+
+    @property
+    def continued(self):
+        """Página começa no meio de um pacote iniciado na página anterior."""
+        return bool(self.header_type & OGG_CONTINUED)
+
+    @property
+    def size(self):
+        return OGG_HEADER.size + len(self.segments) + len(self.body)
+
+    def serialize(self, *, seqno=None, granule=None, header_type=None):
+        """Monta a página (com CRC) permitindo renumerar sequência/granule/flags."""
+        header = OGG_HEADER.pack(
+            OGG_CAPTURE,
+            0,
+            self.header_type if header_type is None else header_type,
+            self.granule if granule is None else granule,
+            self.serial,
+            self.seqno if seqno is None else seqno,
+            0,
+            len(self.segments),
+        )
+        page = bytearray(header)
+        page += self.segments
+        page += self.body
+        struct.pack_into('<I', page, 22, ogg_crc(page))
+        return bytes(page)
+
+
+def _parse_ogg_page(buf, pos):
+    """Retorna (OggPage, fim) para a página em `pos`, None se incompleta, False se inválida."""
+    if len(buf) - pos < OGG_HEADER.size:
+        return None
+    capture, version, header_type, granule, serial, seqno, _crc, nsegs = OGG_HEADER.unpack_from(buf, pos)
+    if capture != OGG_CAPTURE or version != 0:
+        return False
+    seg_start = pos + OGG_HEADER.size
+    if len(buf) < seg_start + nsegs:
+        return None
+    segments = bytes(buf[seg_start:seg_start + nsegs])
+    body_start = seg_start + nsegs
+    end = body_start + sum(segments)
+    if len(buf) < end:
+        return None
+    page = OggPage(header_type, granule, serial, seqno, segments, bytes(buf[body_start:end]))
+    return page, end
+
+
+class OggPageParser:
+    """Recebe bytes arbitrários e devolve páginas Ogg completas."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        buf = self._buffer
+        buf += data
+        pages = []
+        pos = 0
+        while True:
+            if buf[pos:pos + 4] != OGG_CAPTURE:
+                nxt = buf.find(OGG_CAPTURE, pos + 1)
+                if nxt == -1:
+                    # Manter só o suficiente para um "OggS" partido entre chunks
+                    pos = max(pos, len(buf) - 3)
+                    break
+                pos = nxt
+            parsed = _parse_ogg_page(buf, pos)
+            if parsed is None:
+                break
+            if parsed is False:
+                pos += 1
+                continue
+            page, pos = parsed
+            pages.append(page)
+        del buf[:pos]
+        return pages
+
+
+def iter_ogg_pages(fileobj, offset=0, chunk_size=256 * 1024):
+    """Itera (offset, OggPage) de um arquivo Ogg a partir de `offset`."""
+    fileobj.seek(offset)
+    buf = b''
+    base = offset
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        buf += chunk
+        pos = 0
+        while True:
+            if buf[pos:pos + 4] != OGG_CAPTURE:
+                nxt = buf.find(OGG_CAPTURE, pos + 1)
+                if nxt == -1:
+                    pos = max(pos, len(buf) - 3)
+                    break
+                pos = nxt
+            parsed = _parse_ogg_page(buf, pos)
+            if parsed is None:
+                break
+            if parsed is False:
+                pos += 1
+                continue
+            page, end = parsed
+            yield base + pos, page
+            pos = end
+        buf = buf[pos:]
+        base += pos
+
+
+class OggStreamRewriter:
+    """Reescreve páginas de um stream Ogg contínuo como um arquivo independente.
+
+    Emite primeiro as páginas de cabeçalho (OpusHead/OpusTags), começa na primeira
+    página que inicia um pacote, renumera a sequência, rebaseia o granule para zero e
+    marca a última página com EOS ao fechar.
+    """
+
+    def __init__(self, header_pages):
+        self._header_pages = list(header_pages)
+        self._seqno = 0
+        self._granule_base = None
+        self._last_granule = 0
+        self._last_raw = 0
+        self._pending = None
+        self.started = False
+
+    def _emit(self, page, *, granule, header_type=None):
+        data = page.serialize(seqno=self._seqno, granule=granule, header_type=header_type)
+        self._seqno += 1
+        return data
+
+    def push(self, page, previous_granule):
+        """Recebe a próxima página de áudio do stream; retorna os bytes a gravar."""
+        out = []
+        if not self.started:
+            if page.continued:
+                return b''
+            for header in self._header_pages:
+                out.append(self._emit(header, granule=0, header_type=header.header_type & ~OGG_EOS))
+            self._granule_base = max(0, previous_granule or 0)
+            self._last_raw = self._granule_base
+            self.started = True
+        if self._pending is not None:
+            out.append(self._emit(self._pending[0], granule=self._pending[1]))
+        granule = page.granule
+        if granule != OGG_NO_GRANULE:
+            if granule < self._last_raw:
+                # Stream reiniciado (granule voltou): continuar a contagem de onde parou
+                self._granule_base = granule - self._last_granule
+            self._last_raw = granule
+            granule = max(0, granule - self._granule_base)
+            self._last_granule = granule
+        self._pending = (page, granule)
+        return b''.join(out)
+
+    @property
+    def samples(self):
+        """Amostras (48 kHz) já entregues desde o início do arquivo."""
+        return self._last_granule
+
+    def close(self):
+        """Bytes finais (última página com flag EOS)."""
+        if self._pending is None:
+            return b''
+        page, granule = self._pending
+        self._pending = None
+        return self._emit(page, granule=granule, header_type=page.header_type | OGG_EOS)
+
+
+# ---------------------------------------------------------------------------
+# Duração sem subprocesso
+# ---------------------------------------------------------------------------
+
+HEAD_READ_BYTES = 64 * 1024
+TAIL_READ_BYTES = 64 * 1024
+_XING_FRAMES = 0x01
+_XING_BYTES = 0x02
+
+
+def _id3v2_size(head):
+    if len(head) >= 10 and head[:3] == b'ID3':
+        tag_size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        return 10 + tag_size + (10 if head[5] & 0x10 else 0)
+    return 0
+
+
+def _xing_offset(header):
+    """Posição do cabeçalho Xing/Info dentro do primeiro quadro (após o side info)."""
+    if header.mpeg1:
+        return 4 + (17 if header.channels == 1 else 32)
+    return 4 + (9 if header.channels == 1 else 17)
+
+
+def mp3_info(fileobj, file_size):
+    """(duração em segundos, bitrate kbps) de um MP3; None se não achar um quadro válido.
+
+    Usa o cabeçalho Xing/Info (LAME) ou VBRI quando existe; senão assume CBR e calcula
+    pelo tamanho do áudio e o bitrate do primeiro quadro.
+    """
+    fileobj.seek(0)
+    head = fileobj.read(10)
+    start = _id3v2_size(head)
+    fileobj.seek(start)
+    data = fileobj.read(HEAD_READ_BYTES)
+    pos = 0
+    header = None
+    while pos < len(data) - 4:
+        header = parse_mp3_header(data, pos)
+        # Exigir um segundo quadro logo em seguida para não confiar em sincronismo falso
+        if header is not None:
+            nxt = pos + header.frame_length
+            if nxt + 4 > len(data) or parse_mp3_header(data, nxt) is not None:
+                break
+        header = None
+        nxt = data.find(b'\xff', pos + 1)
+        if nxt == -1:
+            break
+        pos = nxt
+    if header is None:
+        return None
+    audio_start = start + pos
+
+    frame = data[pos:pos + header.frame_length]
+    xing = _xing_offset(header)
+    if frame[xing:xing + 4] in (b'Xing', b'Info'):
+        flags = struct.unpack_from('>I', frame, xing + 4)[0]
+        if flags & _XING_FRAMES:
+            frames = struct.unpack_from('>I', frame, xing + 8)[0]
+            duration = frames * header.samples / header.sample_rate
+            if flags & _XING_BYTES and duration:
+                audio_bytes = struct.unpack_from('>I', frame, xing + 12)[0]
+                return duration, round(audio_bytes * 8 / duration / 1000)
+            return duration, header.bitrate_kbps
+    if frame[36:40] == b'VBRI':
+        audio_bytes, frames = struct.unpack_from('>II', frame, 36 + 10)
+        duration = frames * header.samples / header.sample_rate
+        bitrate = round(audio_bytes * 8 / duration / 1000) if duration else header.bitrate_kbps
+        return duration, bitrate
+
+    audio_end = file_size
+    if file_size >= 128:
+        fileobj.seek(file_size - 128)
+        if fileobj.read(3) == b'TAG':
+            audio_end -= 128
+    return max(0, audio_end - audio_start) * 8 / (header.bitrate_kbps * 1000), header.bitrate_kbps
+
+
+def _last_granule(fileobj, file_size, serial=None):
+    """Granule da última página Ogg (lendo só o fim do arquivo)."""
+    window = TAIL_READ_BYTES
+    while True:
+        start = max(0, file_size - window)
+        fileobj.seek(start)
+        data = fileobj.read(file_size - start)
+        pos = data.rfind(OGG_CAPTURE)
+        while pos != -1:
+            if len(data) - pos >= OGG_HEADER.size:
+                _cap, version, _type, granule, page_serial, _seq, _crc, _n = OGG_HEADER.unpack_from(data, pos)
+                if version == 0 and granule != OGG_NO_GRANULE and serial in (None, page_serial):
+                    return granule
+            pos = data.rfind(OGG_CAPTURE, 0, pos)
+        if start == 0:
+            return None
+        window *= 4
+
+
+def ogg_opus_info(fileobj, file_size):
+    """(duração em segundos, bitrate kbps médio) de um Ogg Opus; None se não for Opus."""
+    fileobj.seek(0)
+    data = fileobj.read(4096)
+    parsed = _parse_ogg_page(data, 0) if data[:4] == OGG_CAPTURE else None
+    if not parsed:
+        return None
+    first = parsed[0]
+    if first.body[:8] != b'OpusHead' or len(first.body) < 12:
+        return None
+    pre_skip = struct.unpack_from('<H', first.body, 10)[0]
+    granule = _last_granule(fileobj, file_size, first.serial)
+    if granule is None:
+        return None
+    duration = max(0, granule - pre_skip) / OPUS_SAMPLE_RATE
+    bitrate = round(file_size * 8 / duration / 1000) if duration else None
+    return duration, bitrate
+
+
+def audio_info(path):
+    """(duração em segundos, bitrate kbps) de um MP3 ou Ogg Opus lendo só cabeçalho/fim do arquivo.
+
+    Retorna None quando o formato não é reconhecido (quem chama decide usar o ffprobe).
+    """
+    try:
+        file_size = os.path.getsize(path)
+        with open(path, 'rb') as fh:
+            magic = fh.read(4)
+            if magic == OGG_CAPTURE:
+                return ogg_opus_info(fh, file_size)
+            return mp3_info(fh, file_size)
+    except (OSError, struct.error):
+        return None
@@ -0,0 +1,114 @@
+"""Leitura incremental de uma gravação que ainda está crescendo.
+
+`AudioTail` lembra até onde já leu (arquivo e offset) e, a cada chamada, devolve só as
+unidades completas acrescentadas desde então: quadros MP3 ou páginas Ogg Opus, com o
+instante de início e a duração. Quadro/página partidos no fim do arquivo ficam para a
+próxima leitura. Com vários arquivos (segmentos HLS), todos menos o último já estão
+fechados; o último pode continuar crescendo.
+
+`window_bytes` remonta uma sequência de unidades como um arquivo independente, pronto
+para o ffmpeg decodificar.
+
+Este módulo não importa o app.
+"""
+import os
+import struct
+from collections import deque
+
+from utils.audio_frames import (
+    Mp3Framer,
+    OggPageParser,
+    OggStreamRewriter,
+    OGG_NO_GRANULE,
+    OPUS_SAMPLE_RATE,
+)
+
+READ_CHUNK = 256 * 1024
+
+
+class AudioTail:
+    def __init__(self, kind):
+        self.kind = kind
+        self.position = 0.0  # s de áudio já lidos (fim da última unidade)
+        self.headers = []  # páginas OpusHead/OpusTags
+        self._parser = Mp3Framer() if kind == 'mp3' else OggPageParser()
+        self._file_index = 0
+        self._offset = 0
+        self._pre_skip = 0
+        self._granule = 0
+
+    def read(self, paths, keep_seconds=None):
+        """Lê o que foi acrescentado a `paths`; retorna (unidades, segundos_descartados).
+
+        Unidade = (inicio, duracao, dado): bytes do quadro (MP3) ou (página, granule
+        anterior) (Opus). Com `keep_seconds`, só os últimos segundos lidos são
+        devolvidos: um atraso grande não vira um bloco enorme em memória.
+        """
+        units = deque()
+        kept = 0.0
+        dropped = 0.0
+        while self._file_index < len(paths):
+            path = paths[self._file_index]
+            last = self._file_index == len(paths) - 1
+            try:
+                fh = open(path, 'rb')
+            except FileNotFoundError:
+                break
+            with fh:
+                fh.seek(self._offset)
+                while True:
+                    data = fh.read(READ_CHUNK)
+                    if not data:
+                        break
+                    self._offset += len(data)
+                    for unit in self._parse(data):
+                        units.append(unit)
+                        kept += unit[1]
+                    while keep_seconds is not None and units and kept - units[0][1] >= keep_seconds:
+                        dropped += units[0][1]
+                        kept -= units.popleft()[1]
+            if last:
+                break
+            # Segmento fechado lido até o fim: segue para o próximo
+            self._file_index += 1
+            self._offset = 0
+        return list(units), dropped
+
+    def _parse(self, data):
+        if self.kind == 'mp3':
+            for header, frame in self._parser.feed(data):
+                start = self.position
+                self.position += header.duration
+                yield start, header.duration, frame
+            return
+        for page in self._parser.feed(data):
+            if page.body[:8] == b'OpusHead' and len(page.body) >= 12:
+                self._pre_skip = struct.unpack_from('<H', page.body, 10)[0]
+                self.headers.append(page)
+                continue
+            if page.granule == 0:
+                # OpusTags e demais páginas de cabeçalho
+                self.headers.append(page)
+                continue
+            previous = self._granule
+            duration = 0.0
+            if page.granule != OGG_NO_GRANULE:
+                duration = max(0, page.granule - previous) / OPUS_SAMPLE_RATE
+                self._granule = page.granule
+            start = max(0, previous - self._pre_skip) / OPUS_SAMPLE_RATE
+            self.position = max(self.position, start + duration)
+            yield start, duration, (page, previous)
+
+
+def window_bytes(kind, units, headers=None):
+    """Bytes de um arquivo MP3/Ogg independente com as unidades em sequência."""
+    if kind == 'mp3':
+        return b''.join(unit[2] for unit in units)
+    rewriter = OggStreamRewriter(headers or [])
+    out = [rewriter.push(page, previous) for _start, _duration, (page, previous) in units]
+    out.append(rewriter.close())
+    return b''.join(out)
+
+
+def tail_kind(path):
+    return 'opus' if os.path.splitext(path)[1].lower() in ('.opus', '.ogg') else 'mp3'
@@ -0,0 +1,131 @@
+"""Impressão digital de áudio por marcos espectrais (pares de picos, estilo Shazam).
+
+O áudio mono (ANALYSIS_SAMPLE_RATE) vira um espectrograma de magnitude em dB; os picos
+locais (máximo numa vizinhança de tempo x frequência) são os marcos. Cada marco é
+pareado com os próximos FAN_OUT picos à frente dele, e o par vira um hash de 24 bits:
+
+    hash = f1 (9 bits) | f2 (9 bits) | dt em quadros (6 bits)
+
+guardado com o quadro do marco. A mesma música/vinheta gera os mesmos hashes em
+qualquer gravação, com o mesmo deslocamento de tempo entre eles: a busca conta pares
+(gravação, quadro_gravação - quadro_referência) e os deslocamentos com muitos votos são
+as ocorrências.
+
+O processamento é incremental (blocos contínuos, memória limitada a alguns segundos de
+espectrograma), para rodar na mesma passada de decodificação das outras análises.
+Este módulo não importa o app.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+NFFT = 512
+HOP = 256
+PEAK_TIME_RADIUS = 12  # quadros (±0,38 s a 8 kHz)
+PEAK_FREQ_RADIUS = 15  # bins
+PEAK_MIN_DB = -70.0
+PEAK_PROMINENCE_DB = 15.0  # acima da mediana do quadro: picos do ruído de fundo não viram marcos
+FAN_OUT = 5
+MAX_DT = 63  # quadros; cabe em 6 bits
+FREQ_BITS = 9
+DT_BITS = 6
+
+_WINDOW = np.hanning(NFFT).astype(np.float32)
+
+
+def frame_seconds(sample_rate):
+    """Duração de um quadro do espectrograma (unidade dos deslocamentos)."""
+    return HOP / sample_rate
+
+
+def _sliding_max(values, radius, axis):
+    """Máximo numa janela de ±radius ao longo de `axis` (bordas com -inf)."""
+    pad = [(0, 0)] * values.ndim
+    pad[axis] = (radius, radius)
+    padded = np.pad(values, pad, constant_values=-np.inf)
+    return sliding_window_view(padded, 2 * radius + 1, axis=axis).max(axis=-1)
+
+
+class Fingerprinter:
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self._carry = np.empty(0, dtype=np.float32)
+        self._spec = np.empty((0, NFFT // 2 + 1), dtype=np.float32)
+        self._spec_start = 0  # quadro da primeira linha de _spec
+        self._frames = 0  # quadros calculados
+        self._peaks_upto = 0  # quadros [0, _peaks_upto) já tiveram os picos detectados
+        self._peaks = []  # (quadro, bin) ainda necessários para pareamento, em ordem
+
+    def feed(self, samples):
+        """Processa um bloco; retorna (hashes, quadros) dos pares já fechados."""
+        if self._carry.size:
+            samples = np.concatenate((self._carry, samples))
+        count = (samples.size - NFFT) // HOP + 1 if samples.size >= NFFT else 0
+        if count:
+            frames = sliding_window_view(samples, NFFT)[::HOP][:count]
+            magnitude = np.abs(np.fft.rfft(frames * _WINDOW, axis=1))
+            spec = (20 * np.log10(np.maximum(magnitude, 1e-10))).astype(np.float32)
+            self._spec = np.concatenate((self._spec, spec))
+            self._frames += count
+        self._carry = samples[count * HOP:].copy()
+        self._detect_peaks(self._frames - PEAK_TIME_RADIUS)
+        return self._pair(self._peaks_upto - MAX_DT - 1)
+
+    def finish(self):
+        """Fecha os quadros e pares pendentes (fim do áudio)."""
+        self._detect_peaks(self._frames)
+        return self._pair(None)
+
+    def _detect_peaks(self, upto):
+        if upto <= self._peaks_upto:
+            return
+        # Vizinhança completa: PEAK_TIME_RADIUS quadros de contexto antes e depois
+        lo = self._peaks_upto - self._spec_start
+        region = self._spec
+        maxed = _sliding_max(_sliding_max(region, PEAK_FREQ_RADIUS, axis=1), PEAK_TIME_RADIUS, axis=0)
+        hi = upto - self._spec_start
+        block = region[lo:hi]
+        floor = np.maximum(np.median(block, axis=1, keepdims=True) + PEAK_PROMINENCE_DB, PEAK_MIN_DB)
+        is_peak = (block == maxed[lo:hi]) & (block > floor)
+        times, bins = np.nonzero(is_peak)
+        self._peaks.extend(zip((times + self._peaks_upto).tolist(), bins.tolist()))
+        self._peaks_upto = upto
+        # Mantém só o contexto de que os próximos quadros precisam
+        keep_from = max(self._spec_start, upto - PEAK_TIME_RADIUS)
+        self._spec = self._spec[keep_from - self._spec_start:]
+        self._spec_start = keep_from
+
+    def _pair(self, anchor_upto):
+        """Pares dos marcos com quadro <= anchor_upto (None = todos)."""
+        peaks = self._peaks
+        hashes = []
+        quadros = []
+        done = 0
+        for i, (t1, f1) in enumerate(peaks):
+            if anchor_upto is not None and t1 > anchor_upto:
+                break
+            done = i + 1
+            paired = 0
+            for j in range(i + 1, len(peaks)):
+                t2, f2 = peaks[j]
+                dt = t2 - t1
+                if dt > MAX_DT:
+                    break
+                if dt < 1:
+                    continue
+                hashes.append((f1 << (FREQ_BITS + DT_BITS)) | (f2 << DT_BITS) | dt)
+                quadros.append(t1)
+                paired += 1
+                if paired >= FAN_OUT:
+                    break
+        del peaks[:done]
+        return np.array(hashes, dtype=np.int32), np.array(quadros, dtype=np.int32)
+
+
+def fingerprint(chunks, sample_rate):
+    """(hashes, quadros) de blocos de PCM em sequência (ex.: decode_pcm_chunks)."""
+    printer = Fingerprinter(sample_rate)
+    parts = [printer.feed(samples) for samples in chunks]
+    parts.append(printer.finish())
+    hashes = np.concatenate([p[0] for p in parts])
+    quadros = np.concatenate([p[1] for p in parts])
+    return hashes, quadros
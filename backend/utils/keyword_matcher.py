@@ -0,0 +1,161 @@
+"""Casamento de muitas listas de palavras-chave numa passada só (Aho-Corasick por palavra).
+
+As palavras-chave (inclusive expressões com várias palavras) viram caminhos numa trie de
+tokens normalizados (minúsculas, sem acento, sem pontuação). Os links de falha permitem
+percorrer a transcrição uma única vez e obter todas as ocorrências de todas as listas,
+com custo proporcional ao tamanho do texto mais o número de ocorrências, não ao número
+de palavras-chave.
+
+A trie é atualizada incrementalmente (`add`/`remove`); os links de falha são recalculados
+na próxima busca depois de uma mudança.
+"""
+import re
+import unicodedata
+from collections import deque
+
+_NON_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def normalize_text(text):
+    """Minúsculas, sem acentos e sem pontuação ("São Paulo!" -> "sao paulo")."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_WORD_RE.sub(' ', stripped.lower()).strip()
+
+
+def tokenize(text):
+    return normalize_text(text).split()
+
+
+class KeywordAutomaton:
+    def __init__(self):
+        self._patterns = {}  # payload -> tokens
+        self._reset()
+
+    def _reset(self):
+        self._goto = [{}]
+        self._parent = [0]
+        self._depth = [0]
+        self._outputs = [set()]  # payloads que terminam exatamente neste nó
+        self._fail = [0]
+        self._link = [0]  # nó de sufixo mais próximo com saídas (0 = nenhum)
+        self._garbage = 0
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def add(self, keyword, payload):
+        """Registra `keyword` devolvendo `payload` nas ocorrências; False se vazia."""
+        tokens = tokenize(keyword)
+        if not tokens:
+            return False
+        if payload in self._patterns:
+            self.remove(payload)
+        node = 0
+        for token in tokens:
+            nxt = self._goto[node].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._parent.append(node)
+                self._depth.append(self._depth[node] + 1)
+                self._outputs.append(set())
+                self._fail.append(0)
+                self._link.append(0)
+                self._goto[node][token] = nxt
+            node = nxt
+        self._outputs[node].add(payload)
+        self._patterns[payload] = tokens
+        self._dirty = True
+        return True
+
+    def remove(self, payload):
+        tokens = self._patterns.pop(payload, None)
+        if tokens is None:
+            return False
+        node = self._walk(tokens)
+        if node is not None:
+            self._outputs[node].discard(payload)
+            # Poda o ramo que ficou sem saídas
+            while node and not self._outputs[node] and not self._goto[node]:
+                parent = self._parent[node]
+                self._goto[parent] = {t: n for t, n in self._goto[parent].items() if n != node}
+                self._garbage += 1
+                node = parent
+        self._dirty = True
+        if self._garbage > max(1024, len(self._goto) // 2):
+            self._compact()
+        return True
+
+    def _walk(self, tokens):
+        node = 0
+        for token in tokens:
+            node = self._goto[node].get(token)
+            if node is None:
+                return None
+        return node
+
+    def _compact(self):
+        """Reconstrói a trie sem os nós podados (depois de muitas remoções)."""
+        patterns = self._patterns
+        self._patterns = {}
+        self._reset()
+        for payload, tokens in patterns.items():
+            self.add(' '.join(tokens), payload)
+
+    def _build(self):
+        self._fail[0] = 0
+        self._link[0] = 0
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._link[child] = 0
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(token, 0)
+                self._fail[child] = target if target != child else 0
+                f = self._fail[child]
+                self._link[child] = f if self._outputs[f] else self._link[f]
+                queue.append(child)
+        self._dirty = False
+
+    def iter_matches(self, tokens):
+        """Gera (índice_inicial, índice_final, payload) de cada ocorrência em `tokens`."""
+        if self._dirty:
+            self._build()
+        goto, fail, outputs, link, depth = self._goto, self._fail, self._outputs, self._link, self._depth
+        node = 0
+        for i, token in enumerate(tokens):
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            out = node
+            while out:
+                for payload in outputs[out]:
+                    yield i - depth[out] + 1, i, payload
+                out = link[out]
+
+    def match_words(self, words):
+        """[(payload, inicio, fim)] para palavras transcritas [(palavra, inicio, fim, ...)].
+
+        Palavras que a normalização divide (ex.: "covid-19") viram vários tokens com o
+        mesmo tempo, então expressões continuam casando pelo texto falado.
+        """
+        tokens = []
+        owners = []
+        for idx, word in enumerate(words):
+            for token in tokenize(word[0]):
+                tokens.append(token)
+                owners.append(idx)
+        hits = []
+        for start, end, payload in self.iter_matches(tokens):
+            first = words[owners[start]]
+            last = words[owners[end]]
+            hits.append((payload, float(first[1]), float(last[2])))
+        return hits
@@ -0,0 +1,49 @@
+"""Entrega de arquivos de mídia com Range (206), validadores e offload opcional para o nginx.
+
+Sem MEDIA_ACCEL_PREFIX, o próprio Flask responde: ETag forte (inode, tamanho e mtime),
+Last-Modified, 304 para If-None-Match/If-Modified-Since e 206/416 para Range/If-Range.
+Com o prefixo, a resposta sai vazia com X-Accel-Redirect e o nginx lê o arquivo por
+sendfile, tratando Range e validadores ele mesmo; o worker só autoriza e resolve o caminho.
+
+Arquivo concluído recebe `Cache-Control: immutable`; arquivo ainda crescendo (gravação em
+andamento, escrito há pouco) ou playlist sai com `no-cache`, sempre revalidado.
+"""
+import os
+import time
+from urllib.parse import quote
+
+from flask import current_app, send_file
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+SETTLE_SECONDS = 5  # modificado há menos que isso: pode ainda estar sendo escrito
+
+
+def media_etag(stat):
+    """ETag forte: muda se o arquivo for trocado (inode), crescer ou for reescrito."""
+    return f'{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}'
+
+
+def send_media(path, mimetype, *, relative_path, growing=False):
+    """Resposta para `path`; `relative_path` é o caminho dentro do STORAGE_PATH (X-Accel-Redirect)."""
+    stat = os.stat(path)
+    growing = growing or time.time() - stat.st_mtime < SETTLE_SECONDS
+    cache_control = REVALIDATE_CACHE if growing else IMMUTABLE_CACHE
+
+    prefix = current_app.config.get('MEDIA_ACCEL_PREFIX')
+    if prefix:
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(relative_path)
+        response.headers['Cache-Control'] = cache_control
+        return response
+
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        conditional=True,
+        etag=media_etag(stat),
+        last_modified=stat.st_mtime,
+    )
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,105 @@
+"""Arquivo de picos (forma de onda) com pirâmide de níveis de detalhe.
+
+Formato (little-endian):
+    cabeçalho  '<4sHBB'  magic b'PKS1', bucket_ms do nível 0, fator entre níveis, nº de níveis
+    contagens  '<I' por nível (buckets)
+    dados      int8 [min, max] intercalados, nível 0 primeiro
+
+Cada nível agrega `fator` buckets do anterior (min dos mínimos, max dos máximos), então
+a timeline pede só o nível com resolução suficiente para a largura que vai desenhar.
+"""
+import os
+import struct
+
+import numpy as np
+
+PEAKS_MAGIC = b'PKS1'
+PEAKS_HEADER = struct.Struct('<4sHBB')
+LEVEL_FACTOR = 4
+MIN_LEVEL_BUCKETS = 512
+
+
+class PeaksBuilder:
+    """Acumula min/max por bucket a partir de blocos de PCM float (-1..1)."""
+
+    def __init__(self, sample_rate, bucket_ms):
+        self.bucket_ms = bucket_ms
+        self.bucket_samples = max(1, sample_rate * bucket_ms // 1000)
+        self._carry = np.empty(0, dtype=np.float32)
+        self._mins = []
+        self._maxs = []
+
+    def feed(self, samples):
+        if self._carry.size:
+            samples = np.concatenate((self._carry, samples))
+        usable = samples.size - samples.size % self.bucket_samples
+        if usable:
+            blocks = samples[:usable].reshape(-1, self.bucket_samples)
+            self._mins.append(_quantize(blocks.min(axis=1)))
+            self._maxs.append(_quantize(blocks.max(axis=1)))
+        self._carry = samples[usable:].copy()
+
+    def finish(self):
+        """Retorna (mins, maxs) do nível 0 como arrays int8."""
+        if self._carry.size:
+            self._mins.append(_quantize(self._carry.min(keepdims=True)))
+            self._maxs.append(_quantize(self._carry.max(keepdims=True)))
+            self._carry = np.empty(0, dtype=np.float32)
+        if not self._mins:
+            return np.empty(0, dtype=np.int8), np.empty(0, dtype=np.int8)
+        return np.concatenate(self._mins), np.concatenate(self._maxs)
+
+
+def _quantize(values):
+    return np.clip(np.round(values * 127), -127, 127).astype(np.int8)
+
+
+def build_pyramid(mins, maxs, factor=LEVEL_FACTOR, min_buckets=MIN_LEVEL_BUCKETS):
+    """Lista de (mins, maxs) do nível 0 até o primeiro nível com <= min_buckets."""
+    levels = [(mins, maxs)]
+    while mins.size > min_buckets:
+        pad = (-mins.size) % factor
+        if pad:
+            # Repete o último bucket para completar o grupo sem inventar picos
+            mins = np.concatenate((mins, np.repeat(mins[-1:], pad)))
+            maxs = np.concatenate((maxs, np.repeat(maxs[-1:], pad)))
+        mins = mins.reshape(-1, factor).min(axis=1)
+        maxs = maxs.reshape(-1, factor).max(axis=1)
+        levels.append((mins, maxs))
+    return levels
+
+
+def write_peaks(path, levels, bucket_ms, factor=LEVEL_FACTOR):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as fh:
+        fh.write(PEAKS_HEADER.pack(PEAKS_MAGIC, bucket_ms, factor, len(levels)))
+        fh.write(struct.pack(f'<{len(levels)}I', *(mins.size for mins, _maxs in levels)))
+        for mins, maxs in levels:
+            interleaved = np.empty(mins.size * 2, dtype=np.int8)
+            interleaved[0::2] = mins
+            interleaved[1::2] = maxs
+            fh.write(interleaved.tobytes())
+    # Substituição atômica: o endpoint nunca lê um arquivo pela metade
+    os.replace(tmp_path, path)
+
+
+def read_peaks_header(fh):
+    """(bucket_ms, fator, [contagem por nível]) do arquivo aberto; ValueError se inválido."""
+    fh.seek(0)
+    magic, bucket_ms, factor, nlevels = PEAKS_HEADER.unpack(fh.read(PEAKS_HEADER.size))
+    if magic != PEAKS_MAGIC:
+        raise ValueError("Arquivo de picos invalido")
+    counts = list(struct.unpack(f'<{nlevels}I', fh.read(4 * nlevels)))
+    return bucket_ms, factor, counts
+
+
+def read_level(fh, counts, level, start_bucket=0, end_bucket=None):
+    """Bytes [min, max] intercalados de um trecho de um nível, sem ler o resto do arquivo."""
+    offset = PEAKS_HEADER.size + 4 * len(counts) + 2 * sum(counts[:level])
+    count = counts[level]
+    end_bucket = count if end_bucket is None else min(end_bucket, count)
+    start_bucket = max(0, min(start_bucket, count))
+    # Fim antes do início vira trecho vazio: read() com tamanho negativo leria o resto do arquivo
+    end_bucket = max(end_bucket, start_bucket)
+    fh.seek(offset + 2 * start_bucket)
+    return fh.read(2 * (end_bucket - start_bucket))
@@ -0,0 +1,209 @@
+"""Classificação fala/música por janelas de 1 s com atributos vetorizados.
+
+Em cada janela, quadros de 20 ms dão energia, taxa de cruzamentos por zero e espectro.
+Daí saem quatro atributos clássicos (Scheirer/Slaney, Lu et al.):
+
+- LSTER: fração de quadros com energia baixa (pausas entre sílabas na fala);
+- HZCRR: fração de quadros com cruzamentos por zero bem acima da média (fricativas);
+- variação da energia em dB (sílabas x pausas);
+- variação do fluxo espectral (a fala alterna sílabas e pausas; a música muda de forma regular).
+
+Cada atributo acima do seu limiar é um voto; com SPEECH_MIN_VOTES a janela é fala. Os
+rótulos passam por um filtro de maioria (SMOOTH_WINDOWS) e são dilatados em uma janela,
+para não cortar o começo e o fim das falas. Janelas em silêncio não são fala.
+
+`SpeechMusicSegmenter` é incremental (blocos contínuos, memória de poucas janelas);
+`SpeechGate` usa os rótulos (ou intervalos já calculados) para zerar o áudio fora da
+fala, mantendo os tempos do arquivo. Este módulo não importa o app.
+"""
+from collections import deque
+
+import numpy as np
+
+WINDOW_SECONDS = 1.0
+FRAME_SECONDS = 0.02
+SMOOTH_WINDOWS = 5  # ímpar
+SILENCE_DB = -45.0
+LSTER_MIN = 0.15
+HZCRR_MIN = 0.15
+ENERGY_STD_DB_MIN = 6.0
+FLUX_MIN = 0.35
+SPEECH_MIN_VOTES = 3
+
+
+def window_features(windows, sample_rate):
+    """Atributos por janela: (nível_db, lster, hzcrr, desvio_energia_db, desvio_fluxo)."""
+    frame_len = int(sample_rate * FRAME_SECONDS)
+    per_window = windows.shape[1] // frame_len
+    frames = windows[:, :per_window * frame_len].reshape(windows.shape[0], per_window, frame_len)
+
+    rms = np.sqrt(np.mean(frames * frames, axis=2)) + 1e-10
+    level_db = 20 * np.log10(np.sqrt(np.mean(rms * rms, axis=1)))
+    lster = np.mean(rms < 0.5 * rms.mean(axis=1, keepdims=True), axis=1)
+    # Piso 40 dB abaixo do quadro mais forte: pausas em silêncio digital não dominam o desvio
+    energy_db = 20 * np.log10(rms)
+    energy_db = np.maximum(energy_db, energy_db.max(axis=1, keepdims=True) - 40)
+    energy_std = energy_db.std(axis=1)
+
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, :, 1:] != signs[:, :, :-1], axis=2)
+    hzcrr = np.mean(zcr > 1.5 * zcr.mean(axis=1, keepdims=True), axis=1)
+
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(frame_len), axis=2))
+    spectrum /= spectrum.sum(axis=2, keepdims=True) + 1e-10
+    flux = np.sqrt(np.sum(np.diff(spectrum, axis=1) ** 2, axis=2)) * np.sqrt(spectrum.shape[2])
+    flux = flux.std(axis=1)
+    return level_db, lster, hzcrr, energy_std, flux
+
+
+def classify_windows(windows, sample_rate):
+    """Rótulo bruto (True = fala) de cada janela."""
+    level_db, lster, hzcrr, energy_std, flux = window_features(windows, sample_rate)
+    votes = (
+        (lster > LSTER_MIN).astype(np.int8)
+        + (hzcrr > HZCRR_MIN)
+        + (energy_std > ENERGY_STD_DB_MIN)
+        + (flux > FLUX_MIN)
+    )
+    return (votes >= SPEECH_MIN_VOTES) & (level_db > SILENCE_DB)
+
+
+class SpeechMusicSegmenter:
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.window = int(sample_rate * WINDOW_SECONDS)
+        self._carry = np.empty(0, dtype=np.float32)
+        self._raw = []  # rótulo bruto por janela
+        # Rótulo final por janela (suavizado e dilatado); cresce dobrando, válido até _decided
+        self._mask = np.zeros(64, dtype=bool)
+        self._decided = 0
+        self.samples = 0
+        self._finished = False
+
+    @property
+    def mask(self):
+        """Rótulos finais das janelas já decididas (view, sem cópia)."""
+        return self._mask[:self._decided]
+
+    @property
+    def decided_samples(self):
+        """Amostras cobertas por rótulos finais (o resto espera as janelas seguintes)."""
+        return self.samples if self._finished else self._decided * self.window
+
+    def feed(self, samples):
+        self.samples += samples.size
+        if self._carry.size:
+            samples = np.concatenate((self._carry, samples))
+        count = samples.size // self.window
+        self._carry = samples[count * self.window:].copy()
+        if count:
+            windows = samples[:count * self.window].reshape(count, self.window)
+            self._raw.extend(classify_windows(windows, self.sample_rate).tolist())
+        self._decide(final=False)
+
+    def finish(self):
+        if self._carry.size >= int(self.sample_rate * FRAME_SECONDS) * 2:
+            # Janela final incompleta: completa com silêncio
+            window = np.zeros((1, self.window), dtype=np.float32)
+            window[0, :self._carry.size] = self._carry
+            self._raw.extend(classify_windows(window, self.sample_rate).tolist())
+        elif self._carry.size:
+            self._raw.append(self._raw[-1] if self._raw else False)
+        self._carry = np.empty(0, dtype=np.float32)
+        self._decide(final=True)
+        self._finished = True
+
+    def _smoothed(self, index):
+        """Maioria dos rótulos brutos na janela centrada (nas bordas, só os vizinhos existentes)."""
+        half = SMOOTH_WINDOWS // 2
+        near = self._raw[max(0, index - half):index + half + 1]
+        return 2 * sum(near) > len(near)
+
+    def _decide(self, final):
+        total = len(self._raw)
+        # Rótulo final da janela i = fala em i-1, i ou i+1 (suavizados); o suavizado de i+1
+        # depende dos brutos até i+1+SMOOTH_WINDOWS//2
+        upto = total if final else total - SMOOTH_WINDOWS // 2 - 1
+        if upto > self._mask.size:
+            grown = np.zeros(max(upto, 2 * self._mask.size), dtype=bool)
+            grown[:self._decided] = self._mask[:self._decided]
+            self._mask = grown
+        for index in range(self._decided, upto):
+            self._mask[index] = any(self._smoothed(j) for j in (index - 1, index, index + 1) if 0 <= j < total)
+        self._decided = max(self._decided, upto)
+
+    def intervals(self):
+        """[(inicio, fim)] em segundos dos trechos de fala (após finish)."""
+        duration = self.samples / self.sample_rate
+        result = []
+        start = None
+        for index, speech in enumerate(self.mask.tolist() + [False]):
+            if speech and start is None:
+                start = index
+            elif not speech and start is not None:
+                result.append((round(start * WINDOW_SECONDS, 1), round(min(index * WINDOW_SECONDS, duration), 1)))
+                start = None
+        return [(a, b) for a, b in result if b > a]
+
+
+class SpeechGate:
+    """Zera o áudio fora da fala antes do VAD/STT, mantendo os tempos do arquivo.
+
+    Com `ranges` (intervalos já calculados) o bloco sai na hora; sem eles, classifica
+    junto e segura o áudio até as janelas seguintes decidirem os rótulos.
+    """
+
+    def __init__(self, sample_rate, ranges=None):
+        self.sample_rate = sample_rate
+        self.ranges = ranges
+        # Intervalos ordenados pelo início: cada amostra acha o último que começou antes
+        # dela com searchsorted; o maior fim até ali cobre intervalos sobrepostos
+        ordered = sorted(ranges or [])
+        self._starts = np.array([inicio for inicio, _ in ordered], dtype=np.float64)
+        self._ends = np.maximum.accumulate(np.array([fim for _, fim in ordered] or [0.0], dtype=np.float64))
+        self.segmenter = SpeechMusicSegmenter(sample_rate) if ranges is None else None
+        self._pending = deque()
+        self._released = 0  # amostras já devolvidas
+        self.kept = 0  # amostras de fala devolvidas
+
+    def feed(self, samples):
+        if self.segmenter is None:
+            return self._mask(samples)
+        self.segmenter.feed(samples)
+        self._pending.append(samples)
+        return self._release(self.segmenter.decided_samples)
+
+    def finish(self):
+        if self.segmenter is None:
+            return np.empty(0, dtype=np.float32)
+        self.segmenter.finish()
+        return self._release(self.segmenter.decided_samples)
+
+    def _release(self, upto):
+        count = upto - self._released
+        if count <= 0 or not self._pending:
+            return np.empty(0, dtype=np.float32)
+        buffered = np.concatenate(self._pending)
+        self._pending.clear()
+        if buffered.size > count:
+            self._pending.append(buffered[count:])
+        return self._mask(buffered[:count])
+
+    def _mask(self, samples):
+        start = self._released
+        self._released += samples.size
+        if not samples.size:
+            return samples
+        if self.segmenter is not None:
+            # Só as janelas deste bloco; a janela final incompleta usa o último rótulo
+            mask = self.segmenter.mask
+            windows = np.minimum(np.arange(start, start + samples.size) // self.segmenter.window, mask.size - 1)
+            first = windows[0]
+            keep = mask[first:windows[-1] + 1][windows - first]
+        else:
+            times = np.arange(start, start + samples.size) / self.sample_rate
+            index = np.searchsorted(self._starts, times, side='right') - 1
+            keep = index >= 0
+            keep[keep] = times[keep] < self._ends[index[keep]]
+        self.kept += int(keep.sum())
+        return np.where(keep, samples, 0).astype(np.float32)
@@ -0,0 +1,132 @@
+"""Motores de transcrição (speech-to-text) plugáveis.
+
+Todo motor recebe PCM mono float32 em `sample_rate` e devolve segmentos com palavras e
+tempos relativos ao início do trecho:
+
+    [{'inicio': s, 'fim': s, 'texto': str, 'palavras': [(palavra, inicio, fim, prob)]}]
+
+- `stub`: determinístico, sem modelo (testes e desenvolvimento).
+- `faster_whisper`: Whisper local em CPU (int8) via faster-whisper; só instalado
+  na imagem do worker (requirements-worker.txt), que é onde a transcrição roda.
+
+Este módulo não importa o app: os motores rodam nos processos do pool de transcrição.
+"""
+
+STT_SAMPLE_RATE = 16000
+
+
+class SttEngine:
+    name = None
+    sample_rate = STT_SAMPLE_RATE
+
+    def __init__(self, options=None):
+        self.options = options or {}
+
+    def transcribe(self, samples):
+        raise NotImplementedError
+
+
+class StubEngine(SttEngine):
+    """Uma palavra a cada `word_seconds` repetindo `stub_text`: mesma entrada, mesma saída."""
+
+    name = 'stub'
+
+    def transcribe(self, samples):
+        words = (self.options.get('stub_text') or 'teste').split()
+        step = float(self.options.get('word_seconds') or 0.5)
+        duration = samples.size / self.sample_rate
+        palavras = []
+        t = 0.0
+        i = 0
+        while t + step <= duration + 1e-9:
+            palavras.append((words[i % len(words)], round(t, 3), round(t + step, 3), 1.0))
+            t += step
+            i += 1
+        if not palavras:
+            return []
+        return [{
+            'inicio': palavras[0][1],
+            'fim': palavras[-1][2],
+            'texto': ' '.join(p[0] for p in palavras),
+            'palavras': palavras,
+        }]
+
+
+class FasterWhisperEngine(SttEngine):
+    """Whisper (CTranslate2) em CPU com timestamps por palavra."""
+
+    name = 'faster_whisper'
+
+    def __init__(self, options=None):
+        super().__init__(options)
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise RuntimeError("faster-whisper nao instalado (pip install -r requirements-worker.txt)") from e
+        self.model = WhisperModel(
+            self.options.get('model') or 'small',
+            device='cpu',
+            compute_type=self.options.get('compute_type') or 'int8',
+            cpu_threads=int(self.options.get('cpu_threads') or 1),
+        )
+
+    def transcribe(self, samples):
+        segments, _info = self.model.transcribe(
+            samples,
+            language=self.options.get('language') or None,
+            beam_size=int(self.options.get('beam_size') or 1),
+            word_timestamps=True,
+            vad_filter=False,  # o VAD já foi aplicado ao montar os trechos
+            condition_on_previous_text=False,
+        )
+        result = []
+        for segment in segments:
+            palavras = [
+                (w.word.strip(), round(w.start, 3), round(w.end, 3), round(w.probability, 3))
+                for w in (segment.words or [])
+                if w.word.strip()
+            ]
+            result.append({
+                'inicio': round(segment.start, 3),
+                'fim': round(segment.end, 3),
+                'texto': segment.text.strip(),
+                'palavras': palavras,
+            })
+        return result
+
+
+ENGINES = {
+    StubEngine.name: StubEngine,
+    FasterWhisperEngine.name: FasterWhisperEngine,
+}
+
+
+def create_engine(name, options=None):
+    engine_cls = ENGINES.get(name)
+    if engine_cls is None:
+        raise ValueError(f"Motor de transcricao desconhecido: {name}")
+    return engine_cls(options)
+
+
+# -- pool de processos --------------------------------------------------------
+
+_worker_engine = None
+
+
+def init_worker(name, options):
+    """Initializer do pool: carrega o modelo uma vez por processo."""
+    global _worker_engine
+    _worker_engine = create_engine(name, options)
+
+
+def transcribe_chunk(offset, samples):
+    """Transcreve um trecho e desloca os tempos para a posição (s) no arquivo."""
+    segments = _worker_engine.transcribe(samples)
+    for segment in segments:
+        segment['inicio'] = round(segment['inicio'] + offset, 3)
+        segment['fim'] = round(segment['fim'] + offset, 3)
+        segment['palavras'] = [
+            (palavra, round(inicio + offset, 3), round(fim + offset, 3), prob)
+            for palavra, inicio, fim, prob in segment['palavras']
+        ]
+    return segments
@@ -0,0 +1,103 @@
+"""Detecção de voz por energia para dividir gravações longas em trechos para o STT.
+
+Recebe blocos contínuos de PCM float e devolve trechos de fala com o offset (s) no
+arquivo. Só o trecho em andamento fica em memória, limitado a `max_seconds`; trechos
+longos são cortados no quadro de menor energia perto do limite, para não partir
+palavras no meio.
+"""
+import numpy as np
+
+
+class VadChunker:
+    FRAME_SECONDS = 0.03
+
+    def __init__(
+        self,
+        sample_rate,
+        threshold_db=-40.0,
+        min_silence_seconds=0.5,
+        min_speech_seconds=0.3,
+        max_seconds=30.0,
+        pad_seconds=0.2,
+        split_search_seconds=5.0,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_len = int(sample_rate * self.FRAME_SECONDS)
+        self.threshold_db = threshold_db
+        self.min_silence = max(1, int(min_silence_seconds / self.FRAME_SECONDS))
+        self.min_speech = max(1, int(min_speech_seconds / self.FRAME_SECONDS))
+        self.max_frames = max(2, int(max_seconds / self.FRAME_SECONDS))
+        self.pad = int(pad_seconds / self.FRAME_SECONDS)
+        self.search = max(1, min(self.max_frames - 1, int(split_search_seconds / self.FRAME_SECONDS)))
+        self._carry = np.empty(0, dtype=np.float32)
+        self._buffer = np.empty(0, dtype=np.float32)  # amostras dos quadros [buf_start, frame)
+        self._energy = np.empty(0, dtype=np.float32)  # dB por quadro, mesma cobertura
+        self._buf_start = 0
+        self._frame = 0
+        self._start = None
+        self._last_speech = None
+
+    def feed(self, samples):
+        """Processa um bloco; retorna [(offset_segundos, amostras)] dos trechos fechados."""
+        if self._carry.size:
+            samples = np.concatenate((self._carry, samples))
+        usable = samples.size - samples.size % self.frame_len
+        self._carry = samples[usable:].copy()
+        if not usable:
+            return []
+        frames = samples[:usable].reshape(-1, self.frame_len)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        energy = (20 * np.log10(np.maximum(rms, 1e-10))).astype(np.float32)
+        self._buffer = np.concatenate((self._buffer, samples[:usable]))
+        self._energy = np.concatenate((self._energy, energy))
+
+        out = []
+        for is_speech in energy > self.threshold_db:
+            f = self._frame
+            self._frame += 1
+            if is_speech:
+                if self._start is None:
+                    self._start = f
+                self._last_speech = f
+            elif self._start is None:
+                continue
+            if f - self._last_speech >= self.min_silence:
+                out.extend(self._cut(self._start, self._last_speech + 1))
+                self._start = None
+            elif f + 1 - self._start >= self.max_frames:
+                # Trecho longo demais: corta no quadro mais silencioso dos últimos segundos
+                lo = max(self._start + 1, f + 1 - self.search)
+                window = self._energy[lo - self._buf_start:f + 1 - self._buf_start]
+                split = lo + int(np.argmin(window))
+                out.extend(self._cut(self._start, split))
+                self._start = split
+        if self._start is None:
+            self._trim(self._frame - self.pad)
+        return out
+
+    def finish(self):
+        """Fecha o trecho em andamento (fim do arquivo)."""
+        out = []
+        if self._start is not None:
+            out.extend(self._cut(self._start, self._last_speech + 1))
+            self._start = None
+        self._trim(self._frame)
+        return out
+
+    def _cut(self, start, end):
+        first = max(self._buf_start, start - self.pad)
+        last = min(end + self.pad, self._buf_start + self._energy.size)
+        chunk = []
+        if end - start >= self.min_speech and last > first:
+            a = (first - self._buf_start) * self.frame_len
+            b = (last - self._buf_start) * self.frame_len
+            chunk.append((first * self.FRAME_SECONDS, self._buffer[a:b].copy()))
+        self._trim(end - self.pad)
+        return chunk
+
+    def _trim(self, frame):
+        drop = max(0, frame - self._buf_start)
+        if drop:
+            self._buffer = self._buffer[drop * self.frame_len:]
+            self._energy = self._energy[drop:]
+            self._buf_start += drop
@@ -0,0 +1,69 @@
+"""ZIP gerado sob demanda, sem arquivo temporário e com memória constante.
+
+O zipfile escreve num destino sem seek (um acumulador drenado a cada bloco): os
+tamanhos e o CRC de cada entrada vão no data descriptor depois dos dados e o diretório
+central no fim, então o primeiro byte sai assim que o primeiro bloco é lido. Entradas
+sem compressão (ZIP_STORED): áudio já comprimido não ganha nada com deflate. ZIP64 só
+nas entradas que passam de 4 GB; o zipfile também o usa no diretório central quando
+o arquivo todo passa do limite.
+
+Este módulo não importa o app.
+"""
+import os
+import time
+import zipfile
+
+READ_CHUNK = 1024 * 1024
+
+
+class _Sink:
+    """Destino sem seek para o zipfile; acumula até o próximo drain()."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def stream_zip(entries, chunk_size=READ_CHUNK):
+    """Gerador com os bytes do ZIP de `entries`: iterável de (nome no zip, caminho).
+
+    Arquivos ausentes ficam de fora. Um arquivo que ainda cresce entra com o tamanho
+    que tinha ao ser aberto.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for arcname, path in entries:
+            try:
+                fh = open(path, 'rb')
+            except OSError:
+                continue
+            with fh:
+                stat = os.fstat(fh.fileno())
+                info = zipfile.ZipInfo(arcname, date_time=time.localtime(stat.st_mtime)[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                remaining = stat.st_size
+                with archive.open(info, 'w', force_zip64=remaining >= zipfile.ZIP64_LIMIT) as dest:
+                    while remaining > 0:
+                        block = fh.read(min(chunk_size, remaining))
+                        if not block:
+                            break
+                        remaining -= len(block)
+                        dest.write(block)
+                        yield sink.drain()
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
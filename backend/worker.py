@@ -0,0 +1,128 @@
+"""Worker de jobs assíncronos (process-ai etc.), fora do servidor web.
+
+Sobe JOB_WORKERS processos; cada um pega jobs da tabela `jobs` com SKIP LOCKED e os
+executa. Mais LIVE_KEYWORD_WORKERS processos de monitoramento, que acompanham as
+gravações em andamento (alertas de palavras-chave ao vivo) sem ocupar os de jobs.
+Sem scheduler nem gravações: esses ficam no web. Eventos de websocket vão para o
+outbox e o web os entrega aos clientes.
+
+Uso: python worker.py [--processes N] [--live-processes N]
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+# Antes de importar o app: o worker não inicia o APScheduler (gravações, buffers, etc.)
+os.environ['SCHEDULER_ENABLED'] = 'false'
+
+HEARTBEAT_SECONDS = 30
+STALE_CHECK_SECONDS = 60
+
+
+def _heartbeat_loop(app, job_id, stop):
+    from services.job_service import touch_heartbeat
+
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            with app.app_context():
+                touch_heartbeat(job_id)
+        except Exception as e:
+            print(f"worker: heartbeat do job {job_id} falhou: {e}")
+
+
+def run_worker():
+    """Laço de um processo do worker: pega um job, executa, repete."""
+    from app import app, db
+    from config import Config
+    from services.job_service import MONITOR_JOB_TYPES, claim_next_job, requeue_stale_jobs, run_job
+    from services.websocket_service import route_to_outbox
+
+    route_to_outbox()
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_args: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_args: stopping.set())
+
+    last_stale_check = 0.0
+    while not stopping.is_set():
+        try:
+            with app.app_context():
+                if time.monotonic() - last_stale_check >= STALE_CHECK_SECONDS:
+                    last_stale_check = time.monotonic()
+                    requeue_stale_jobs()
+                job = claim_next_job(excluir=MONITOR_JOB_TYPES)
+                if job is None:
+                    stopping.wait(Config.JOB_POLL_SECONDS)
+                    continue
+                stop_heartbeat = threading.Event()
+                heartbeat = threading.Thread(
+                    target=_heartbeat_loop, args=(app, job.id, stop_heartbeat), daemon=True
+                )
+                heartbeat.start()
+                try:
+                    run_job(job)
+                finally:
+                    stop_heartbeat.set()
+                    heartbeat.join()
+                db.session.remove()
+        except Exception as e:
+            print(f"worker: erro no laco: {e}")
+            stopping.wait(Config.JOB_POLL_SECONDS)
+
+
+def run_live():
+    """Processo de monitoramento: alertas de palavras-chave das gravações em andamento."""
+    from app import app
+    from services.live_keyword_service import run_live_monitor
+    from services.websocket_service import route_to_outbox
+
+    route_to_outbox()
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_args: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_args: stopping.set())
+    run_live_monitor(app, stopping)
+
+
+def main():
+    from config import Config
+
+    parser = argparse.ArgumentParser(description='Worker de jobs do ClipRadio')
+    parser.add_argument('--processes', type=int, default=Config.JOB_WORKERS)
+    parser.add_argument('--live-processes', type=int, default=Config.LIVE_KEYWORD_WORKERS)
+    args = parser.parse_args()
+
+    if args.processes <= 1 and args.live_processes <= 0:
+        run_worker()
+        return
+
+    ctx = multiprocessing.get_context('spawn')
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_args: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_args: stopping.set())
+
+    procs = []
+    wanted = {
+        'job-worker': (run_worker, max(1, args.processes)),
+        'live-worker': (run_live, args.live_processes),
+    }
+    while not stopping.is_set():
+        # Repõe processos que morreram (job que derrubou o interpretador, OOM, etc.)
+        procs = [p for p in procs if p.is_alive()]
+        for name, (target, count) in wanted.items():
+            running = sum(1 for p in procs if p.name == name)
+            for _ in range(count - running):
+                proc = ctx.Process(target=target, name=name)
+                proc.start()
+                procs.append(proc)
+        stopping.wait(5)
+
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        proc.join(timeout=30)
+
+
+if __name__ == '__main__':
+    main()